@@ -1,12 +1,141 @@
+import hashlib
+import json
 import os
-from typing import Optional
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 from dotenv import load_dotenv
 from openai import OpenAI
 
+import metrics
+from cache import MISSING, TTLCache
+from metrics import REGISTRY, TOKEN_BUCKETS
+
 load_dotenv()
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-def respond(prompt: str, context: Optional[str] = None) -> str:
+MODEL = "gpt-4.1"
+TEMPERATURE = 0.33
+
+# Cap on OpenAI requests in flight per process; further calls wait for a free slot
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "64"))
+_openai_slots = threading.BoundedSemaphore(OPENAI_MAX_CONCURRENCY)
+
+# Answers are reused for the same question against the same market context. The app
+# sets the TTL to its snapshot refresh interval (see set_response_cache_ttl); a changed
+# snapshot changes the context hash, so answers about old data are never served.
+response_cache = TTLCache(
+    'ai_responses',
+    ttl=int(os.getenv("AI_RESPONSE_CACHE_TTL", "300")),
+    maxsize=int(os.getenv("AI_RESPONSE_CACHE_SIZE", "1024")),
+)
+
+
+def set_response_cache_ttl(ttl: float) -> None:
+    """Seconds new answers stay cached, e.g. the interval at which the market context changes"""
+    response_cache.ttl = ttl
+
+
+request_seconds = REGISTRY.histogram(
+    'openai_request_duration_seconds', 'OpenAI request latency, including the wait for a slot', ['call', 'outcome'],
+)
+first_token_seconds = REGISTRY.histogram(
+    'openai_time_to_first_token_seconds', 'Time until a streamed answer produced its first text', ['call'],
+)
+usage_tokens = REGISTRY.histogram(
+    'openai_usage_tokens', 'Tokens per request, from the response usage', ['call', 'kind'], buckets=TOKEN_BUCKETS,
+)
+
+
+@contextmanager
+def _openai_slot():
+    """Hold one of the OpenAI concurrency slots for the duration of a request"""
+    with metrics.span('openai_wait'):
+        _openai_slots.acquire()
+    try:
+        yield
+    finally:
+        _openai_slots.release()
+
+
+@contextmanager
+def _observed(call: str):
+    """Time an OpenAI request into the latency histogram and the request trace"""
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        with metrics.span('openai', call):
+            yield
+        outcome = 'ok'
+    except GeneratorExit:
+        # A streaming caller stopped reading
+        outcome = 'cancelled'
+        raise
+    finally:
+        request_seconds.observe(time.perf_counter() - start, call=call, outcome=outcome)
+
+
+def _record_usage(call: str, usage) -> None:
+    if usage is not None:
+        usage_tokens.observe(usage.prompt_tokens or 0, call=call, kind='prompt')
+        usage_tokens.observe(usage.completion_tokens or 0, call=call, kind='completion')
+
+
+def normalize_question(prompt: str) -> str:
+    """Lowercase a question and drop punctuation and extra whitespace"""
+    words = (word.strip('.') for word in re.findall(r"[a-z0-9$%.']+", prompt.lower()))
+    return " ".join(word for word in words if word)
+
+
+def response_cache_key(
+    prompt: str,
+    context: Optional[str] = None,
+    history: Optional[Sequence[Dict[str, str]]] = None,
+    summary: Optional[str] = None,
+) -> Tuple[str, str]:
+    """Cache key of a normalized question plus a fingerprint of the context and conversation"""
+    digest = hashlib.sha256((context or "").encode("utf-8"))
+    if history or summary:
+        # Follow-ups depend on the conversation, so it is part of the fingerprint
+        conversation = {
+            'summary': summary,
+            'turns': [(turn['question'], turn['answer']) for turn in history or ()],
+        }
+        digest.update(json.dumps(conversation).encode("utf-8"))
+    return normalize_question(prompt), digest.hexdigest()
+
+
+def _build_messages(
+    prompt: str,
+    context: Optional[str] = None,
+    history: Optional[Sequence[Dict[str, str]]] = None,
+    summary: Optional[str] = None,
+) -> List[dict]:
+    """Build the system, earlier-turn and user messages for a prompt with optional market context"""
+    # Build system prompt with optional context
+    system_content = "You are an economic consulting assistant. Explain in clear, simple English."
+    
+    if context:
+        system_content += f"\n\n{context}"
+    if summary:
+        system_content += f"\n\nSummary of the earlier conversation with this user:\n{summary}"
+    
+    messages = [{"role": "system", "content": system_content}]
+    for turn in history or ():
+        messages.append({"role": "user", "content": turn['question']})
+        messages.append({"role": "assistant", "content": turn['answer']})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+def respond(
+    prompt: str,
+    context: Optional[str] = None,
+    history: Optional[Sequence[Dict[str, str]]] = None,
+    summary: Optional[str] = None,
+) -> str:
     """
     Generate a response from the AI model based on the user's prompt and optional market context.
     
@@ -14,23 +143,110 @@ def respond(prompt: str, context: Optional[str] = None) -> str:
         prompt: The user's question or request
         context: Optional market context string containing current stock data, news, etc.
                  This is appended to the system prompt to give the AI awareness of current market state.
+        history: Optional recent turns ({'question', 'answer'} dicts, oldest first) sent verbatim
+        summary: Optional summary of turns older than history
     
     Returns:
         The AI model's response as a string
     """
-    # Build system prompt with optional context
-    system_content = "You are an economic consulting assistant. Explain in clear, simple English."
+    key = response_cache_key(prompt, context, history, summary)
+    cached = response_cache.get(key)
+    if cached is not MISSING:
+        return cached
     
-    if context:
-        system_content += f"\n\n{context}"
+    with _observed('respond'), _openai_slot():
+        resp = client.chat.completions.create(
+            model=MODEL,
+            temperature=TEMPERATURE,
+            messages=_build_messages(prompt, context, history, summary),
+        )
+    _record_usage('respond', resp.usage)
+    answer = resp.choices[0].message.content
+    if answer:
+        # A blank answer is not worth replaying for the rest of the TTL
+        response_cache.set(key, answer)
+    return answer
+
+
+def respond_stream(
+    prompt: str,
+    context: Optional[str] = None,
+    history: Optional[Sequence[Dict[str, str]]] = None,
+    summary: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Stream a response from the AI model as it is generated.
     
-    messages = [
-        {"role": "system", "content": system_content},
-        {"role": "user", "content": prompt},
-    ]
-    resp = client.chat.completions.create(
-        model="gpt-4.1",
-        temperature=0.33,
-        messages=messages,
+    Args:
+        prompt: The user's question or request
+        context: Optional market context string, as for respond()
+        history: Optional recent turns, as for respond()
+        summary: Optional summary of older turns, as for respond()
+    
+    Yields:
+        Text deltas of the response in order; joined they form the full answer.
+        A cached answer is yielded as a single delta.
+    """
+    key = response_cache_key(prompt, context, history, summary)
+    cached = response_cache.get(key)
+    if cached is not MISSING:
+        yield cached
+        return
+    
+    parts = []
+    finish_reason = None
+    # The slot is held until the stream ends or the caller stops reading
+    start = time.perf_counter()
+    with _observed('stream'), _openai_slot():
+        stream = client.chat.completions.create(
+            model=MODEL,
+            temperature=TEMPERATURE,
+            messages=_build_messages(prompt, context, history, summary),
+            stream=True,
+            # The last chunk then carries token usage (with no choices)
+            stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not parts:
+                    first_token_seconds.observe(time.perf_counter() - start, call='stream')
+                parts.append(chunk.choices[0].delta.content)
+                yield parts[-1]
+            if chunk.choices and chunk.choices[0].finish_reason:
+                finish_reason = chunk.choices[0].finish_reason
+            if getattr(chunk, 'usage', None) is not None:
+                _record_usage('stream', chunk.usage)
+    # Only a non-empty answer from a stream the model finished is cached; one that was
+    # cut off (or ended without a finish reason) would be replayed truncated
+    if parts and finish_reason == 'stop':
+        response_cache.set(key, "".join(parts))
+
+
+def summarize_conversation(previous_summary: Optional[str], turns: Sequence[Dict[str, str]], max_words: int = 150) -> str:
+    """
+    Fold conversation turns into a rolling summary.
+    
+    Args:
+        previous_summary: Summary of everything before turns, if any
+        turns: Question/answer dicts to add to the summary, oldest first
+        max_words: Target length of the new summary
+    
+    Returns:
+        Updated summary text
+    """
+    transcript = "\n\n".join(f"User: {turn['question']}\nAssistant: {turn['answer']}" for turn in turns)
+    request = (
+        f"Update the summary of a conversation between a user and an economic consulting assistant. "
+        f"Keep the user's goals, the symbols and topics discussed, and any conclusions or figures "
+        f"the user may refer back to. Reply with the summary only, in at most {max_words} words."
+        f"\n\nCurrent summary:\n{previous_summary or '(none)'}"
+        f"\n\nNew turns:\n{transcript}"
     )
-    return resp.choices[0].message.content
+    with _observed('summary'), _openai_slot():
+        resp = client.chat.completions.create(
+            model=MODEL,
+            temperature=0,
+            messages=[{"role": "user", "content": request}],
+        )
+    _record_usage('summary', resp.usage)
+    return resp.choices[0].message.content.strip()
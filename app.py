@@ -1,9 +1,37 @@
 import os
+import contextvars
+import gzip
+import hashlib
+import json
+import math
+import re
+import time
+import uuid
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, session, jsonify
-import requests
+from markupsafe import Markup
+from flask import (
+    Flask, Response, render_template, request, session, jsonify, g, has_request_context, stream_with_context
+)
 import ai
+import metrics
 import context_harness 
+from chat_store import ChatPage, ChatStore
+from memory import ConversationMemory
+from cache import MISSING, SingleFlight, TTLCache, cached
+import forecasting
+from http_client import UpstreamClient
+from metrics import REGISTRY
+from news_index import NewsIndex, parse_news_feed
+from sentiment import SentimentAggregator
+from scheduler import INTERACTIVE, RateLimitScheduler, SharedQuota, upstream_priority
+from refresher import SnapshotRefresher
+from broadcaster import MarketBroadcaster
+from series_store import SeriesStore, latest_session
+from shared_cache import SharedCache
+from timeseries import INTERVALS, average_correlation
 
 load_dotenv()
 app = Flask(__name__)
@@ -11,24 +39,220 @@ app.secret_key = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 
 API_KEY = os.getenv("ALPHAVANTAGE_API_KEY")
 
-def get_time_series_daily(symbol:str):
-    url = (
-        "https://www.alphavantage.co/query"
-        f"?function=TIME_SERIES_DAILY_ADJUSTED&symbol={symbol}&apikey={API_KEY}"
+# State shared by every worker process on the host: the Alpha Vantage quota, and
+# fetched payloads so one worker's fetch is not repeated (and paid for) by the others
+SHARED_CACHE = os.getenv("SHARED_CACHE", "true").lower() == "true"
+SHARED_CACHE_PATH = os.getenv(
+    "SHARED_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "shared_cache.sqlite3")
+)
+
+# Alpha Vantage quota (defaults match the free tier)
+ALPHAVANTAGE_CALLS_PER_MINUTE = int(os.getenv("ALPHAVANTAGE_CALLS_PER_MINUTE", "5"))
+ALPHAVANTAGE_CALLS_PER_DAY = int(os.getenv("ALPHAVANTAGE_CALLS_PER_DAY", "25"))
+# Daily calls kept for symbol lookups and consults; background refreshes stop short of them
+ALPHAVANTAGE_INTERACTIVE_RESERVE = int(os.getenv(
+    "ALPHAVANTAGE_INTERACTIVE_RESERVE", str(ALPHAVANTAGE_CALLS_PER_DAY * 2 // 5)
+))
+
+# Keeps Alpha Vantage calls inside the key's quota, counted across all workers
+alpha_vantage_scheduler = RateLimitScheduler(
+    per_minute=ALPHAVANTAGE_CALLS_PER_MINUTE,
+    per_day=ALPHAVANTAGE_CALLS_PER_DAY,
+    max_wait=float(os.getenv("ALPHAVANTAGE_MAX_QUEUE_WAIT", "20")),
+    reserve=ALPHAVANTAGE_INTERACTIVE_RESERVE,
+    shared=SharedQuota(SHARED_CACHE_PATH) if SHARED_CACHE else None,
+)
+
+# Shared keep-alive client for every Alpha Vantage call
+alpha_vantage = UpstreamClient(
+    base_url=os.getenv("ALPHAVANTAGE_BASE_URL", "https://www.alphavantage.co/query"),
+    connect_timeout=float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3.05")),
+    read_timeout=float(os.getenv("UPSTREAM_READ_TIMEOUT", "15")),
+    max_retries=int(os.getenv("UPSTREAM_MAX_RETRIES", "2")),
+    backoff_base=float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5")),
+    pool_size=int(os.getenv("UPSTREAM_POOL_SIZE", "16")),
+    scheduler=alpha_vantage_scheduler,
+    max_concurrency=int(os.getenv("ALPHAVANTAGE_MAX_CONCURRENCY", "8")) or None,
+)
+
+# Cache TTLs in seconds: movers and macro news change every few minutes,
+# daily series only once per trading day
+MOVERS_CACHE_TTL = int(os.getenv("MOVERS_CACHE_TTL", "300"))
+NEWS_CACHE_TTL = int(os.getenv("NEWS_CACHE_TTL", "300"))
+SERIES_CACHE_TTL = int(os.getenv("SERIES_CACHE_TTL", "21600"))
+SYMBOL_NEWS_CACHE_TTL = int(os.getenv("SYMBOL_NEWS_CACHE_TTL", "900"))
+# Upper bound on cached symbols before least-recently-used entries are evicted
+SYMBOL_CACHE_SIZE = int(os.getenv("SYMBOL_CACHE_SIZE", "256"))
+
+movers_cache = TTLCache('top_movers', MOVERS_CACHE_TTL, maxsize=1)
+news_cache = TTLCache('economic_news', NEWS_CACHE_TTL, maxsize=1)
+series_cache = TTLCache('time_series_daily', SERIES_CACHE_TTL, maxsize=SYMBOL_CACHE_SIZE)
+symbol_news_cache = TTLCache('symbol_news', SYMBOL_NEWS_CACHE_TTL, maxsize=SYMBOL_CACHE_SIZE)
+# Seconds a worker may hold a key's refresh lease before another worker takes over
+SHARED_CACHE_LEASE_SECONDS = int(os.getenv("SHARED_CACHE_LEASE_SECONDS", "90"))
+# Seconds a worker waits on another worker's lease before fetching for itself (well below WEB_TIMEOUT)
+SHARED_CACHE_WAIT_SECONDS = float(os.getenv("SHARED_CACHE_WAIT_SECONDS", "10"))
+
+shared_movers = shared_news = series_leases = None
+if SHARED_CACHE:
+    shared_movers = SharedCache(
+        'top_movers', SHARED_CACHE_PATH, MOVERS_CACHE_TTL, maxsize=1, lease_timeout=SHARED_CACHE_LEASE_SECONDS,
+        wait_timeout=SHARED_CACHE_WAIT_SECONDS,
+    )
+    shared_news = SharedCache(
+        'news_feeds', SHARED_CACHE_PATH, NEWS_CACHE_TTL, maxsize=SYMBOL_CACHE_SIZE + 1,
+        lease_timeout=SHARED_CACHE_LEASE_SECONDS, wait_timeout=SHARED_CACHE_WAIT_SECONDS,
+    )
+    # Series are already shared through the series store; this only lets one worker sync a symbol at a time
+    series_leases = SharedCache(
+        'time_series_daily', SHARED_CACHE_PATH, SERIES_CACHE_TTL, lease_timeout=SHARED_CACHE_LEASE_SECONDS,
+        wait_timeout=SHARED_CACHE_WAIT_SECONDS,
     )
-    r = requests.get(url)
-    data = r.json()
+# Local OHLCV history; known symbols only fetch the compact window of new bars
+SERIES_DB_PATH = os.getenv(
+    "SERIES_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "series.sqlite3")
+)
+series_store = SeriesStore(SERIES_DB_PATH)
+# Server-side chat history; the session cookie only carries the conversation id
+CHAT_DB_PATH = os.getenv(
+    "CHAT_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "chat.sqlite3")
+)
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "50"))
+chat_store = ChatStore(
+    CHAT_DB_PATH,
+    max_messages=int(os.getenv("CHAT_MAX_MESSAGES", "200")),
+    retention_seconds=int(os.getenv("CHAT_RETENTION_DAYS", "30")) * 86400,
+)
+# Follow-ups see the latest turns verbatim and a rolling summary of older ones
+conversation_memory = ConversationMemory(
+    chat_store,
+    summarize=ai.summarize_conversation,
+    recent_turns=int(os.getenv("MEMORY_RECENT_TURNS", "4")),
+    summary_batch=int(os.getenv("MEMORY_SUMMARY_BATCH", "4")),
+    token_budget=int(os.getenv("MEMORY_TOKEN_BUDGET", "1500")),
+)
+
+# Every news feed fetched is indexed by URL, ticker and term; a symbol's news is
+# served locally when recently fetched feeds already hold enough relevant articles
+news_index = NewsIndex(
+    max_articles=int(os.getenv("NEWS_INDEX_MAX_ARTICLES", "5000")),
+    max_age=int(os.getenv("NEWS_INDEX_MAX_AGE_HOURS", "72")) * 3600,
+)
+LOCAL_NEWS_MIN_ARTICLES = int(os.getenv("LOCAL_NEWS_MIN_ARTICLES", "5"))
+LOCAL_NEWS_MIN_RELEVANCE = float(os.getenv("LOCAL_NEWS_MIN_RELEVANCE", "0.3"))
+LOCAL_NEWS_MAX_AGE = int(os.getenv("LOCAL_NEWS_MAX_AGE", str(SYMBOL_NEWS_CACHE_TTL)))
+# Rolling per-ticker and per-topic sentiment, updated as new articles are indexed
+news_sentiment = SentimentAggregator(
+    half_life=float(os.getenv("SENTIMENT_HALF_LIFE_HOURS", "24")) * 3600,
+)
+
+# Concurrent cache misses for the same function and symbol share one upstream fetch
+upstream_flight = SingleFlight()
+
+# Bounded pool used to fan out the independent upstream fetches of a request
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))
+fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='upstream-fetch')
+
+def request_scoped(func):
+    """Reuse a fetcher's result for the rest of the current Flask request"""
+    @wraps(func)
+    def wrapper(*args):
+        if not has_request_context():
+            return func(*args)
+        results = g.setdefault('upstream_results', {})
+        key = (func.__name__,) + tuple(arg.upper() if isinstance(arg, str) else arg for arg in args)
+        if key not in results:
+            results[key] = func(*args)
+        return results[key]
+    return wrapper
+
+def _fetch_daily_adjusted(symbol: str, outputsize: str):
+    """Request TIME_SERIES_DAILY_ADJUSTED with the given output size ('compact' or 'full')"""
+    return alpha_vantage.get_json({
+        'function': 'TIME_SERIES_DAILY_ADJUSTED',
+        'symbol': symbol,
+        'outputsize': outputsize,
+        'apikey': API_KEY
+    })
+
+def _has_new_corporate_action(series, after_date):
+    """True if a bar newer than after_date carries a dividend or split"""
+    for day, bar in series.items():
+        if after_date and day <= after_date:
+            continue
+        if float(bar.get('7. dividend amount') or 0) != 0 or float(bar.get('8. split coefficient') or 1) != 1:
+            return True
+    return False
+
+@request_scoped
+@cached(series_cache, key=lambda symbol: symbol.upper(), should_cache=lambda result: result[0] is not None, flight=upstream_flight)
+def get_time_series_daily(symbol:str):
+    """Daily series for a symbol as a columnar DailySeries, served from the local store and topped up with new bars"""
+    symbol = symbol.upper()
+    trading_day = latest_session()
+    state = series_store.sync_state(symbol)
+    if state and state.checked_session >= trading_day:
+        # Already current for the latest completed session: no upstream call
+        return series_store.load(symbol), None
+    if series_leases is None:
+        return _sync_time_series(symbol, trading_day, state)
+    with series_leases.lease(symbol):
+        # Another worker may have synced the symbol while this one waited for the lease
+        state = series_store.sync_state(symbol)
+        if state and state.checked_session >= trading_day:
+            return series_store.load(symbol), None
+        return _sync_time_series(symbol, trading_day, state)
+
+def _sync_time_series(symbol, trading_day, state):
+    """Fetch new bars for a symbol that is behind the latest session, store them and return the series"""
+    # First fetch loads the whole history, later ones only the last ~100 bars
+    full = state is None or not state.full_history
+    try:
+        data = _fetch_daily_adjusted(symbol, 'full' if full else 'compact')
+    except Exception as e:
+        if state is None:
+            raise
+        print(f"Serving stored series for {symbol} after fetch error: {str(e)}")
+        return series_store.load(symbol), None
     if "Time Series (Daily)" not in data:
+        if state is not None:
+            return series_store.load(symbol), None
         return None, data
-    return data["Time Series (Daily)"], None
 
+    series = data["Time Series (Daily)"]
+    stored_through = series_store.latest_date(symbol)
+    # A compact window that starts after the newest stored bar would leave a gap in the history
+    gap = bool(series) and (stored_through is None or stored_through < min(series))
+    if not full and (gap or _has_new_corporate_action(series, stored_through)):
+        # A new dividend or split re-adjusts every earlier close, so reload the full history
+        # (as for a gap); if that fails, keep the stored copy and retry on the next request
+        try:
+            refreshed = _fetch_daily_adjusted(symbol, 'full')
+        except Exception as e:
+            print(f"Error reloading adjusted history for {symbol}: {str(e)}")
+            return series_store.load(symbol), None
+        if "Time Series (Daily)" not in refreshed:
+            return series_store.load(symbol), None
+        series = refreshed["Time Series (Daily)"]
+        full = True
+    series_store.upsert(symbol, series, trading_day, full_history=full)
+    return series_store.load(symbol), None
+
+@request_scoped
+@cached(
+    movers_cache, key=lambda: 'top_movers', should_cache=lambda result: result['error'] is None,
+    flight=upstream_flight, shared=shared_movers,
+)
 def get_top_movers():
     """Fetch top movers data from Alpha Vantage API"""
-    url = f'https://www.alphavantage.co/query?function=TOP_GAINERS_LOSERS&apikey={API_KEY}'
-    
     try:
-        r = requests.get(url)
-        data = r.json()
+        data = alpha_vantage.get_json({
+            'function': 'TOP_GAINERS_LOSERS',
+            'apikey': API_KEY
+        })
         
         if 'top_gainers' in data:
             return {
@@ -52,122 +276,623 @@ def get_top_movers():
             'error': str(e)
         }
 
+def _fetch_news_feed(params, label, ttl):
+    """
+    Request a NEWS_SENTIMENT feed (or reuse another worker's copy from the shared
+    cache), add its articles to the news index and return them.
+    """
+    def load():
+        data = alpha_vantage.get_json(dict(params, function='NEWS_SENTIMENT', apikey=API_KEY, limit=50))
+        if 'feed' not in data:
+            # API might return error message
+            print(f"Alpha Vantage {label} error: {data}")
+            return {'articles': [], 'fetched_at': time.time()}
+        return {'articles': parse_news_feed(data), 'fetched_at': time.time()}
+
+    if shared_news is None:
+        feed = load()
+    else:
+        feed, _ = shared_news.get_or_load(
+            sorted(params.items()), load, should_cache=lambda feed: bool(feed['articles']), ttl=ttl
+        )
+    # Every worker indexes the feed; only articles new to this worker's index update
+    # sentiment, so repeats are not double counted
+    news_sentiment.add(news_index.ingest(feed['articles'], now=feed['fetched_at']))
+    return feed['articles'][:50]  # Limit to 50 articles
+
+@request_scoped
+@cached(news_cache, key=lambda: 'economic_news', should_cache=bool, flight=upstream_flight)
 def get_economic_news():
     """Fetch economic news from Alpha Vantage NEWS_SENTIMENT API"""
     if not API_KEY:
         return []
     
     try:
-        # Alpha Vantage NEWS_SENTIMENT endpoint for economic news
-        url = 'https://www.alphavantage.co/query'
-        params = {
-            'function': 'NEWS_SENTIMENT',
-            'topics': 'economy_macro',
-            'apikey': API_KEY,
-            'limit': 50
-        }
-        
-        response = requests.get(url, params=params)
-        data = response.json()
-        
-        # Check if we got valid data
-        if 'feed' in data:
-            articles = data['feed']
-            
-            # Format articles to match template expectations
-            news_list = []
-            for article in articles:
-                if article.get('title'):
-                    # Format date from Alpha Vantage format (YYYYMMDDTHHMMSS) to YYYY-MM-DD
-                    published_date = ''
-                    if article.get('time_published'):
-                        time_str = article.get('time_published')
-                        if len(time_str) >= 8:
-                            # Format: YYYYMMDDTHHMMSS -> YYYY-MM-DD
-                            published_date = f"{time_str[0:4]}-{time_str[4:6]}-{time_str[6:8]}"
-                    
-                    news_list.append({
-                        'title': article.get('title', ''),
-                        'description': article.get('summary', '') or 'No description available',
-                        'url': article.get('url', ''),
-                        'image': article.get('banner_image', '') or article.get('source_logo', ''),
-                        'source': article.get('source', 'Unknown'),
-                        'published_at': published_date
-                    })
-            
-            return news_list[:50]  # Limit to 50 articles
-        else:
-            # API might return error message
-            print(f"Alpha Vantage news error: {data}")
-            return []
+        return _fetch_news_feed({'topics': 'economy_macro'}, 'news', NEWS_CACHE_TTL)
     except Exception as e:
         # Return empty list on error (don't break the page)
         print(f"Error fetching news: {str(e)}")
         return []
 
+@request_scoped
+@cached(symbol_news_cache, key=lambda symbol: symbol.upper(), should_cache=bool, flight=upstream_flight)
 def get_symbol_news(symbol: str):
-    """Fetch news articles specifically related to a stock symbol from Alpha Vantage NEWS_SENTIMENT API"""
+    """News articles about a stock symbol, from the local news index when it has enough, else from Alpha Vantage"""
+    symbol = symbol.upper()
+    local = news_index.for_ticker(
+        symbol,
+        min_relevance=LOCAL_NEWS_MIN_RELEVANCE,
+        seen_within=LOCAL_NEWS_MAX_AGE,
+    )
+    if LOCAL_NEWS_MIN_ARTICLES and len(local) >= LOCAL_NEWS_MIN_ARTICLES:
+        return local
     if not API_KEY:
-        return []
+        return local
     
     try:
-        # Alpha Vantage NEWS_SENTIMENT endpoint for symbol-specific news
-        url = 'https://www.alphavantage.co/query'
-        params = {
-            'function': 'NEWS_SENTIMENT',
-            'tickers': symbol.upper(),
-            'apikey': API_KEY,
-            'limit': 50
-        }
-        
-        response = requests.get(url, params=params)
-        data = response.json()
-        
-        # Check if we got valid data
-        if 'feed' in data:
-            articles = data['feed']
-            
-            # Format articles to match template expectations
-            news_list = []
-            for article in articles:
-                if article.get('title'):
-                    # Format date from Alpha Vantage format (YYYYMMDDTHHMMSS) to YYYY-MM-DD
-                    published_date = ''
-                    if article.get('time_published'):
-                        time_str = article.get('time_published')
-                        if len(time_str) >= 8:
-                            # Format: YYYYMMDDTHHMMSS -> YYYY-MM-DD
-                            published_date = f"{time_str[0:4]}-{time_str[4:6]}-{time_str[6:8]}"
-                    
-                    news_list.append({
-                        'title': article.get('title', ''),
-                        'description': article.get('summary', '') or 'No description available',
-                        'url': article.get('url', ''),
-                        'image': article.get('banner_image', '') or article.get('source_logo', ''),
-                        'source': article.get('source', 'Unknown'),
-                        'published_at': published_date
-                    })
-            
-            return news_list[:50]  # Limit to 50 articles
-        else:
-            # API might return error message
-            print(f"Alpha Vantage symbol news error for {symbol}: {data}")
-            return []
+        return _fetch_news_feed({'tickers': symbol}, f"symbol news for {symbol}", SYMBOL_NEWS_CACHE_TTL)
     except Exception as e:
-        # Return empty list on error (don't break the page)
+        # Fall back to whatever the index has (don't break the page)
         print(f"Error fetching symbol news for {symbol}: {str(e)}")
-        return []
+        return local
+
+def _refresh_top_movers():
+    """
+    Fetch top movers for a new snapshot, bypassing this worker's cached copy.
+    
+    A copy another worker stored in the shared cache within MOVERS_CACHE_TTL is
+    reused, so N workers refreshing on their own schedules cost one fetch per TTL.
+    """
+    movers_cache.invalidate('top_movers')
+    return get_top_movers()
+
+def _refresh_economic_news():
+    """Fetch economic news for a new snapshot, bypassing this worker's cached copy (the shared cache still applies)"""
+    news_cache.invalidate('economic_news')
+    return get_economic_news()
+
+# Movers and macro news are the same for every user, so a background worker keeps
+# a snapshot of them warm and requests read it instead of fetching.
+# Each refresh spends two Alpha Vantage calls (movers and news), so by default the
+# interval spreads refreshes over the daily calls left after the interactive reserve
+# (every 3.2 hours on the free tier's 25 calls, 5 minutes once the quota allows it)
+SNAPSHOT_CALLS_PER_REFRESH = 2
+SNAPSHOT_REFRESH_SECONDS = int(os.getenv("SNAPSHOT_REFRESH_SECONDS", str(max(
+    300,
+    math.ceil(86400 * SNAPSHOT_CALLS_PER_REFRESH / max(ALPHAVANTAGE_CALLS_PER_DAY - ALPHAVANTAGE_INTERACTIVE_RESERVE, 1)),
+))))
+SNAPSHOT_STALE_SECONDS = int(os.getenv("SNAPSHOT_STALE_SECONDS", str(3 * SNAPSHOT_REFRESH_SECONDS)))
+# Seconds an AI answer is reused; the market context changes once per refresh
+AI_RESPONSE_CACHE_TTL = int(os.getenv("AI_RESPONSE_CACHE_TTL", str(SNAPSHOT_REFRESH_SECONDS)))
+ai.set_response_cache_ttl(AI_RESPONSE_CACHE_TTL)
+SNAPSHOT_BACKGROUND_REFRESH = os.getenv("SNAPSHOT_BACKGROUND_REFRESH", "true").lower() == "true"
+
+market_refresher = SnapshotRefresher(
+    fetch_movers=_refresh_top_movers,
+    fetch_news=_refresh_economic_news,
+    interval=SNAPSHOT_REFRESH_SECONDS,
+    stale_after=SNAPSHOT_STALE_SECONDS,
+)
+
+# Open /api/stream/market connections allowed per process
+MARKET_STREAM_MAX_CLIENTS = int(os.getenv("MARKET_STREAM_MAX_CLIENTS", "1000"))
+# Seconds between keep-alive comments on an idle market stream
+MARKET_STREAM_HEARTBEAT_SECONDS = int(os.getenv("MARKET_STREAM_HEARTBEAT_SECONDS", "25"))
+# Seconds a browser waits before reconnecting a dropped market stream
+MARKET_STREAM_RETRY_SECONDS = float(os.getenv("MARKET_STREAM_RETRY_SECONDS", "3"))
+
+# Every published snapshot is pushed to open pages as a diff
+market_broadcaster = MarketBroadcaster(
+    max_clients=MARKET_STREAM_MAX_CLIENTS,
+    heartbeat=MARKET_STREAM_HEARTBEAT_SECONDS,
+    retry=MARKET_STREAM_RETRY_SECONDS,
+)
+market_refresher.subscribe(market_broadcaster.publish)
+
+def get_market_snapshot():
+    """Latest movers/news snapshot; starts the background refresher on first use"""
+    if SNAPSHOT_BACKGROUND_REFRESH:
+        market_refresher.start()
+    return market_refresher.ensure_fresh()
+
+def _fetch_fallback(name: str, error: Exception):
+    """Value a fetch stage returns when its fetcher raised, matching the fetchers' own error results"""
+    if name == 'time_series':
+        return None, str(error)
+    return []
+
+def _fetch_symbols(symbols):
+    """
+    Fetch the time series and news of each symbol concurrently on the shared pool.
+
+    Each fetcher runs inside a copy of the caller's context, so request-scoped reuse
+    and the caller's upstream priority still apply. A failing fetcher yields the same
+    empty result it returns on upstream errors.
+
+    Returns:
+        Dict of symbol to {'time_series', 'search_error', 'symbol_news'}
+    """
+    def submit(func, *args):
+        ctx = contextvars.copy_context()
+        return fetch_executor.submit(ctx.run, func, *args)
+
+    futures = {}
+    for symbol in symbols:
+        futures[(symbol, 'time_series')] = submit(get_time_series_daily, symbol)
+        futures[(symbol, 'symbol_news')] = submit(get_symbol_news, symbol)
+
+    results = {}
+    for (symbol, name), future in futures.items():
+        try:
+            results[(symbol, name)] = future.result()
+        except Exception as e:
+            print(f"Error fetching {name} for {symbol}: {str(e)}")
+            results[(symbol, name)] = _fetch_fallback(name, e)
+
+    fetched = {}
+    for symbol in symbols:
+        time_series, search_error = results[(symbol, 'time_series')]
+        fetched[symbol] = {
+            'time_series': time_series,
+            'search_error': search_error,
+            'symbol_news': results[(symbol, 'symbol_news')],
+        }
+    return fetched
+
+def fetch_market_data(symbol: str = None):
+    """
+    Gather movers and economic news from the snapshot and, for a symbol, fetch its
+    time series and news concurrently.
+
+    Wall time is roughly that of the slowest call (see _fetch_symbols).
+    """
+    parts = _fetch_symbols([symbol])[symbol] if symbol else {}
+    snapshot = get_market_snapshot()
+    return {
+        'snapshot': snapshot,
+        'movers': snapshot.movers,
+        'news': snapshot.news,
+        'time_series': parts.get('time_series'),
+        'search_error': parts.get('search_error'),
+        'symbol_news': parts.get('symbol_news'),
+    }
+
+# Largest watchlist accepted by /api/symbols and basket consults
+MAX_BATCH_SYMBOLS = int(os.getenv("MAX_BATCH_SYMBOLS", "20"))
+# Headlines returned per symbol by /api/symbols
+BATCH_NEWS_LIMIT = int(os.getenv("BATCH_NEWS_LIMIT", "3"))
+
+_SYMBOL_PATTERN = re.compile(r'^[A-Z0-9][A-Z0-9.\-]{0,9}$')
+
+def parse_symbols(raw):
+    """
+    Parse a watchlist given as a comma-separated string or a list of symbols.
+
+    Returns:
+        Upper-cased symbols in their original order, without duplicates
+
+    Raises:
+        ValueError: If the list is empty, too long or contains an invalid symbol
+    """
+    items = raw.split(',') if isinstance(raw, str) else list(raw or [])
+    symbols = []
+    for item in items:
+        symbol = str(item).strip().upper()
+        if not symbol or symbol in symbols:
+            continue
+        if not _SYMBOL_PATTERN.match(symbol):
+            raise ValueError(f"Invalid symbol: {symbol}")
+        symbols.append(symbol)
+    if not symbols:
+        raise ValueError("No symbols given")
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        raise ValueError(f"At most {MAX_BATCH_SYMBOLS} symbols are allowed per request")
+    return symbols
+
+def _round(value, digits=4):
+    return None if value is None else round(value, digits)
+
+def compact_symbol_data(parts):
+    """Small JSON view of one symbol's series statistics and latest headlines"""
+    series = parts['time_series']
+    entry = {'error': None}
+    if series:
+        stats = series.summary()
+        entry.update({
+            'last_date': stats['last_date'],
+            'bars': stats['bars'],
+            'close': _round(stats['last_close']),
+            'returns': {
+                '1d': _round(stats['return_1d']),
+                '5d': _round(stats['return_5d']),
+                '1m': _round(stats['return_21d']),
+                '1y': _round(stats['return_252d']),
+            },
+            'volatility_21d': _round(stats['volatility_21d']),
+            'drawdown': _round(stats['drawdown']),
+            'range_52w_position': _round(stats['range_52w']['position']),
+        })
+    else:
+        error = parts['search_error']
+        entry['error'] = error if isinstance(error, str) else 'No data available'
+    entry['news'] = [
+        {key: article.get(key) for key in ('title', 'url', 'source', 'published_at')}
+        for article in (parts['symbol_news'] or [])[:BATCH_NEWS_LIMIT]
+    ]
+    return entry
+
+# Rendered movers/news fragments are reused until the snapshot version changes
+fragment_cache = TTLCache('fragments', ttl=SNAPSHOT_STALE_SECONDS, maxsize=32)
+
+def render_fragment(template, version, **context):
+    """Render a page fragment once per data version and reuse the HTML"""
+    key = (template, version)
+    html = fragment_cache.get(key)
+    if html is MISSING:
+        html = Markup(render_template(template, **context))
+        fragment_cache.set(key, html)
+    return html
+
+def render_index(snapshot, **context):
+    """
+    Render the main page around cached movers and news fragments.
+
+    The page's Last-Modified is the snapshot's fetch time (see conditional_response).
+    """
+    g.last_modified = snapshot.fetched_at
+    return render_template(
+        'index.html',
+        data=snapshot.movers,
+        news=snapshot.news,
+        movers_html=render_fragment('_movers.html', snapshot.version, data=snapshot.movers),
+        news_html=render_fragment('_news.html', snapshot.version, news=snapshot.news),
+        snapshot_status=market_refresher.status(),
+        market_stream_since=market_broadcaster.event_id(snapshot.version),
+        **context
+    )
+
+# Responses smaller than this many bytes are sent uncompressed
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+# zlib compression level for gzip responses (1 = fastest, 9 = smallest)
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+
+_COMPRESSIBLE = ('text/html', 'text/plain', 'text/css', 'application/json', 'application/javascript')
+
+@app.after_request
+def conditional_response(response):
+    """
+    Add ETag/Last-Modified to GET responses, answer matching revalidations
+    with 304 Not Modified, and gzip what is left to send.
+
+    Streamed responses (server-sent events) are passed through untouched.
+    """
+    if response.is_streamed or response.direct_passthrough or response.status_code != 200:
+        return response
+    if request.method in ('GET', 'HEAD'):
+        # Weak ETag: the same validator covers the plain and gzip-encoded bodies
+        response.set_etag(hashlib.blake2b(response.get_data(), digest_size=16).hexdigest(), weak=True)
+        if g.get('last_modified'):
+            response.last_modified = g.last_modified
+        if not response.cache_control.max_age:
+            # Let clients keep a copy, but revalidate it every time
+            response.cache_control.no_cache = True
+            response.cache_control.private = True
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+    response.vary.add('Accept-Encoding')
+    if (
+        'gzip' in request.headers.get('Accept-Encoding', '')
+        and response.mimetype in _COMPRESSIBLE
+        and 'Content-Encoding' not in response.headers
+        and response.content_length is not None
+        and response.content_length >= GZIP_MIN_SIZE
+    ):
+        response.set_data(gzip.compress(response.get_data(), compresslevel=GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@app.route('/api/snapshot')
+def snapshot_status():
+    """Version, age and staleness of the movers/news snapshot"""
+    return jsonify(market_refresher.status())
+
+@app.route('/api/stream/market')
+def market_stream():
+    """
+    Server-sent events with movers/news changes as each snapshot is published.
+
+    ?since=<event id> (or Last-Event-ID on reconnect) skips the full state
+    when the client is already up to date with this worker's snapshot.
+    """
+    subscription = market_broadcaster.subscribe()
+    if subscription is None:
+        return jsonify({'error': 'Too many open market streams'}), 503
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        snapshot = get_market_snapshot()
+    except Exception:
+        market_broadcaster.unsubscribe(subscription)
+        raise
+    # No stream_with_context: the stream holds no request state while it idles
+    return Response(
+        market_broadcaster.stream(subscription, snapshot, since),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/stream/stats')
+def market_stream_stats():
+    """Open market streams and diffs published"""
+    return jsonify(market_broadcaster.stats())
+
+def all_caches():
+    """Every TTLCache in the app, for stats and metrics"""
+    return [
+        movers_cache, news_cache, series_cache, symbol_news_cache,
+        context_harness.section_cache, forecasting.forecast_cache, fragment_cache, ai.response_cache,
+    ]
+
+def shared_caches():
+    """Every cross-worker SharedCache in use (none when SHARED_CACHE is off)"""
+    return [c for c in (shared_movers, shared_news, series_leases) if c is not None]
+
+# Requests slower than this many milliseconds are logged with their spans (0 = never)
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "2000"))
+
+http_request_seconds = REGISTRY.histogram(
+    'http_request_duration_seconds',
+    'Time to produce a response (streamed bodies: until the headers are sent)',
+    ['endpoint', 'method', 'status'],
+)
+
+@app.before_request
+def start_request_trace():
+    g.request_started = time.perf_counter()
+    metrics.begin_trace()
+
+@app.after_request
+def record_request_metrics(response):
+    """Observe request latency, and report the request's spans in a Server-Timing header"""
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or 'unmatched'
+    http_request_seconds.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+    trace = metrics.current_trace()
+    response.headers['Server-Timing'] = metrics.server_timing(trace, elapsed)
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        print(f"Slow request {request.method} {request.path}: {elapsed * 1000:.0f} ms {metrics.timings(trace)}")
+    return response
+
+def _collect_app_metrics():
+    """Gauges and counters read from the components' own stats at scrape time"""
+    caches = [cache.stats() for cache in all_caches()]
+    for field, kind, documentation in (
+        ('hits', 'counter', 'Cache lookups that found a live entry'),
+        ('misses', 'counter', 'Cache lookups that found nothing or an expired entry'),
+        ('evictions', 'counter', 'Cache entries evicted to stay within maxsize'),
+        ('size', 'gauge', 'Entries currently cached'),
+        ('hit_ratio', 'gauge', 'Hits over lookups since start'),
+    ):
+        suffix = '_total' if kind == 'counter' else ''
+        yield f"cache_{field}{suffix}", kind, documentation, [({'cache': c['name']}, c[field]) for c in caches]
+
+    shared = [cache.stats() for cache in shared_caches()]
+    for field, kind, documentation in (
+        ('hits', 'counter', 'Shared cache lookups that found a live entry'),
+        ('misses', 'counter', 'Shared cache lookups that found nothing or an expired entry'),
+        ('loads', 'counter', 'Values this worker loaded into the shared cache while holding the lease'),
+        ('lease_waits', 'counter', 'Times this worker waited for another worker holding a lease'),
+        ('lease_timeouts', 'counter', 'Lease waits that hit SHARED_CACHE_WAIT_SECONDS and loaded without the lease'),
+        ('size', 'gauge', 'Entries in the shared cache (all workers)'),
+    ):
+        suffix = '_total' if kind == 'counter' else ''
+        yield f"shared_cache_{field}{suffix}", kind, documentation, [({'cache': c['name']}, c[field]) for c in shared]
+
+    upstream = alpha_vantage.stats()
+    scheduler = upstream.get('scheduler', {})
+    yield 'upstream_in_flight', 'gauge', 'Alpha Vantage requests in flight', [({}, upstream['in_flight'])]
+    yield 'upstream_connections_reused_total', 'counter', 'Requests served on a kept-alive connection', [
+        ({}, upstream['connections_reused'])
+    ]
+    for field, documentation in (
+        ('admitted', 'Calls admitted by the rate-limit scheduler'),
+        ('rejected', 'Calls refused because no quota slot came up in time'),
+        ('throttled', 'Throttle messages received from Alpha Vantage'),
+    ):
+        yield f"upstream_scheduler_{field}_total", 'counter', documentation, [({}, scheduler.get(field))]
+    yield 'upstream_scheduler_waiting', 'gauge', 'Calls queued for a quota slot', [({}, scheduler.get('waiting'))]
+    yield 'upstream_quota_blocked_seconds', 'gauge', 'Seconds until the scheduler admits calls again', [
+        ({}, scheduler.get('blocked_for_seconds'))
+    ]
+
+    snapshot = market_refresher.status()
+    yield 'market_snapshot_version', 'gauge', 'Version of the movers/news snapshot', [({}, snapshot['version'])]
+    yield 'market_snapshot_age_seconds', 'gauge', 'Age of the movers/news snapshot', [({}, snapshot['age_seconds'])]
+    yield 'market_stream_clients', 'gauge', 'Open /api/stream/market connections', [
+        ({}, market_broadcaster.stats()['clients'])
+    ]
+    yield 'news_index_articles', 'gauge', 'Articles held in the news index', [({}, news_index.stats()['articles'])]
+    memory = conversation_memory.stats()
+    yield 'conversation_summaries_total', 'counter', 'Conversation summary updates', [
+        ({'outcome': 'ok'}, memory['summaries']), ({'outcome': 'error'}, memory['failures'])
+    ]
+
+REGISTRY.register_collector(_collect_app_metrics)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """All metrics in the Prometheus text format"""
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """Hit, miss and eviction counters for the upstream data, context section, page fragment and AI response caches"""
+    stats = {c.name: c.stats() for c in all_caches()}
+    stats['singleflight'] = upstream_flight.stats()
+    stats['shared'] = {c.name: c.stats() for c in shared_caches()}
+    stats['conversation_memory'] = conversation_memory.stats()
+    return jsonify(stats)
+
+@app.route('/api/upstream/stats')
+def upstream_stats():
+    """Call timing, retry, connection reuse and quota counters for the Alpha Vantage client"""
+    return jsonify(alpha_vantage.stats())
+
+@app.route('/api/symbols')
+def batch_symbols():
+    """Series statistics and headlines for a watchlist: ?symbols=AAPL,MSFT,..."""
+    try:
+        symbols = parse_symbols(request.args.get('symbols', ''))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    fetched = _fetch_symbols(symbols)
+    series = [parts['time_series'] for parts in fetched.values() if parts['time_series']]
+    return jsonify({
+        'symbols': {symbol: compact_symbol_data(parts) for symbol, parts in fetched.items()},
+        'average_correlation': _round(average_correlation(series)),
+    })
+
+NEWS_SEARCH_LIMIT = int(os.getenv("NEWS_SEARCH_LIMIT", "20"))
+
+@app.route('/api/news/search')
+def news_search():
+    """Search indexed articles: ?q=<terms>&ticker=<symbol>&limit=<n>"""
+    query = request.args.get('q', '').strip()
+    ticker = request.args.get('ticker', '').strip().upper() or None
+    if not query and not ticker:
+        return jsonify({'error': 'Provide a query (q) or a ticker'}), 400
+    limit = max(1, min(request.args.get('limit', NEWS_SEARCH_LIMIT, type=int), 100))
+    started = time.perf_counter()
+    articles = news_index.search(query, ticker=ticker, limit=limit)
+    took_ms = (time.perf_counter() - started) * 1000
+    return jsonify({
+        'query': query,
+        'ticker': ticker,
+        'count': len(articles),
+        'took_ms': round(took_ms, 3),
+        'results': [
+            {key: article[key] for key in ('title', 'url', 'source', 'published_at', 'overall_sentiment_score')}
+            for article in articles
+        ],
+    })
+
+@app.route('/api/news/stats')
+def news_stats():
+    """Size and ingest/search counters of the local news index"""
+    return jsonify(news_index.stats())
+
+@app.route('/api/forecast/<symbol>')
+def symbol_forecast(symbol):
+    """Model forecasts with intervals for a symbol: ?horizon=<business days>&confidence=<0-1>"""
+    try:
+        symbol = parse_symbols(symbol)[0]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    horizon = request.args.get('horizon', max(FORECAST_HORIZON, 1), type=int)
+    confidence = request.args.get('confidence', 0.8, type=float)
+    if not 1 <= horizon <= FORECAST_MAX_HORIZON:
+        return jsonify({'error': f"horizon must be between 1 and {FORECAST_MAX_HORIZON}"}), 400
+    if not 0 < confidence < 1:
+        return jsonify({'error': 'confidence must be between 0 and 1'}), 400
+    with upstream_priority(INTERACTIVE):
+        try:
+            series, error = get_time_series_daily(symbol)
+        except Exception as e:
+            series, error = None, str(e)
+    if not series:
+        return jsonify({'error': error if isinstance(error, str) else f"No data available for {symbol}"}), 404
+    result = forecasting.forecast(series, horizon, confidence)
+    if result is None:
+        return jsonify({'error': f"Not enough history to forecast {symbol}"}), 422
+    return jsonify(result)
+
+# Price rows shown when a symbol is searched; the rest load from /api/series
+SERIES_PAGE_SIZE = int(os.getenv("SERIES_PAGE_SIZE", "10"))
+# Largest page_size /api/series accepts
+SERIES_MAX_PAGE_SIZE = int(os.getenv("SERIES_MAX_PAGE_SIZE", "500"))
+
+def _iso_date(name):
+    """Optional ISO date query parameter, as a string"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"{name} must be a date in YYYY-MM-DD format")
+
+@app.route('/api/series/<symbol>')
+def symbol_series(symbol):
+    """
+    Page through a symbol's price history, newest first.
+
+    Query parameters: start/end (inclusive dates), before (exclusive date, for
+    "load more"), interval (daily, weekly or monthly), page and page_size.
+    """
+    try:
+        symbol = parse_symbols(symbol)[0]
+        start, end, before = _iso_date('start'), _iso_date('end'), _iso_date('before')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    interval = request.args.get('interval', 'daily')
+    page = request.args.get('page', 1, type=int)
+    page_size = request.args.get('page_size', SERIES_PAGE_SIZE, type=int)
+    if interval not in INTERVALS:
+        return jsonify({'error': f"interval must be one of {', '.join(INTERVALS)}"}), 400
+    if page < 1 or not 1 <= page_size <= SERIES_MAX_PAGE_SIZE:
+        return jsonify({'error': f"page must be positive and page_size between 1 and {SERIES_MAX_PAGE_SIZE}"}), 400
+    with upstream_priority(INTERACTIVE):
+        try:
+            series, error = get_time_series_daily(symbol)
+        except Exception as e:
+            series, error = None, str(e)
+    if not series:
+        return jsonify({'error': error if isinstance(error, str) else f"No data available for {symbol}"}), 404
+
+    bars = series.between(start, end).resample(interval)
+    if before:
+        # Cut after resampling: `before` is the date of the oldest bar already shown
+        bars = bars.between(None, (date.fromisoformat(before) - timedelta(days=1)).isoformat())
+    total = len(bars)
+    stop = max(total - (page - 1) * page_size, 0)
+    window = bars[max(stop - page_size, 0):stop]
+    rows = [
+        {key: _round(value) if isinstance(value, float) else value for key, value in row.items()}
+        for row in window.rows()
+    ]
+    return jsonify({
+        'symbol': symbol,
+        'interval': interval,
+        'page': page,
+        'page_size': page_size,
+        'total': total,
+        'pages': -(-total // page_size),
+        'has_more': stop - page_size > 0,
+        'rows': rows,
+    })
+
+@app.route('/api/sentiment')
+def sentiment_scores():
+    """Time-decayed news sentiment per ticker and topic: ?tickers=AAPL,MSFT (default: most covered)"""
+    tickers = None
+    if request.args.get('tickers'):
+        try:
+            tickers = parse_symbols(request.args['tickers'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'tickers': news_sentiment.tickers(tickers),
+        'topics': news_sentiment.topics(),
+        'stats': news_sentiment.stats(),
+    })
 
 @app.route('/search')
 def search():
     symbol = request.args.get('symbol','').upper()
-    time_series = None
-    error = None
-    symbol_news = None
     if symbol:
-        time_series, error = get_time_series_daily(symbol)
-        # Fetch symbol-specific news
-        symbol_news = get_symbol_news(symbol)
         # Store searched symbol in session for AI context
         session['current_symbol'] = symbol
         session.modified = True
@@ -175,46 +900,146 @@ def search():
         # Clear symbol if no search
         session.pop('current_symbol', None)
         session.modified = True
-    movers = get_top_movers()
-    news = get_economic_news()
-    return render_template(
-        'index.html',
-        data= movers,
+    # Fetch movers, news and the symbol's series and news in parallel;
+    # interactive lookups are admitted ahead of background refreshes
+    with upstream_priority(INTERACTIVE):
+        market = fetch_market_data(symbol)
+    chat = chat_page()
+    return render_index(
+        market['snapshot'],
         symbol= symbol,
-        time_series = time_series,
-        search_error= error,
+        time_series = market['time_series'],
+        search_error= market['search_error'],
         question=None,
         answer=None,
         ai_error=None,
-        chat_history=session.get('chat_history', []),
-        news=news,
-        symbol_news=symbol_news
+        chat_history=chat.messages,
+        chat_has_more=chat.has_more,
+        symbol_news=market['symbol_news'],
+        series_page_size=SERIES_PAGE_SIZE,
     )
 
 @app.route('/')
 def index():
     """Main page displaying top movers"""
-    # Initialize chat history if it doesn't exist
-    if 'chat_history' not in session:
-        session['chat_history'] = []
     # Clear any previous symbol search when going to main page
     session.pop('current_symbol', None)
     session.modified = True
-    data = get_top_movers()
-    news = get_economic_news()
-    return render_template(
-        'index.html',
-        data=data,
+    market = fetch_market_data()
+    chat = chat_page()
+    return render_index(
+        market['snapshot'],
         symbol=None,
         time_series=None,
         search_error=None,
         question=None,
         answer=None,
         ai_error=None,
-        chat_history=session.get('chat_history', []),
-        news=news,
-        symbol_news=None
+        chat_history=chat.messages,
+        chat_has_more=chat.has_more,
+        symbol_news=None,
+    )
+
+def resolve_consult_symbol(data):
+    """Symbol the user is focused on: request body > session > query param"""
+    if data and data.get('symbol'):
+        return data.get('symbol').upper().strip()
+    if session.get('current_symbol'):
+        return session.get('current_symbol')
+    return request.args.get('symbol', '').upper() or None
+
+def resolve_consult_symbols(data):
+    """
+    Basket the user asked about, if any, from the request body's 'symbols'.
+
+    Returns:
+        Parsed symbols, or None when no basket was given
+
+    Raises:
+        ValueError: If the basket is invalid (see parse_symbols)
+    """
+    raw = data.get('symbols') if data else None
+    return parse_symbols(raw) if raw else None
+
+def sentiment_context(symbols=()):
+    """Sentiment of the given tickers plus every topic, for AI context"""
+    return {'tickers': news_sentiment.tickers(symbols), 'topics': news_sentiment.topics()}
+
+def snapshot_versions(snapshot):
+    """Context-section versions for data that comes from the market snapshot"""
+    return {'movers': ('snapshot', snapshot.version), 'news': ('snapshot', snapshot.version)}
+
+def build_consult_context(symbol, symbols=None):
+    """
+    Gather market data (plus the symbol's series and news) and format it as AI prompt context.
+
+    When a list of symbols (already parsed) is given, the whole basket is summarized instead.
+    """
+    if symbols:
+        fetched = _fetch_symbols(symbols)
+        snapshot = get_market_snapshot()
+        formatted = context_harness.format_basket_context(
+            {symbol: parts['time_series'] for symbol, parts in fetched.items()},
+            symbol_news={symbol: parts['symbol_news'] for symbol, parts in fetched.items()},
+            top_movers=snapshot.movers,
+            news=snapshot.news,
+            versions=snapshot_versions(snapshot),
+            sentiment=sentiment_context(fetched)
+        )
+        return context_harness.create_ai_context_prompt(formatted)
+    market = fetch_market_data(symbol)
+    context_data = context_harness.get_full_context_data(
+        top_movers=market['movers'],
+        time_series=market['time_series'],
+        symbol=symbol,
+        news=market['news'],
+        symbol_news=market['symbol_news'],
+        token_budget=AI_CONTEXT_TOKEN_BUDGET,
+        versions=snapshot_versions(market['snapshot']),
+        sentiment=sentiment_context([symbol] if symbol else []),
+        forecast_horizon=FORECAST_HORIZON
     )
+    return context_data['ai_prompt_addition']
+
+# Business days of model forecasts included in the AI context (0 = none)
+FORECAST_HORIZON = int(os.getenv("FORECAST_HORIZON", "5"))
+# Longest horizon /api/forecast accepts
+FORECAST_MAX_HORIZON = int(os.getenv("FORECAST_MAX_HORIZON", "30"))
+
+# Estimated token cap for the market context sent with each question (0 = no cap)
+AI_CONTEXT_TOKEN_BUDGET = int(os.getenv("AI_CONTEXT_TOKEN_BUDGET", "0"))
+
+def _chat_id():
+    """Stable id for the current session's conversation, created on first use"""
+    if 'chat_id' not in session:
+        session['chat_id'] = uuid.uuid4().hex
+    return session['chat_id']
+
+def chat_page(before=None):
+    """A page of the current session's chat history (newest messages by default)"""
+    chat_id = session.get('chat_id')
+    if not chat_id:
+        return ChatPage()
+    return chat_store.page(chat_id, limit=CHAT_PAGE_SIZE, before=before)
+
+@app.before_request
+def drop_cookie_chat_history():
+    """Sessions created before the server-side store kept the whole history in the cookie"""
+    if 'chat_history' in session:
+        session.pop('chat_history')
+        session.modified = True
+
+@app.route('/api/chat/history')
+def chat_history():
+    """Older chat messages, one page at a time: ?before=<message id>"""
+    before = request.args.get('before', type=int)
+    page = chat_page(before)
+    return jsonify({'messages': page.messages, 'has_more': page.has_more, 'before': page.oldest_id})
+
+def _sse(payload, event=None):
+    """Format one server-sent event"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(payload)}\n\n"
 
 @app.route('/api/consult', methods=['POST'])
 def api_consult():
@@ -222,50 +1047,21 @@ def api_consult():
     data = request.get_json()
     question = data.get('question', '').strip() if data else ''
     
-    # Initialize chat history if it doesn't exist
-    if 'chat_history' not in session:
-        session['chat_history'] = []
-    
     if not question:
         return jsonify({'error': 'Question cannot be empty'}), 400
+    try:
+        symbols = resolve_consult_symbols(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        # Gather current market data for context (reuse same data for UI and AI)
-        movers = get_top_movers()
-        news = get_economic_news()
-        
-        # Get time series if symbol was searched (from request body, session, or query param)
-        time_series = None
-        symbol = None
-        symbol_news = None
+        # The user is waiting on these lookups, so they go ahead of background refreshes
+        with upstream_priority(INTERACTIVE):
+            market_context = build_consult_context(resolve_consult_symbol(data), symbols)
+        recall = conversation_memory.recall(session.get('chat_id'))
         
-        # Priority: request body > session > query param
-        if data and data.get('symbol'):
-            symbol = data.get('symbol').upper().strip()
-        elif session.get('current_symbol'):
-            symbol = session.get('current_symbol')
-        else:
-            searched_symbol = request.args.get('symbol', '').upper()
-            if searched_symbol:
-                symbol = searched_symbol
-        
-        # Fetch time series and symbol-specific news if we have a symbol
-        if symbol:
-            time_series, _ = get_time_series_daily(symbol)
-            symbol_news = get_symbol_news(symbol)
-        
-        # Format market context for AI
-        context_data = context_harness.get_full_context_data(
-            top_movers=movers,
-            time_series=time_series,
-            symbol=symbol,
-            news=news,
-            symbol_news=symbol_news
-        )
-        
-        # Get AI response with market context
-        market_context = context_data['ai_prompt_addition']
-        answer = ai.respond(question, context=market_context)
+        # Get AI response with market context and the conversation so far
+        answer = ai.respond(question, context=market_context, history=recall.turns, summary=recall.summary)
         
         message = {
             'question': question,
@@ -273,8 +1069,7 @@ def api_consult():
             'error': None
         }
         # Add to chat history
-        session['chat_history'].append(message)
-        session.modified = True
+        chat_store.append(_chat_id(), question, answer=answer)
         return jsonify(message)
     except Exception as e:
         error_msg = str(e)
@@ -284,88 +1079,132 @@ def api_consult():
             'error': error_msg
         }
         # Add error to chat history
-        session['chat_history'].append(message)
-        session.modified = True
+        chat_store.append(_chat_id(), question, error=error_msg)
         return jsonify(message), 500
 
+@app.route('/api/consult/stream', methods=['POST'])
+def api_consult_stream():
+    """Streaming chat endpoint - forwards answer tokens as server-sent events"""
+    started = time.perf_counter()
+    data = request.get_json(silent=True)
+    question = data.get('question', '').strip() if data else ''
+    
+    if not question:
+        return jsonify({'error': 'Question cannot be empty'}), 400
+    try:
+        symbols = resolve_consult_symbols(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    chat_id = _chat_id()
+    try:
+        # The user is waiting on these lookups, so they go ahead of background refreshes
+        with upstream_priority(INTERACTIVE):
+            market_context = build_consult_context(resolve_consult_symbol(data), symbols)
+        recall = conversation_memory.recall(chat_id)
+        context_error = None
+    except Exception as e:
+        market_context = recall = None
+        context_error = str(e)
+    
+    trace = metrics.current_trace()
+    
+    def generate():
+        parts = []
+        error = context_error
+        first_token_ms = None
+        try:
+            if error is None:
+                for delta in ai.respond_stream(
+                    question, context=market_context, history=recall.turns, summary=recall.summary
+                ):
+                    if first_token_ms is None:
+                        first_token_ms = round((time.perf_counter() - started) * 1000)
+                    parts.append(delta)
+                    yield _sse({'delta': delta})
+        except Exception as e:
+            error = str(e)
+        finally:
+            # Runs on completion, on error and when the client disconnects mid-stream
+            message = {
+                'question': question,
+                'answer': ''.join(parts) if error is None else None,
+                'error': error
+            }
+            chat_store.append(chat_id, question, answer=message['answer'], error=error)
+        # The response headers went out before the answer, so its timings travel in the event
+        timings = metrics.timings(trace)
+        timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+        yield _sse(dict(message, ttft_ms=first_token_ms, timings=timings), event='error' if error else 'done')
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/consult', methods=['POST'])
 def consult():
     """Legacy form endpoint - uses context harness for consistency"""
     question = request.form.get('question', '')
     
-    # Initialize chat history if it doesn't exist
-    if 'chat_history' not in session:
-        session['chat_history'] = []
+    # Get symbol from session if available
+    symbol = session.get('current_symbol') if question else None
+    # Gather current market data once and reuse it for both the AI context and the page;
+    # the user is waiting on these lookups, so they go ahead of background refreshes
+    with upstream_priority(INTERACTIVE):
+        market = fetch_market_data(symbol)
     
     if question:
         try:
-            # Gather current market data for context (reuse same data for UI and AI)
-            movers = get_top_movers()
-            news = get_economic_news()
-            
-            # Get symbol from session if available
-            symbol = session.get('current_symbol')
-            time_series = None
-            symbol_news = None
-            if symbol:
-                time_series, _ = get_time_series_daily(symbol)
-                symbol_news = get_symbol_news(symbol)
-            
             # Format market context for AI
             context_data = context_harness.get_full_context_data(
-                top_movers=movers,
-                time_series=time_series,
+                top_movers=market['movers'],
+                time_series=market['time_series'],
                 symbol=symbol,
-                news=news,
-                symbol_news=symbol_news
+                news=market['news'],
+                symbol_news=market['symbol_news'],
+                token_budget=AI_CONTEXT_TOKEN_BUDGET,
+                versions=snapshot_versions(market['snapshot']),
+                sentiment=sentiment_context([symbol] if symbol else []),
+                forecast_horizon=FORECAST_HORIZON
             )
             
-            # Get AI response with market context
+            # Get AI response with market context and the conversation so far
             market_context = context_data['ai_prompt_addition']
-            answer = ai.respond(question, context=market_context)
+            recall = conversation_memory.recall(session.get('chat_id'))
+            answer = ai.respond(question, context=market_context, history=recall.turns, summary=recall.summary)
             
             # Add to chat history
-            session['chat_history'].append({
-                'question': question,
-                'answer': answer,
-                'error': None
-            })
+            chat_store.append(_chat_id(), question, answer=answer)
         except Exception as e:
             error_msg = str(e)
             # Add error to chat history
-            session['chat_history'].append({
-                'question': question,
-                'answer': None,
-                'error': error_msg
-            })
-        # Mark session as modified
-        session.modified = True
+            chat_store.append(_chat_id(), question, error=error_msg)
     
-    movers = get_top_movers()
-    news = get_economic_news()
-    return render_template(
-        'index.html',
-        data=movers,
+    chat = chat_page()
+    return render_index(
+        market['snapshot'],
         symbol=None,
         time_series=None,
         search_error=None,
         question='',  # Clear the input after submission
         answer=None,
         ai_error=None,
-        chat_history=session.get('chat_history', []),
-        news=news,
-        symbol_news=None
+        chat_history=chat.messages,
+        chat_has_more=chat.has_more,
+        symbol_news=None,
     )
 
 @app.route('/clear_chat', methods=['POST'])
 def clear_chat():
     """Clear the chat history"""
-    session['chat_history'] = []
-    session.modified = True
-    news = get_economic_news()
-    return render_template(
-        'index.html',
-        data=get_top_movers(),
+    chat_id = session.get('chat_id')
+    if chat_id:
+        chat_store.clear(chat_id)
+    market = fetch_market_data()
+    return render_index(
+        market['snapshot'],
         symbol=None,
         time_series=None,
         search_error=None,
@@ -373,8 +1212,8 @@ def clear_chat():
         answer=None,
         ai_error=None,
         chat_history=[],
-        news=news,
-        symbol_news=None
+        chat_has_more=False,
+        symbol_news=None,
     )
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=3000)
@@ -0,0 +1,109 @@
+"""
+Fake Alpha Vantage Server
+
+Serves the /query endpoint from bench/fixtures.py with a configurable
+latency, so the app can be load-tested without spending API quota. Point the
+app at it with ALPHAVANTAGE_BASE_URL=http://127.0.0.1:<port>/query.
+
+    python -m bench.fake_alphavantage --port 8801 --latency 0.15
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple, Union
+from urllib.parse import parse_qsl, urlsplit
+
+from bench import fixtures
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: "FakeAlphaVantage"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip('/') != '/query':
+            self._send(404, {'error': 'not found'})
+            return
+        params = dict(parse_qsl(url.query))
+        self.server.wait()
+        if self.server.throttle_rate and random.random() < self.server.throttle_rate:
+            body = {'Note': 'Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute.'}
+        else:
+            body = self.server.payload(params)
+        self._send(200, body)
+
+    def _send(self, status: int, payload: Union[Dict, bytes]) -> None:
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeAlphaVantage(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering Alpha Vantage queries from fixtures.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], latency: float = 0.1, jitter: float = 0.05, throttle_rate: float = 0.0):
+        """
+        Args:
+            address: (host, port) to listen on; port 0 picks a free port
+            latency: Seconds added to every response
+            jitter: Up to this many extra seconds, drawn uniformly per response
+            throttle_rate: Fraction of responses replaced by a quota "Note"
+        """
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self._lock = threading.Lock()
+        # Encoded payloads, so serving stays cheap next to the app under test
+        self._payloads: Dict[Tuple, bytes] = {}
+        self.requests = 0
+
+    def wait(self) -> None:
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+
+    def payload(self, params: Dict[str, str]) -> bytes:
+        key = tuple(sorted((k, v) for k, v in params.items() if k != 'apikey'))
+        with self._lock:
+            body = self._payloads.get(key)
+        if body is None:
+            body = json.dumps(fixtures.response_for(params)).encode()
+            with self._lock:
+                self._payloads[key] = body
+        return body
+
+
+def start(port: int = 0, **options) -> FakeAlphaVantage:
+    """Start a server on a background thread and return it (server.server_port has the port)"""
+    server = FakeAlphaVantage(('127.0.0.1', port), **options)
+    threading.Thread(target=server.serve_forever, name='fake-alphavantage', daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake Alpha Vantage server for benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8801)
+    parser.add_argument('--latency', type=float, default=0.1, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Maximum extra random latency in seconds')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of responses that are quota notes')
+    args = parser.parse_args()
+    server = FakeAlphaVantage((args.host, args.port), args.latency, args.jitter, args.throttle_rate)
+    print(f"Fake Alpha Vantage on http://{args.host}:{server.server_port}/query")
+    server.serve_forever()
@@ -0,0 +1,156 @@
+"""
+Fake OpenAI Server
+
+Answers POST /v1/chat/completions like the OpenAI API, streaming or not, with
+a configurable delay before the first token and between tokens. Usage counts
+are estimated from the request, so token metrics still move. Point the app at
+it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 (the OpenAI client reads
+that variable itself).
+
+    python -m bench.fake_openai --port 8802 --first-token 0.4 --token-delay 0.01
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+_WORDS = (
+    "Markets are weighing slower growth against easing inflation. For this symbol, recent returns and "
+    "volatility suggest staying diversified, sizing positions modestly and watching the next earnings "
+    "report and central bank meeting before adding risk."
+).split()
+
+
+def _prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    # Same rough four-characters-per-token estimate the context harness uses
+    return sum(len(str(message.get('content') or '')) for message in messages) // 4 + 3 * len(messages)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: "FakeOpenAI"
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._json(404, {'error': {'message': 'not found'}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        self.server.count()
+        words = _WORDS * (self.server.tokens // len(_WORDS) + 1)
+        tokens = [word + ' ' for word in words[:self.server.tokens]]
+        usage = {
+            'prompt_tokens': _prompt_tokens(request.get('messages', [])),
+            'completion_tokens': len(tokens),
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        meta = {'id': f"chatcmpl-{uuid.uuid4().hex[:24]}", 'created': int(time.time()), 'model': request.get('model', 'fake')}
+        if request.get('stream'):
+            include_usage = (request.get('stream_options') or {}).get('include_usage')
+            self._stream(meta, tokens, usage if include_usage else None)
+            return
+        time.sleep(self.server.first_token + self.server.token_delay * len(tokens))
+        self._json(200, dict(
+            meta,
+            object='chat.completion',
+            choices=[{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ''.join(tokens).strip()},
+                'finish_reason': 'stop',
+            }],
+            usage=usage,
+        ))
+
+    def _json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, meta: Dict[str, Any], tokens: List[str], usage: Any) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def send(payload: Any) -> None:
+            data = f"data: {payload if isinstance(payload, str) else json.dumps(payload)}\n\n".encode()
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(delta: Dict[str, Any], finish_reason: Any = None) -> Dict[str, Any]:
+            return dict(meta, object='chat.completion.chunk', choices=[
+                {'index': 0, 'delta': delta, 'finish_reason': finish_reason}
+            ])
+
+        try:
+            time.sleep(self.server.first_token)
+            send(chunk({'role': 'assistant', 'content': ''}))
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(self.server.token_delay)
+                send(chunk({'content': token}))
+            send(chunk({}, 'stop'))
+            if usage is not None:
+                send(dict(meta, object='chat.completion.chunk', choices=[], usage=usage))
+            send('[DONE]')
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The app stopped reading (client went away)
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    """
+    Threaded HTTP server imitating the chat completions endpoint.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], first_token: float = 0.3, token_delay: float = 0.01, tokens: int = 120):
+        """
+        Args:
+            address: (host, port) to listen on; port 0 picks a free port
+            first_token: Seconds before the first token (or, unstreamed, before the answer starts)
+            token_delay: Seconds between tokens
+            tokens: Completion length in tokens
+        """
+        super().__init__(address, _Handler)
+        self.first_token = first_token
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+
+def start(port: int = 0, **options) -> FakeOpenAI:
+    """Start a server on a background thread and return it (server.server_port has the port)"""
+    server = FakeOpenAI(('127.0.0.1', port), **options)
+    threading.Thread(target=server.serve_forever, name='fake-openai', daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake OpenAI chat completions server for benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8802)
+    parser.add_argument('--first-token', type=float, default=0.3, help='Seconds before the first token')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='Seconds between tokens')
+    parser.add_argument('--tokens', type=int, default=120, help='Tokens per answer')
+    args = parser.parse_args()
+    server = FakeOpenAI((args.host, args.port), args.first_token, args.token_delay, args.tokens)
+    print(f"Fake OpenAI on http://{args.host}:{server.server_port}/v1")
+    server.serve_forever()
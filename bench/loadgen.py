@@ -0,0 +1,197 @@
+"""
+Load Generator
+
+Drives a running app with concurrent clients and reports latency
+percentiles and throughput per scenario. Each client keeps its own session
+(cookies included), so chat history and searched symbols behave as they
+would for separate users.
+
+    python -m bench.loadgen --url http://127.0.0.1:3000 --concurrency 50 --duration 30
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+
+from bench.fixtures import SYMBOLS
+
+QUESTIONS = (
+    "How is this stock doing compared to the market?",
+    "What do the latest headlines mean for the economy?",
+    "Should I worry about volatility right now?",
+    "Summarize today's top movers.",
+    "What is the outlook for the next week?",
+)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """One kind of request, picked by weight"""
+    name: str
+    weight: float
+    send: Callable[[requests.Session, str, int], requests.Response]
+
+
+def _index(session: requests.Session, base_url: str, n: int) -> requests.Response:
+    return session.get(f"{base_url}/")
+
+
+def _search(session: requests.Session, base_url: str, n: int) -> requests.Response:
+    return session.get(f"{base_url}/search", params={'symbol': random.choice(SYMBOLS)})
+
+
+def _consult(unique: bool):
+    def send(session: requests.Session, base_url: str, n: int) -> requests.Response:
+        question = random.choice(QUESTIONS)
+        if unique:
+            # Distinct questions get past the AI response cache
+            question += f" (request {n})"
+        return session.post(f"{base_url}/api/consult", json={'question': question, 'symbol': random.choice(SYMBOLS)})
+    return send
+
+
+def default_scenarios(consult_weight: float = 1.0, unique_questions: bool = True) -> List[Scenario]:
+    """The page, a symbol search and a consult, in a 4:3:1 mix by default"""
+    scenarios = [Scenario('index', 4.0, _index), Scenario('search', 3.0, _search)]
+    if consult_weight:
+        scenarios.append(Scenario('consult', consult_weight, _consult(unique_questions)))
+    return scenarios
+
+
+@dataclass
+class Result:
+    """Latencies and failures per scenario"""
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    errors: Dict[str, int] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Count, errors, throughput and latency percentiles (ms) per scenario and in total"""
+        rows = {}
+        groups = dict(self.latencies)
+        groups['total'] = list(itertools.chain.from_iterable(self.latencies.values()))
+        for name, values in groups.items():
+            errors = sum(self.errors.values()) if name == 'total' else self.errors.get(name, 0)
+            samples = np.array(values) * 1000 if values else np.zeros(1)
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+            rows[name] = {
+                'requests': len(values),
+                'errors': errors,
+                'rps': round(len(values) / self.elapsed, 1) if self.elapsed else 0.0,
+                'mean_ms': round(float(samples.mean()), 1),
+                'p50_ms': round(float(p50), 1),
+                'p95_ms': round(float(p95), 1),
+                'p99_ms': round(float(p99), 1),
+                'max_ms': round(float(samples.max()), 1),
+            }
+        return rows
+
+
+def run(
+    base_url: str,
+    scenarios: Sequence[Scenario],
+    concurrency: int = 20,
+    duration: float = 30.0,
+    requests_limit: Optional[int] = None,
+    warmup: float = 2.0,
+    timeout: float = 60.0,
+) -> Result:
+    """
+    Send requests from concurrent clients until the duration or request limit is reached.
+
+    Args:
+        base_url: App address, e.g. http://127.0.0.1:3000
+        scenarios: Request kinds to mix
+        concurrency: Simultaneous clients
+        duration: Seconds to measure for
+        requests_limit: Stop after this many measured requests instead
+        warmup: Seconds of unmeasured load first (fills caches and the series store)
+        timeout: Per-request timeout in seconds
+
+    Returns:
+        Result with latencies of successful requests and error counts
+    """
+    base_url = base_url.rstrip('/')
+    weights = [scenario.weight for scenario in scenarios]
+    result = Result(latencies={s.name: [] for s in scenarios}, errors={s.name: 0 for s in scenarios})
+    lock = threading.Lock()
+    counter = itertools.count()
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+    stop = threading.Event()
+
+    def client() -> None:
+        session = requests.Session()
+        while not stop.is_set():
+            scenario = random.choices(scenarios, weights)[0]
+            n = next(counter)
+            start = time.perf_counter()
+            try:
+                response = scenario.send(session, base_url, n)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            end = time.perf_counter()
+            if start < measure_from:
+                continue
+            if end > deadline and requests_limit is None:
+                break
+            with lock:
+                if ok:
+                    result.latencies[scenario.name].append(end - start)
+                else:
+                    result.errors[scenario.name] += 1
+                done = sum(map(len, result.latencies.values())) + sum(result.errors.values())
+            if requests_limit is not None and done >= requests_limit:
+                stop.set()
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=duration + warmup + timeout if requests_limit is None else None)
+    result.elapsed = time.perf_counter() - measure_from
+    return result
+
+
+def format_report(summary: Dict[str, Dict[str, Any]]) -> str:
+    """Plain-text table of a Result.summary()"""
+    columns = ('requests', 'errors', 'rps', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+    lines = [f"{'scenario':<10}" + ''.join(f"{column:>10}" for column in columns)]
+    for name, row in summary.items():
+        lines.append(f"{name:<10}" + ''.join(f"{row[column]:>10}" for column in columns))
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> Tuple[Result, Dict[str, Dict[str, Any]]]:
+    parser = argparse.ArgumentParser(description='Concurrent load generator for the app')
+    parser.add_argument('--url', default='http://127.0.0.1:3000', help='App base URL')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=30.0, help='Measured seconds')
+    parser.add_argument('--requests', type=int, help='Stop after this many measured requests instead')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Unmeasured seconds before measuring')
+    parser.add_argument('--consult-weight', type=float, default=1.0, help='Relative share of /api/consult (0 = none)')
+    parser.add_argument('--cached-questions', action='store_true', help='Repeat questions so AI answers can be cached')
+    parser.add_argument('--json', metavar='PATH', help='Also write the summary as JSON')
+    args = parser.parse_args(argv)
+
+    scenarios = default_scenarios(args.consult_weight, unique_questions=not args.cached_questions)
+    result = run(args.url, scenarios, args.concurrency, args.duration, args.requests, args.warmup)
+    summary = result.summary()
+    print(format_report(summary))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+    return result, summary
+
+
+if __name__ == '__main__':
+    main()
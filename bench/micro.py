@@ -0,0 +1,160 @@
+"""
+Context Harness Micro-Benchmarks
+
+Times the context_harness serializers on fixture data, so a slower
+formatter shows up as a number rather than as vague request latency. Results
+can be saved and compared against a baseline:
+
+    python -m bench.micro --json baseline.json
+    python -m bench.micro --compare baseline.json --threshold 0.2
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import context_harness
+import forecasting
+from bench import fixtures
+from news_index import parse_news_feed
+from timeseries import DailySeries
+
+BASKET = fixtures.SYMBOLS[:5]
+
+
+def _data(symbol: str) -> Dict[str, Any]:
+    """Parsed fixture inputs, shaped the way the app passes them to the harness"""
+    movers = fixtures.response_for({'function': 'TOP_GAINERS_LOSERS'})
+    payload = fixtures.response_for({'function': 'TIME_SERIES_DAILY_ADJUSTED', 'symbol': symbol, 'outputsize': 'full'})
+    macro = fixtures.response_for({'function': 'NEWS_SENTIMENT', 'topics': 'economy_macro'})
+    symbol_payload = fixtures.response_for({'function': 'NEWS_SENTIMENT', 'tickers': symbol})
+    basket = {}
+    for ticker in BASKET:
+        raw = fixtures.response_for({'function': 'TIME_SERIES_DAILY_ADJUSTED', 'symbol': ticker, 'outputsize': 'full'})
+        basket[ticker] = DailySeries.from_alpha_vantage(ticker, raw['Time Series (Daily)'])
+    return {
+        'movers': {key: movers[key][:10] for key in ('top_gainers', 'top_losers', 'most_actively_traded')},
+        'series': DailySeries.from_alpha_vantage(symbol, payload['Time Series (Daily)']),
+        'news': parse_news_feed(macro),
+        'symbol_news': parse_news_feed(symbol_payload),
+        'basket': basket,
+    }
+
+
+def _cold() -> None:
+    context_harness.section_cache.clear()
+    forecasting.forecast_cache.clear()
+
+
+def cases(symbol: str = 'AAPL') -> List[Tuple[str, Callable[[], Any], Optional[Callable[[], None]]]]:
+    """(name, function, setup run before every call) for each benchmark"""
+    d = _data(symbol)
+    # The app versions movers and news by snapshot, so only the symbol sections are fingerprinted
+    versions = {'movers': ('snapshot', 1), 'news': ('snapshot', 1)}
+    context = context_harness.format_market_context(d['movers'], d['series'], symbol, d['news'], d['symbol_news'], versions)
+
+    def market_context():
+        return context_harness.format_market_context(d['movers'], d['series'], symbol, d['news'], d['symbol_news'], versions)
+
+    def packed_context():
+        return context_harness.pack_market_context(d['movers'], d['series'], symbol, d['news'], d['symbol_news'], versions=versions)
+
+    def basket_context():
+        return context_harness.format_basket_context(d['basket'], top_movers=d['movers'], news=d['news'], versions=versions)
+
+    return [
+        ('serialize_movers', lambda: context_harness.serialize_movers(d['movers']), None),
+        ('serialize_time_series', lambda: context_harness.serialize_time_series(d['series'], symbol), None),
+        ('serialize_series_stats', lambda: context_harness.serialize_series_stats(d['series'], symbol), None),
+        ('serialize_news', lambda: context_harness.serialize_news(d['news']), None),
+        ('serialize_symbol_news', lambda: context_harness.serialize_symbol_news(d['symbol_news'], symbol), None),
+        ('format_market_context/cold', market_context, _cold),
+        ('format_market_context/memo', market_context, None),
+        ('pack_market_context/cold', packed_context, _cold),
+        ('pack_market_context/memo', packed_context, None),
+        ('format_basket_context/cold', basket_context, _cold),
+        ('format_basket_context/memo', basket_context, None),
+        ('estimate_tokens', lambda: context_harness.estimate_tokens(context), None),
+    ]
+
+
+def measure(func: Callable[[], Any], setup: Optional[Callable[[], None]] = None, min_time: float = 0.2, repeat: int = 5) -> float:
+    """
+    Best per-call time of a function in microseconds.
+
+    Args:
+        func: Function to time
+        setup: Run untimed before every call (e.g. clearing caches for a cold run)
+        min_time: Seconds each repeat should take at least, which sets the loop count
+        repeat: Repeats to take the best of
+
+    Returns:
+        Fastest per-call time in microseconds
+    """
+    if setup is None:
+        func()  # warm the memo for "hit" cases
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        number = max(1, int(number * min_time / 0.2))
+        return min(timer.repeat(repeat, number)) / number * 1e6
+    best = float('inf')
+    for _ in range(repeat):
+        timer = timeit.Timer(func, setup)
+        # A setup per call means one call per timing; take several and keep the best
+        best = min(best, min(timer.repeat(max(3, int(min_time * 50)), 1)))
+    return best * 1e6
+
+
+def run(symbol: str = 'AAPL', only: Optional[Sequence[str]] = None, min_time: float = 0.2) -> Dict[str, float]:
+    """Microseconds per call for each benchmark (optionally only names containing one of `only`)"""
+    results = {}
+    for name, func, setup in cases(symbol):
+        if only and not any(part in name for part in only):
+            continue
+        results[name] = round(measure(func, setup, min_time), 2)
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Names of benchmarks more than `threshold` (a fraction) slower than the baseline"""
+    return [
+        name for name, us in results.items()
+        if baseline.get(name) and us > baseline[name] * (1 + threshold)
+    ]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for the context harness serializers')
+    parser.add_argument('--symbol', default='AAPL')
+    parser.add_argument('--only', nargs='+', help='Run benchmarks whose name contains one of these')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Seconds per repeat')
+    parser.add_argument('--json', metavar='PATH', help='Write results as JSON')
+    parser.add_argument('--compare', metavar='PATH', help='Baseline JSON to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slowdown against the baseline (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    results = run(args.symbol.upper(), args.only, args.min_time)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    for name, us in results.items():
+        line = f"{name:<32}{us:>12.2f} us"
+        if baseline.get(name):
+            line += f"  ({(us / baseline[name] - 1) * 100:+.1f}% vs baseline)"
+        print(line)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"Slower than baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Benchmark Runner
+
+Starts the fake Alpha Vantage and OpenAI servers and the app (each in its own
+process, pointed at the fakes and at throwaway databases), drives it with the
+load generator and prints the latency and throughput report. Nothing leaves
+the machine, so runs cost no API quota.
+
+    python -m bench.run --duration 30 --concurrency 50
+    python -m bench.run --server flask --av-latency 0.3 --first-token 0.8
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence
+
+import requests
+
+from bench import loadgen
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    """Poll a URL until it answers, failing early if the process exits"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with code {process.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not answer within {timeout:.0f}s")
+
+
+def app_command(server: str, port: int, workers: int) -> List[str]:
+    """Command line that serves the app on a port"""
+    if server == 'flask':
+        return [sys.executable, '-m', 'flask', '--app', 'wsgi', 'run', '--port', str(port), '--with-threads']
+    return [
+        sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app',
+        '--bind', f"127.0.0.1:{port}", '--workers', str(workers),
+    ]
+
+
+def app_env(av_port: int, openai_port: int, data_dir: str, port: int) -> Dict[str, str]:
+    """Environment pointing the app at the fakes, with quotas out of the way"""
+    return dict(
+        os.environ,
+        PORT=str(port),
+        ALPHAVANTAGE_API_KEY='bench',
+        ALPHAVANTAGE_BASE_URL=f"http://127.0.0.1:{av_port}/query",
+        ALPHAVANTAGE_CALLS_PER_MINUTE='100000',
+        ALPHAVANTAGE_CALLS_PER_DAY='10000000',
+        OPENAI_API_KEY='bench',
+        OPENAI_BASE_URL=f"http://127.0.0.1:{openai_port}/v1",
+        SERIES_DB_PATH=os.path.join(data_dir, 'series.sqlite3'),
+        CHAT_DB_PATH=os.path.join(data_dir, 'chat.sqlite3'),
+        SHARED_CACHE_PATH=os.path.join(data_dir, 'shared_cache.sqlite3'),
+        PYTHONUNBUFFERED='1',
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Load-test the app against local Alpha Vantage and OpenAI stand-ins')
+    parser.add_argument('--server', choices=('gunicorn', 'flask'), default='gunicorn', help='How to serve the app')
+    parser.add_argument('--workers', type=int, default=1, help='Gunicorn workers')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=30.0, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=3.0, help='Unmeasured seconds before measuring')
+    parser.add_argument('--consult-weight', type=float, default=1.0, help='Relative share of /api/consult (0 = none)')
+    parser.add_argument('--cached-questions', action='store_true', help='Repeat questions so AI answers can be cached')
+    parser.add_argument('--av-latency', type=float, default=0.1, help='Fake Alpha Vantage latency in seconds')
+    parser.add_argument('--av-throttle-rate', type=float, default=0.0, help='Fraction of quota notes from Alpha Vantage')
+    parser.add_argument('--first-token', type=float, default=0.3, help='Fake OpenAI seconds before the first token')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='Fake OpenAI seconds between tokens')
+    parser.add_argument('--json', metavar='PATH', help='Also write the summary as JSON')
+    parser.add_argument('--keep-data', action='store_true', help='Keep the temporary databases and app log')
+    args = parser.parse_args(argv)
+
+    av_port, openai_port, port = free_port(), free_port(), free_port()
+    data_dir = tempfile.mkdtemp(prefix='bench-')
+    log = open(os.path.join(data_dir, 'app.log'), 'w')
+    processes = []
+    try:
+        fake_av = subprocess.Popen([
+            sys.executable, '-m', 'bench.fake_alphavantage', '--port', str(av_port),
+            '--latency', str(args.av_latency), '--throttle-rate', str(args.av_throttle_rate),
+        ], cwd=ROOT, stdout=subprocess.DEVNULL)
+        processes.append(fake_av)
+        fake_openai = subprocess.Popen([
+            sys.executable, '-m', 'bench.fake_openai', '--port', str(openai_port),
+            '--first-token', str(args.first_token), '--token-delay', str(args.token_delay),
+        ], cwd=ROOT, stdout=subprocess.DEVNULL)
+        processes.append(fake_openai)
+        app = subprocess.Popen(
+            app_command(args.server, port, args.workers), cwd=ROOT,
+            env=app_env(av_port, openai_port, data_dir, port), stdout=log, stderr=subprocess.STDOUT,
+        )
+        processes.append(app)
+
+        wait_for(f"http://127.0.0.1:{av_port}/query?function=TOP_GAINERS_LOSERS", fake_av)
+        wait_for(f"http://127.0.0.1:{openai_port}/", fake_openai)
+        wait_for(f"http://127.0.0.1:{port}/api/snapshot", app, timeout=60)
+        print(f"App ({args.server}) on port {port}; logs in {log.name}")
+
+        loadgen_args = [
+            '--url', f"http://127.0.0.1:{port}", '--concurrency', str(args.concurrency),
+            '--duration', str(args.duration), '--warmup', str(args.warmup),
+            '--consult-weight', str(args.consult_weight),
+        ]
+        if args.cached_questions:
+            loadgen_args.append('--cached-questions')
+        if args.json:
+            loadgen_args += ['--json', args.json]
+        _, summary = loadgen.main(loadgen_args)
+        return 1 if summary['total']['errors'] else 0
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        log.close()
+        if not args.keep_data:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
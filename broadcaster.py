@@ -0,0 +1,205 @@
+"""
+Market Broadcast Module
+
+Pushes market snapshot changes to connected browsers as server-sent events.
+When the SnapshotRefresher publishes a new snapshot, the broadcaster diffs it
+against the previous one, serializes the diff once and queues the same frame
+for every subscriber. A connection only waits on its own queue, so under the
+gevent server (see gunicorn.conf.py) each idle stream costs a greenlet rather
+than a worker thread.
+
+Snapshot versions count up separately in each worker process, so event ids
+carry the broadcaster's instance id as well; a client reconnecting with an id
+from another process is sent the full state.
+"""
+
+import json
+import queue
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from refresher import MarketSnapshot
+
+MOVER_LISTS = ('top_gainers', 'top_losers', 'most_actively_traded')
+MOVER_FIELDS = ('ticker', 'price', 'change_amount', 'change_percentage', 'volume')
+NEWS_FIELDS = ('title', 'description', 'url', 'image', 'source', 'published_at')
+
+
+def _compact(items, fields) -> List[Dict[str, Any]]:
+    return [{key: item.get(key) for key in fields} for item in items]
+
+
+def snapshot_diff(snapshot: MarketSnapshot, previous: Optional[MarketSnapshot] = None) -> Dict[str, Any]:
+    """
+    Changes between two snapshots, in the shape the page applies them.
+
+    Movers lists that changed are sent whole (they are short); news is sent as
+    the articles added and the URLs removed. Without a previous snapshot the
+    full state is sent, with news marked as a reset.
+
+    Args:
+        snapshot: Newly published snapshot
+        previous: Snapshot the client already shows, if any
+
+    Returns:
+        Dict with version, fetched_at, errors, movers (changed lists) and news
+    """
+    diff: Dict[str, Any] = {
+        'version': snapshot.version,
+        'fetched_at': datetime.fromtimestamp(snapshot.fetched_at, timezone.utc).isoformat(),
+        'errors': snapshot.errors,
+        'movers': {},
+    }
+    for name in MOVER_LISTS:
+        stocks = snapshot.movers.get(name) or ()
+        if previous is None or stocks != (previous.movers.get(name) or ()):
+            diff['movers'][name] = _compact(stocks, MOVER_FIELDS)
+
+    if previous is None:
+        diff['news'] = {'reset': True, 'added': _compact(snapshot.news, NEWS_FIELDS), 'removed': []}
+        return diff
+    seen = {article['url'] for article in previous.news}
+    current = {article['url'] for article in snapshot.news}
+    diff['news'] = {
+        'reset': False,
+        'added': _compact([a for a in snapshot.news if a['url'] not in seen], NEWS_FIELDS),
+        'removed': [article['url'] for article in previous.news if article['url'] not in current],
+    }
+    return diff
+
+
+def _frame(diff: Dict[str, Any], event_id: str) -> str:
+    """One SSE frame; the id lets a reconnecting client report the version it has"""
+    return f"id: {event_id}\nevent: market\ndata: {json.dumps(diff, separators=(',', ':'))}\n\n"
+
+
+class _Subscription:
+    __slots__ = ('queue', 'overflowed')
+
+    def __init__(self, size: int):
+        self.queue: "queue.Queue[Tuple[int, str]]" = queue.Queue(maxsize=size)
+        self.overflowed = False
+
+
+class MarketBroadcaster:
+    """
+    Fan-out of snapshot diffs to server-sent event streams.
+    """
+
+    def __init__(self, max_clients: int = 1000, queue_size: int = 8, heartbeat: float = 25.0, retry: float = 3.0):
+        """
+        Args:
+            max_clients: Open streams allowed at once; further subscribers are refused
+            queue_size: Frames buffered per client before it is resynchronized
+            heartbeat: Seconds between keep-alive comments on an idle stream
+            retry: Seconds the browser waits before reconnecting a dropped stream
+        """
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.retry = retry
+        # Distinguishes this process's event ids from other workers'
+        self.instance = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._subscriptions: List[_Subscription] = []
+        self._latest: Optional[MarketSnapshot] = None
+        self.published = 0
+        self.resyncs = 0
+
+    def event_id(self, version: int) -> str:
+        """SSE event id for a snapshot version published by this broadcaster"""
+        return f"{self.instance}-{version}"
+
+    def _version(self, event_id: Optional[str]) -> int:
+        """Snapshot version an event id refers to, or 0 when it came from another process or is malformed"""
+        instance, _, version = (event_id or '').rpartition('-')
+        if instance != self.instance or not version.isdigit():
+            return 0
+        return int(version)
+
+    def publish(self, snapshot: MarketSnapshot, previous: Optional[MarketSnapshot] = None) -> None:
+        """
+        Queue the diff from previous to snapshot for every client.
+
+        Matches the SnapshotRefresher listener signature, and never blocks: a
+        client whose queue is full is flagged and resent the full state instead.
+        """
+        self._latest = snapshot
+        frame = (snapshot.version, _frame(snapshot_diff(snapshot, previous), self.event_id(snapshot.version)))
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            self.published += 1
+        for subscription in subscriptions:
+            try:
+                subscription.queue.put_nowait(frame)
+            except queue.Full:
+                subscription.overflowed = True
+
+    def subscribe(self) -> Optional[_Subscription]:
+        """Register a new client, or return None when max_clients streams are open"""
+        with self._lock:
+            if len(self._subscriptions) >= self.max_clients:
+                return None
+            subscription = _Subscription(self.queue_size)
+            self._subscriptions.append(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription: _Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def stream(self, subscription: _Subscription, snapshot: MarketSnapshot, since: Optional[str] = None) -> Iterator[str]:
+        """
+        Server-sent events for one client, until it disconnects.
+
+        Subscribe before reading the snapshot so no publish is missed between
+        the two; frames for versions the client already has are skipped.
+
+        Args:
+            subscription: From subscribe(); released when the stream closes
+            snapshot: Current snapshot
+            since: Event id of the state the client already shows; the full state is
+                   sent unless it is this broadcaster's id for the current version
+
+        Yields:
+            SSE frames and keep-alive comments
+        """
+        try:
+            yield f"retry: {int(self.retry * 1000)}\n\n"
+            version = self._version(since)
+            if version != snapshot.version:
+                yield _frame(snapshot_diff(snapshot), self.event_id(snapshot.version))
+                version = snapshot.version
+            while True:
+                try:
+                    frame_version, frame = subscription.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscription.overflowed:
+                    # Too far behind to apply diffs in order: drop them and resend everything
+                    subscription.overflowed = False
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    latest = self._latest or snapshot
+                    self.resyncs += 1
+                    yield _frame(snapshot_diff(latest), self.event_id(latest.version))
+                    version = latest.version
+                elif frame_version > version:
+                    yield frame
+                    version = frame_version
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> Dict[str, int]:
+        """Connected clients and frames published"""
+        with self._lock:
+            return {
+                'clients': len(self._subscriptions),
+                'max_clients': self.max_clients,
+                'published': self.published,
+                'resyncs': self.resyncs,
+            }
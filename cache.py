@@ -0,0 +1,250 @@
+"""
+Upstream Cache Module
+
+This module provides a small thread-safe cache for upstream market data.
+Each cache has its own TTL and size bound: entries expire once they are older
+than the TTL, and the least recently used entry is evicted when the cache is
+full. Hits, misses, evictions and expirations are counted so cache
+effectiveness can be checked at runtime.
+
+It also provides single-flight coalescing: concurrent callers that miss the
+cache for the same key share one in-flight fetch instead of each sending an
+identical upstream request. Across worker processes, the same role is played
+by shared_cache.SharedCache, which cached() can put behind the local cache.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Sentinel returned by TTLCache.get() when a key is absent or expired
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a fixed TTL.
+    """
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 128):
+        """
+        Args:
+            name: Name used when reporting stats
+            ttl: Time-to-live for each entry, in seconds
+            maxsize: Maximum number of entries before LRU eviction
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """
+        Look up a key, refreshing its LRU position on a hit.
+
+        Args:
+            key: Cache key
+            default: Value returned when the key is absent or expired
+
+        Returns:
+            The cached value, or default
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a value, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Optional TTL override for this entry, in seconds
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (expires_at, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove a single key if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the cache counters.
+
+        Returns:
+            Dictionary with size, bounds and hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'ttl': self.ttl,
+                'maxsize': self.maxsize,
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+class _Call:
+    """An in-flight call whose result is shared with waiting callers"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is still running block and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        Run func once per key across concurrent callers.
+
+        Args:
+            key: Identifies the call, e.g. (function name, symbol)
+            func: Zero-argument function performing the fetch
+
+        Returns:
+            The result of the single shared execution
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict[str, Any]:
+        """Executed and coalesced call counters"""
+        with self._lock:
+            return {'calls': self.calls, 'shared': self.shared, 'in_flight': len(self._calls)}
+
+
+def cached(
+    cache: TTLCache,
+    key: Optional[Callable[..., Hashable]] = None,
+    should_cache: Optional[Callable[[Any], bool]] = None,
+    flight: Optional[SingleFlight] = None,
+    shared: Optional[Any] = None,
+):
+    """
+    Decorator that memoizes a function's results in a TTLCache.
+
+    Args:
+        cache: Cache that stores the results
+        key: Optional function mapping the call arguments to a cache key.
+             Defaults to the positional and keyword arguments themselves.
+        should_cache: Optional predicate deciding whether a result is stored.
+                      Used to keep error responses out of the cache.
+        flight: Optional SingleFlight used to coalesce concurrent misses.
+                Calls are keyed by function name plus cache key.
+        shared: Optional shared_cache.SharedCache consulted on a local miss, so
+                worker processes reuse each other's results; only one worker
+                loads a missing key at a time. Results must be JSON-serializable.
+
+    Returns:
+        Decorator wrapping the function; the wrapper exposes the cache as `.cache`
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs) if key else (args, tuple(sorted(kwargs.items())))
+            value = cache.get(cache_key)
+            if value is not MISSING:
+                return value
+
+            def load():
+                if shared is not None:
+                    result, ttl = shared.get_or_load(cache_key, lambda: func(*args, **kwargs), should_cache)
+                    if ttl is not None:
+                        # Expire locally when the shared entry does, not a full TTL later
+                        cache.set(cache_key, result, ttl=min(ttl, cache.ttl))
+                    return result
+                result = func(*args, **kwargs)
+                if should_cache is None or should_cache(result):
+                    cache.set(cache_key, result)
+                return result
+
+            if flight is None:
+                return load()
+            return flight.do((func.__name__, cache_key), load)
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
@@ -0,0 +1,249 @@
+"""
+Chat History Store Module
+
+Conversations are kept server-side in SQLite; the session cookie carries
+only a conversation id. Each question/answer pair is stored as one small
+row, pages of history are loaded newest-first for rendering, and old
+messages and idle conversations are trimmed so the store stays bounded.
+Each conversation can also hold a rolling summary of its older messages
+(see memory.py).
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id TEXT NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    created_at REAL NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT,
+    error TEXT
+);
+
+CREATE TABLE IF NOT EXISTS summaries (
+    conversation_id TEXT PRIMARY KEY REFERENCES conversations(id) ON DELETE CASCADE,
+    summary TEXT NOT NULL,
+    through_id INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS messages_by_conversation ON messages (conversation_id, id);
+CREATE INDEX IF NOT EXISTS conversations_by_update ON conversations (updated_at);
+"""
+
+
+@dataclass(frozen=True)
+class ChatPage:
+    """A page of messages in chronological order, plus whether older ones exist"""
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    has_more: bool = False
+
+    @property
+    def oldest_id(self) -> Optional[int]:
+        """Id to pass as `before` to load the previous page"""
+        return self.messages[0]['id'] if self.messages else None
+
+
+class ChatStore:
+    """
+    SQLite-backed conversation history keyed by conversation id.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_messages: int = 200,
+        retention_seconds: float = 30 * 86400,
+        prune_interval: float = 3600.0,
+    ):
+        """
+        Args:
+            path: SQLite database file; its directory is created if missing
+            max_messages: Messages kept per conversation; older ones are dropped
+            retention_seconds: Idle time after which a conversation is deleted
+            prune_interval: Minimum seconds between sweeps for expired conversations
+        """
+        self.path = path
+        self.max_messages = max_messages
+        self.retention_seconds = retention_seconds
+        self.prune_interval = prune_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._prune_lock = threading.Lock()
+        self._last_prune = 0.0
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run alongside a writer"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def append(
+        self,
+        conversation_id: str,
+        question: str,
+        answer: Optional[str] = None,
+        error: Optional[str] = None,
+    ) -> int:
+        """
+        Add a question with its answer (or error) to a conversation.
+
+        The conversation is created on first use, and messages beyond
+        max_messages are removed oldest first.
+
+        Args:
+            conversation_id: Conversation to append to
+            question: The user's question
+            answer: The AI answer, if one was produced
+            error: Error message, if the answer failed
+
+        Returns:
+            Id of the stored message
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO conversations (id, created_at, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET updated_at = excluded.updated_at",
+                (conversation_id, now, now),
+            )
+            message_id = conn.execute(
+                "INSERT INTO messages (conversation_id, created_at, question, answer, error) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (conversation_id, now, question, answer, error),
+            ).lastrowid
+            conn.execute(
+                "DELETE FROM messages WHERE conversation_id = ? AND id <= ("
+                "SELECT id FROM messages WHERE conversation_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (conversation_id, conversation_id, self.max_messages),
+            )
+        self._maybe_prune(now)
+        return message_id
+
+    def page(self, conversation_id: str, limit: int = 50, before: Optional[int] = None) -> ChatPage:
+        """
+        Load the newest messages of a conversation, or those older than `before`.
+
+        Args:
+            conversation_id: Conversation to read
+            limit: Maximum number of messages to return
+            before: Only return messages with an id lower than this
+
+        Returns:
+            ChatPage with messages in chronological order
+        """
+        query = "SELECT id, question, answer, error FROM messages WHERE conversation_id = ?"
+        params: List[Any] = [conversation_id]
+        if before is not None:
+            query += " AND id < ?"
+            params.append(before)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)
+        rows = self._connect().execute(query, params).fetchall()
+        messages = [
+            {'id': row[0], 'question': row[1], 'answer': row[2], 'error': row[3]}
+            for row in reversed(rows[:limit])
+        ]
+        return ChatPage(messages=messages, has_more=len(rows) > limit)
+
+    def messages_after(self, conversation_id: str, after_id: int = 0) -> List[Dict[str, Any]]:
+        """
+        Messages of a conversation newer than a given message id.
+
+        Args:
+            conversation_id: Conversation to read
+            after_id: Only return messages with an id greater than this
+
+        Returns:
+            Message dicts in chronological order
+        """
+        rows = self._connect().execute(
+            "SELECT id, question, answer, error FROM messages "
+            "WHERE conversation_id = ? AND id > ? ORDER BY id",
+            (conversation_id, after_id),
+        ).fetchall()
+        return [{'id': row[0], 'question': row[1], 'answer': row[2], 'error': row[3]} for row in rows]
+
+    def summary(self, conversation_id: str) -> Tuple[Optional[str], int]:
+        """
+        Rolling summary of a conversation's older messages.
+
+        Returns:
+            Tuple of (summary or None, id of the last message it covers, 0 if none)
+        """
+        row = self._connect().execute(
+            "SELECT summary, through_id FROM summaries WHERE conversation_id = ?",
+            (conversation_id,),
+        ).fetchone()
+        return (row[0], row[1]) if row else (None, 0)
+
+    def set_summary(self, conversation_id: str, summary: str, through_id: int) -> None:
+        """Save the rolling summary covering messages up to and including through_id"""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO summaries (conversation_id, summary, through_id) "
+                "SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM conversations WHERE id = ?) "
+                "ON CONFLICT(conversation_id) DO UPDATE SET "
+                "summary = excluded.summary, through_id = excluded.through_id",
+                (conversation_id, summary, through_id, conversation_id),
+            )
+
+    def clear(self, conversation_id: str) -> None:
+        """Delete a conversation and all of its messages"""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Delete conversations idle for longer than the retention period.
+
+        Returns:
+            Number of conversations removed
+        """
+        cutoff = (now or time.time()) - self.retention_seconds
+        conn = self._connect()
+        with conn:
+            removed = conn.execute("DELETE FROM conversations WHERE updated_at < ?", (cutoff,)).rowcount
+        return removed
+
+    def _maybe_prune(self, now: float) -> None:
+        if now - self._last_prune < self.prune_interval or not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_prune = now
+            self.prune(now)
+        except sqlite3.Error as e:
+            print(f"Error pruning chat history: {str(e)}")
+        finally:
+            self._prune_lock.release()
+
+    def stats(self) -> Dict[str, int]:
+        """Number of stored conversations and messages"""
+        conn = self._connect()
+        return {
+            'conversations': conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0],
+            'messages': conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0],
+        }
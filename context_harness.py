@@ -4,19 +4,88 @@ AI Context Harness Module
 This module aggregates market data from various sources and formats it
 for use in the AI model's context window. It ensures data reuse between
 the UI display and AI model, avoiding redundant API calls.
+
+Context can also be packed into a token budget: sections are added in
+priority order and each one falls back to less detailed renderings until
+it fits, so prompt cost and latency can be capped.
+
+Serialized sections are memoized by a version or fingerprint of their input.
+Movers and macro news are the same for every user until the snapshot
+changes, so a request only formats the sections whose data is new to it,
+such as a newly searched symbol.
 """
 
+import hashlib
 import json
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Union, Callable, Tuple
+
+import metrics
+from cache import MISSING, TTLCache
+from metrics import REGISTRY, TOKEN_BUCKETS
+from forecasting import forecast as forecast_series
+from timeseries import DailySeries, average_correlation
+
+# Serialized sections keyed by (section, rendering, input fingerprint)
+section_cache = TTLCache('context_sections', ttl=3600, maxsize=2048)
+
+context_tokens = REGISTRY.histogram(
+    'ai_context_tokens', 'Estimated tokens of formatted market context', ['kind'], buckets=TOKEN_BUCKETS,
+)
+
+
+class _SectionMemo:
+    """
+    Per-call helper that renders sections through section_cache.
+    
+    A section's input is identified by a caller-supplied version (e.g. the
+    snapshot version for movers and news) or, failing that, by a cheap
+    fingerprint of the data itself.
+    """
+    
+    def __init__(self, versions: Optional[Dict[str, Any]] = None):
+        self.versions = versions or {}
+        self._fingerprints: Dict[str, Any] = {}
+    
+    def fingerprint(self, source: str, data: Any) -> Any:
+        if source in self.versions:
+            return ('version', self.versions[source])
+        if source not in self._fingerprints:
+            if isinstance(data, DailySeries):
+                last_close = float(data.close[-1]) if len(data) else None
+                fingerprint = (data.symbol, len(data), data.last_date, last_close)
+            else:
+                payload = json.dumps(data, sort_keys=True, default=str).encode('utf-8')
+                fingerprint = hashlib.blake2b(payload, digest_size=16).hexdigest()
+            self._fingerprints[source] = fingerprint
+        return self._fingerprints[source]
+    
+    def render(self, section: str, source: str, data: Any, render: Callable[[], str], *variant: Any) -> str:
+        """
+        Return a section's text, formatting it only on a cache miss.
+        
+        Args:
+            section: Section name, e.g. 'movers'
+            source: Name of the input the section is built from (key into versions)
+            data: The input itself, fingerprinted when no version is supplied
+            render: Zero-argument function that formats the section
+            *variant: Anything else the text depends on (symbol, limits)
+        """
+        key = (section, variant, self.fingerprint(source, data))
+        text = section_cache.get(key)
+        if text is MISSING:
+            text = render()
+            section_cache.set(key, text)
+        return text
 
 
-def serialize_stock_data(stocks: List[Dict[str, Any]], category: str) -> str:
+def serialize_stock_data(stocks: List[Dict[str, Any]], category: str, limit: int = 5) -> str:
     """
     Serialize a list of stocks into a compact, LLM-friendly format.
     
     Args:
         stocks: List of stock dictionaries (from top_movers data)
         category: Category name (e.g., "Top Gainers", "Top Losers", "Most Active")
+        limit: Maximum number of stocks to include
     
     Returns:
         Formatted string representation of stocks
@@ -25,8 +94,8 @@ def serialize_stock_data(stocks: List[Dict[str, Any]], category: str) -> str:
         return f"{category}: No data available"
     
     lines = [f"{category}:"]
-    # Limit to top 5 for context window efficiency
-    for stock in stocks[:5]:
+    # Limit to top 5 (by default) for context window efficiency
+    for stock in stocks[:limit]:
         ticker = stock.get('ticker', 'N/A')
         price = stock.get('price', 'N/A')
         change = stock.get('change_amount', 'N/A')
@@ -39,47 +108,89 @@ def serialize_stock_data(stocks: List[Dict[str, Any]], category: str) -> str:
     return "\n".join(lines)
 
 
-def serialize_time_series(time_series: Optional[Dict], symbol: str) -> str:
+def _as_daily_series(time_series: Union[DailySeries, Dict, None], symbol: str) -> Optional[DailySeries]:
+    """Accept either a DailySeries or an Alpha Vantage dict-of-dicts series"""
+    if time_series is None or isinstance(time_series, DailySeries):
+        return time_series
+    return DailySeries.from_alpha_vantage(symbol, time_series)
+
+
+def serialize_time_series(time_series: Union[DailySeries, Dict, None], symbol: str, days: int = 5) -> str:
     """
     Serialize time series data into a compact format.
     
     Args:
-        time_series: Dictionary of daily time series data
+        time_series: Daily series for the symbol (DailySeries or Alpha Vantage dict)
         symbol: Stock ticker symbol
+        days: Number of most recent days to include
     
     Returns:
         Formatted string representation of time series
     """
-    if not time_series:
+    series = _as_daily_series(time_series, symbol)
+    if not series:
         return f"Time Series for {symbol}: No data available"
     
-    lines = [f"Time Series for {symbol} (Last 5 days):"]
-    
-    # Sort dates in descending order and take first 5
-    sorted_dates = sorted(time_series.keys(), reverse=True)[:5]
+    lines = [f"Time Series for {symbol} (Last {days} days):"]
     
-    for date in sorted_dates:
-        data = time_series[date]
-        open_price = data.get('1. open', 'N/A')
-        close_price = data.get('4. close', 'N/A')
-        high = data.get('2. high', 'N/A')
-        low = data.get('3. low', 'N/A')
-        volume = data.get('6. volume', 'N/A')
-        
+    # Rows are already sorted, so the newest days are a slice
+    for bar in series.rows(limit=days):
         lines.append(
-            f"  {date}: Open ${open_price}, Close ${close_price}, "
-            f"High ${high}, Low ${low}, Volume {volume}"
+            f"  {bar['date']}: Open ${bar['open']:.2f}, Close ${bar['close']:.2f}, "
+            f"High ${bar['high']:.2f}, Low ${bar['low']:.2f}, Volume {bar['volume']}"
         )
     
     return "\n".join(lines)
 
 
-def serialize_news(news_articles: List[Dict[str, Any]]) -> str:
+def _pct(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value * 100:+.2f}%"
+
+
+def _price(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"${value:.2f}"
+
+
+def serialize_series_stats(time_series: Union[DailySeries, Dict, None], symbol: str) -> str:
+    """
+    Serialize a statistical summary of the daily series.
+    
+    Args:
+        time_series: Daily series for the symbol (DailySeries or Alpha Vantage dict)
+        symbol: Stock ticker symbol
+    
+    Returns:
+        Formatted string with returns, moving averages, volatility, drawdown and 52-week range
+    """
+    series = _as_daily_series(time_series, symbol)
+    if not series:
+        return f"Statistics for {symbol}: No data available"
+    
+    stats = series.summary()
+    range_52w = stats['range_52w']
+    volatility = stats['volatility_21d']
+    position = range_52w['position']
+    lines = [
+        f"Statistics for {symbol} ({stats['bars']} daily bars through {stats['last_date']}):",
+        f"  Returns: 1d {_pct(stats['return_1d'])}, 5d {_pct(stats['return_5d'])}, "
+        f"1m {_pct(stats['return_21d'])}, 1y {_pct(stats['return_252d'])}",
+        f"  Moving averages: SMA20 {_price(stats['sma_20'])}, SMA50 {_price(stats['sma_50'])}, "
+        f"SMA200 {_price(stats['sma_200'])}, EMA12 {_price(stats['ema_12'])}, EMA26 {_price(stats['ema_26'])}",
+        f"  Volatility (21d, annualized): {'n/a' if volatility is None else f'{volatility * 100:.1f}%'}; "
+        f"Drawdown from peak: {_pct(stats['drawdown'])}; Max drawdown (1y): {_pct(stats['max_drawdown_1y'])}",
+        f"  52-week range: {_price(range_52w['low'])} - {_price(range_52w['high'])}"
+        + ("" if position is None else f" (at {position * 100:.0f}% of range)"),
+    ]
+    return "\n".join(lines)
+
+
+def serialize_news(news_articles: List[Dict[str, Any]], limit: int = 5) -> str:
     """
     Serialize economic news into a compact format.
     
     Args:
         news_articles: List of news article dictionaries
+        limit: Maximum number of headlines to include
     
     Returns:
         Formatted string representation of news
@@ -89,8 +200,8 @@ def serialize_news(news_articles: List[Dict[str, Any]]) -> str:
     
     lines = ["Economic News Headlines:"]
     
-    # Limit to top 5 articles for context efficiency
-    for article in news_articles[:5]:
+    # Limit to top 5 articles (by default) for context efficiency
+    for article in news_articles[:limit]:
         title = article.get('title', 'N/A')
         source = article.get('source', 'Unknown')
         date = article.get('published_at', 'N/A')
@@ -99,13 +210,20 @@ def serialize_news(news_articles: List[Dict[str, Any]]) -> str:
     return "\n".join(lines)
 
 
-def serialize_symbol_news(news_articles: List[Dict[str, Any]], symbol: str) -> str:
+def serialize_symbol_news(
+    news_articles: List[Dict[str, Any]],
+    symbol: str,
+    limit: int = 10,
+    summary_chars: int = 100,
+) -> str:
     """
     Serialize symbol-specific news into a compact format for AI context.
     
     Args:
         news_articles: List of news article dictionaries related to the symbol
         symbol: Stock ticker symbol
+        limit: Maximum number of articles to include
+        summary_chars: Summary length cap; 0 leaves summaries out
     
     Returns:
         Formatted string representation of symbol-specific news
@@ -113,17 +231,17 @@ def serialize_symbol_news(news_articles: List[Dict[str, Any]], symbol: str) -> s
     if not news_articles:
         return f"News for {symbol}: No articles available"
     
-    lines = [f"Recent News for {symbol} (Top 10 most relevant articles):"]
+    lines = [f"Recent News for {symbol} (Top {limit} most relevant articles):"]
     
-    # Limit to top 10 articles for symbol-specific news (more relevant than general news)
-    for article in news_articles[:10]:
+    # Limit to top 10 articles (by default) for symbol-specific news (more relevant than general news)
+    for article in news_articles[:limit]:
         title = article.get('title', 'N/A')
         source = article.get('source', 'Unknown')
         date = article.get('published_at', 'N/A')
-        description = article.get('description', '')
+        description = article.get('description', '') if summary_chars else ''
         # Truncate description if too long
-        if description and len(description) > 100:
-            description = description[:100] + "..."
+        if description and len(description) > summary_chars:
+            description = description[:summary_chars] + "..."
         lines.append(f"  - {title} (Source: {source}, {date})")
         if description:
             lines.append(f"    Summary: {description}")
@@ -131,12 +249,81 @@ def serialize_symbol_news(news_articles: List[Dict[str, Any]], symbol: str) -> s
     return "\n".join(lines)
 
 
+def serialize_forecast(forecast: Optional[Dict[str, Any]], symbol: str, detailed: bool = True) -> str:
+    """
+    Serialize model forecasts for a symbol.
+    
+    Args:
+        forecast: Result of forecasting.forecast(), or None if unavailable
+        symbol: Stock ticker symbol
+        detailed: Include every model on its own line; otherwise one compact line
+    
+    Returns:
+        Formatted string with the final-day forecast and interval of each model
+    """
+    if not forecast:
+        return f"Forecast for {symbol}: Not enough history"
+    
+    ar = forecast['autoregressive']
+    ses = forecast['smoothing']
+    volatility = forecast['volatility']
+    coverage = f"{forecast['confidence'] * 100:.0f}%"
+    daily_vol = f"{volatility['daily'] * 100:.2f}%/day"
+    
+    def at_end(model: Dict[str, Any]) -> str:
+        return f"{_price(model['forecast'][-1])} ({_price(model['lower'][-1])} - {_price(model['upper'][-1])})"
+    
+    if not detailed:
+        return (
+            f"Forecast for {symbol} ({forecast['horizon']} business days, {coverage} interval): "
+            f"AR {at_end(ar)}; volatility {daily_vol}"
+        )
+    return "\n".join([
+        f"Forecast for {symbol} to {forecast['dates'][-1]} ({forecast['horizon']} business days from "
+        f"{_price(forecast['last_price'])} on {forecast['last_date']}; {coverage} intervals):",
+        f"  AR({ar['order']}) model of daily returns: {at_end(ar)}",
+        f"  Exponential smoothing (alpha {ses['alpha']:.2f}): {at_end(ses)}",
+        f"  EWMA volatility: {daily_vol}, {volatility['annualized'] * 100:.1f}% annualized; "
+        f"driftless range {_price(volatility['lower'][-1])} - {_price(volatility['upper'][-1])}",
+        "  These are statistical extrapolations from price history, not predictions of events.",
+    ])
+
+
+def serialize_sentiment(sentiment: Optional[Dict[str, Dict[str, Any]]], topic_limit: int = 3) -> str:
+    """
+    Serialize aggregated news sentiment into a single compact line.
+    
+    Args:
+        sentiment: Dict with optional 'tickers' and 'topics' maps of name to
+                   {'score', 'label', 'weight'} (see sentiment.py)
+        topic_limit: Most-covered topics to include
+    
+    Returns:
+        Formatted sentiment line, or an empty string when there is no sentiment
+    """
+    if not sentiment:
+        return ""
+    
+    def describe(name: str, view: Dict[str, Any]) -> str:
+        return f"{name} {view['label']} {view['score']:+.2f} (weight {view['weight']:.0f})"
+    
+    parts = [describe(ticker, view) for ticker, view in (sentiment.get('tickers') or {}).items()]
+    topics = sorted((sentiment.get('topics') or {}).items(), key=lambda item: item[1]['weight'], reverse=True)
+    parts.extend(describe(topic, view) for topic, view in topics[:topic_limit])
+    if not parts:
+        return ""
+    return "News sentiment (time-decayed, -1 bearish to +1 bullish): " + "; ".join(parts)
+
+
 def format_market_context(
     top_movers: Dict[str, Any],
-    time_series: Optional[Dict] = None,
+    time_series: Optional[DailySeries] = None,
     symbol: Optional[str] = None,
     news: Optional[List[Dict]] = None,
     symbol_news: Optional[List[Dict]] = None,
+    versions: Optional[Dict[str, Any]] = None,
+    sentiment: Optional[Dict[str, Dict[str, Any]]] = None,
+    forecast_horizon: int = 5,
 ) -> str:
     """
     Format all market data into a comprehensive context string for the AI model.
@@ -146,14 +333,19 @@ def format_market_context(
     
     Args:
         top_movers: Dictionary with 'top_gainers', 'top_losers', 'most_actively_traded' keys
-        time_series: Optional time series data for a specific symbol
+        time_series: Optional daily series (DailySeries) for a specific symbol
         symbol: Optional symbol being searched (if time series is provided)
         news: Optional list of general economic news articles
         symbol_news: Optional list of news articles specific to the searched symbol
+        versions: Optional data versions keyed by 'movers', 'news', 'series' or
+                  'symbol_news'; sections with a known version skip fingerprinting
+        sentiment: Optional aggregated news sentiment, as for serialize_sentiment()
+        forecast_horizon: Business days to forecast for the symbol (0 to leave forecasts out)
     
     Returns:
         Formatted context string ready for inclusion in AI system prompt
     """
+    memo = _SectionMemo(versions)
     context_parts = []
     
     # Add search context if symbol is provided
@@ -162,30 +354,41 @@ def format_market_context(
     
     # Add top movers data
     if top_movers:
-        context_parts.append(serialize_stock_data(
-            top_movers.get('top_gainers', []),
-            "Top Gainers"
-        ))
-        context_parts.append(serialize_stock_data(
-            top_movers.get('top_losers', []),
-            "Top Losers"
-        ))
-        context_parts.append(serialize_stock_data(
-            top_movers.get('most_actively_traded', []),
-            "Most Actively Traded"
+        context_parts.append(memo.render(
+            'movers', 'movers', top_movers, lambda: serialize_movers(top_movers), 5
         ))
     
-    # Add time series if provided
+    # Add time series and its statistical summary if provided
     if time_series and symbol:
-        context_parts.append(serialize_time_series(time_series, symbol))
+        series = _as_daily_series(time_series, symbol)
+        context_parts.append(memo.render(
+            'series', 'series', series, lambda: serialize_time_series(series, symbol), symbol, 5
+        ))
+        context_parts.append(memo.render(
+            'series_stats', 'series', series, lambda: serialize_series_stats(series, symbol), symbol
+        ))
+        if forecast_horizon:
+            context_parts.append(memo.render(
+                'forecast', 'series', series,
+                lambda: serialize_forecast(forecast_series(series, forecast_horizon), symbol),
+                symbol, forecast_horizon
+            ))
+    
+    # Add the time-decayed sentiment score (changes continuously, so not memoized)
+    sentiment_line = serialize_sentiment(sentiment)
+    if sentiment_line:
+        context_parts.append(sentiment_line)
     
     # Add symbol-specific news if provided (prioritize this over general news when symbol is searched)
     if symbol_news and symbol:
-        context_parts.append(serialize_symbol_news(symbol_news, symbol))
+        context_parts.append(memo.render(
+            'symbol_news', 'symbol_news', symbol_news,
+            lambda: serialize_symbol_news(symbol_news, symbol), symbol, 10, 100
+        ))
     
     # Add general economic news if provided (and no symbol-specific news)
     if news and not (symbol_news and symbol):
-        context_parts.append(serialize_news(news))
+        context_parts.append(memo.render('news', 'news', news, lambda: serialize_news(news), 5))
     
     # Join all parts with clear separators
     context_str = "\n\n".join(context_parts)
@@ -193,6 +396,330 @@ def format_market_context(
     return context_str
 
 
+# Sections in packing priority order, most important first
+SECTION_PRIORITY = ('focus', 'series', 'forecast', 'sentiment', 'symbol_news', 'movers', 'news')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of a string.
+    
+    Uses the common ~4 characters per token rule for English text, which is
+    close enough for budgeting without a tokenizer dependency.
+    
+    Args:
+        text: Text to measure
+    
+    Returns:
+        Estimated number of tokens
+    """
+    if not text:
+        return 0
+    return (len(text) + 3) // 4
+
+
+def serialize_movers(top_movers: Dict[str, Any], limit: int = 5) -> str:
+    """
+    Serialize all three top mover lists.
+    
+    Args:
+        top_movers: Dictionary with 'top_gainers', 'top_losers', 'most_actively_traded' keys
+        limit: Maximum number of stocks per list
+    
+    Returns:
+        Formatted string with one block per list
+    """
+    return "\n\n".join([
+        serialize_stock_data(top_movers.get('top_gainers', []), "Top Gainers", limit),
+        serialize_stock_data(top_movers.get('top_losers', []), "Top Losers", limit),
+        serialize_stock_data(top_movers.get('most_actively_traded', []), "Most Actively Traded", limit),
+    ])
+
+
+def _section_renderings(
+    top_movers: Dict[str, Any],
+    time_series: Optional[DailySeries],
+    symbol: Optional[str],
+    news: Optional[List[Dict]],
+    symbol_news: Optional[List[Dict]],
+    memo: _SectionMemo,
+    sentiment: Optional[Dict[str, Dict[str, Any]]] = None,
+    forecast_horizon: int = 5,
+) -> List[Tuple[str, List[Callable[[], str]]]]:
+    """Each available section with its (memoized) renderings, from most to least detailed (in no set order)"""
+    sections: List[Tuple[str, List[Callable[[], str]]]] = []
+    if symbol:
+        sections.append(('focus', [lambda: f"User is currently viewing/searching for: {symbol}"]))
+    if time_series and symbol:
+        series = _as_daily_series(time_series, symbol)
+        
+        def series_rendering(days: int, stats: bool) -> Callable[[], str]:
+            def render() -> str:
+                parts = []
+                if days:
+                    parts.append(memo.render(
+                        'series', 'series', series, lambda: serialize_time_series(series, symbol, days), symbol, days
+                    ))
+                if stats:
+                    parts.append(memo.render(
+                        'series_stats', 'series', series, lambda: serialize_series_stats(series, symbol), symbol
+                    ))
+                return "\n\n".join(parts)
+            return render
+        
+        sections.append(('series', [
+            series_rendering(5, True),
+            series_rendering(0, True),
+            series_rendering(1, False),
+        ]))
+        if forecast_horizon:
+            sections.append(('forecast', [
+                lambda detailed=detailed: memo.render(
+                    'forecast', 'series', series,
+                    lambda: serialize_forecast(forecast_series(series, forecast_horizon), symbol, detailed),
+                    symbol, forecast_horizon, detailed
+                )
+                for detailed in (True, False)
+            ]))
+    if serialize_sentiment(sentiment):
+        sections.append(('sentiment', [
+            lambda: serialize_sentiment(sentiment),
+            lambda: serialize_sentiment(sentiment, topic_limit=0),
+        ]))
+    if symbol_news and symbol:
+        sections.append(('symbol_news', [
+            lambda limit=limit, chars=chars: memo.render(
+                'symbol_news', 'symbol_news', symbol_news,
+                lambda: serialize_symbol_news(symbol_news, symbol, limit, chars), symbol, limit, chars
+            )
+            for limit, chars in ((10, 100), (10, 0), (5, 0), (2, 0))
+        ]))
+    if top_movers:
+        sections.append(('movers', [
+            lambda n=n: memo.render('movers', 'movers', top_movers, lambda: serialize_movers(top_movers, n), n)
+            for n in (5, 3, 1)
+        ]))
+    if news:
+        sections.append(('news', [
+            lambda n=n: memo.render('news', 'news', news, lambda: serialize_news(news, n), n)
+            for n in (5, 3, 1)
+        ]))
+    return sections
+
+
+def pack_market_context(
+    top_movers: Dict[str, Any],
+    time_series: Optional[DailySeries] = None,
+    symbol: Optional[str] = None,
+    news: Optional[List[Dict]] = None,
+    symbol_news: Optional[List[Dict]] = None,
+    token_budget: int = 1500,
+    versions: Optional[Dict[str, Any]] = None,
+    sentiment: Optional[Dict[str, Dict[str, Any]]] = None,
+    forecast_horizon: int = 5,
+) -> Dict[str, Any]:
+    """
+    Format market data into a context string that fits a token budget.
+    
+    Sections are packed in SECTION_PRIORITY order (symbol focus, series
+    stats, forecast, sentiment, symbol news, movers, macro news). Every section first gets its
+    smallest rendering, and is left out if even that does not fit; then, in
+    the same priority order, sections are upgraded to the most detailed
+    rendering the remaining budget allows. Detail is therefore lost from the
+    lowest-priority sections first. The budget includes the wrapper text
+    added by create_ai_context_prompt().
+    
+    Args:
+        top_movers: Dictionary with 'top_gainers', 'top_losers', 'most_actively_traded' keys
+        time_series: Optional daily series (DailySeries) for a specific symbol
+        symbol: Optional symbol being searched
+        news: Optional list of general economic news articles
+        symbol_news: Optional list of news articles specific to the searched symbol
+        token_budget: Maximum estimated tokens for the prompt addition
+        versions: Optional data versions, as for format_market_context()
+        sentiment: Optional aggregated news sentiment, as for serialize_sentiment()
+        forecast_horizon: Business days to forecast, as for format_market_context()
+    
+    Returns:
+        Dictionary with 'formatted_context' (string), 'section_tokens' (tokens
+        used per included section), 'total_tokens', 'token_budget' and
+        'dropped' (sections that did not fit)
+    """
+    remaining = token_budget - _PROMPT_OVERHEAD_TOKENS
+    sections = sorted(
+        _section_renderings(
+            top_movers, time_series, symbol, news, symbol_news, _SectionMemo(versions), sentiment, forecast_horizon
+        ),
+        key=lambda section: SECTION_PRIORITY.index(section[0]),
+    )
+    chosen: Dict[str, Tuple[str, int]] = {}
+    dropped: List[str] = []
+    
+    # First pass: the smallest rendering of each section, in priority order.
+    # Sections after the first cost one extra token for the blank-line separator.
+    for name, renderings in sections:
+        text = renderings[-1]()
+        tokens = estimate_tokens(text) + (1 if chosen else 0)
+        if tokens <= remaining:
+            chosen[name] = (text, tokens)
+            remaining -= tokens
+        else:
+            dropped.append(name)
+    
+    # Second pass: upgrade included sections to the most detailed rendering
+    # that fits, again in priority order
+    for name, renderings in sections:
+        if name not in chosen or len(renderings) == 1:
+            continue
+        current_text, current_tokens = chosen[name]
+        separator = current_tokens - estimate_tokens(current_text)
+        for render in renderings[:-1]:
+            text = render()
+            tokens = estimate_tokens(text) + separator
+            if tokens - current_tokens <= remaining:
+                chosen[name] = (text, tokens)
+                remaining -= tokens - current_tokens
+                break
+    
+    parts = [text for text, _ in chosen.values()]
+    section_tokens = {name: tokens for name, (_, tokens) in chosen.items()}
+    formatted = "\n\n".join(parts)
+    return {
+        "formatted_context": formatted,
+        "section_tokens": section_tokens,
+        "total_tokens": estimate_tokens(create_ai_context_prompt(formatted)),
+        "token_budget": token_budget,
+        "dropped": dropped,
+    }
+
+
+def _basket_row(symbol: str, series: Optional[DailySeries]) -> str:
+    if not series:
+        return f"  {symbol}: No data available"
+    stats = series.summary()
+    volatility = stats['volatility_21d']
+    position = stats['range_52w']['position']
+    return (
+        f"  {symbol}: {_price(stats['last_close'])} ({stats['last_date']}) | "
+        f"1d {_pct(stats['return_1d'])}, 5d {_pct(stats['return_5d'])}, "
+        f"1m {_pct(stats['return_21d'])}, 1y {_pct(stats['return_252d'])} | "
+        f"vol {'n/a' if volatility is None else f'{volatility * 100:.1f}%'} | "
+        f"from peak {_pct(stats['drawdown'])} | "
+        f"52w {'n/a' if position is None else f'{position * 100:.0f}%'}"
+    )
+
+
+def serialize_basket(
+    series_by_symbol: Dict[str, Optional[DailySeries]],
+    memo: Optional["_SectionMemo"] = None,
+) -> str:
+    """
+    Serialize a basket of symbols as one line each plus basket-level figures.
+    
+    Args:
+        series_by_symbol: Daily series per symbol (None where unavailable), in display order
+        memo: Optional section memo used to reuse per-symbol lines
+    
+    Returns:
+        Formatted string with per-symbol returns, volatility, drawdown and 52-week
+        position, equal-weight returns, best/worst performers and average correlation
+    """
+    memo = memo or _SectionMemo()
+    lines = [f"Basket of {len(series_by_symbol)} symbols (returns: 1d, 5d, 1m, 1y; 21d annualized volatility):"]
+    for symbol, series in series_by_symbol.items():
+        lines.append(memo.render(
+            'basket_row', f"series:{symbol}", series, lambda: _basket_row(symbol, series), symbol
+        ))
+    
+    summaries = {symbol: series.summary() for symbol, series in series_by_symbol.items() if series}
+    if summaries:
+        def equal_weight(field: str) -> Optional[float]:
+            values = [stats[field] for stats in summaries.values() if stats[field] is not None]
+            return sum(values) / len(values) if values else None
+        
+        lines.append(
+            f"  Equal-weight returns: 1d {_pct(equal_weight('return_1d'))}, "
+            f"5d {_pct(equal_weight('return_5d'))}, 1m {_pct(equal_weight('return_21d'))}"
+        )
+        ranked = sorted(
+            (stats['return_21d'], symbol) for symbol, stats in summaries.items() if stats['return_21d'] is not None
+        )
+        if len(ranked) > 1:
+            lines.append(
+                f"  Best 1m: {ranked[-1][1]} ({_pct(ranked[-1][0])}); worst 1m: {ranked[0][1]} ({_pct(ranked[0][0])})"
+            )
+        correlation = average_correlation([series for series in series_by_symbol.values() if series])
+        if correlation is not None:
+            lines.append(f"  Average pairwise correlation of daily returns (3 months): {correlation:.2f}")
+    return "\n".join(lines)
+
+
+def serialize_basket_news(news_by_symbol: Dict[str, List[Dict[str, Any]]], per_symbol: int = 2) -> str:
+    """
+    Serialize the top headlines for each symbol in a basket.
+    
+    Args:
+        news_by_symbol: News articles per symbol
+        per_symbol: Headlines to include per symbol
+    
+    Returns:
+        Formatted string with headlines grouped by symbol
+    """
+    lines = ["Headlines by symbol:"]
+    for symbol, articles in news_by_symbol.items():
+        for article in (articles or [])[:per_symbol]:
+            source = article.get('source', 'Unknown')
+            date = article.get('published_at', '')
+            lines.append(f"  {symbol}: {article.get('title', 'No title')} ({source}{', ' + date if date else ''})")
+    if len(lines) == 1:
+        return "Headlines by symbol: None available"
+    return "\n".join(lines)
+
+
+@metrics.timed('context')
+def format_basket_context(
+    series_by_symbol: Dict[str, Optional[DailySeries]],
+    symbol_news: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+    top_movers: Optional[Dict[str, Any]] = None,
+    news: Optional[List[Dict]] = None,
+    versions: Optional[Dict[str, Any]] = None,
+    sentiment: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> str:
+    """
+    Format a watchlist or portfolio of symbols into a single AI context string.
+    
+    Args:
+        series_by_symbol: Daily series per symbol (None where unavailable), in display order
+        symbol_news: Optional news articles per symbol
+        top_movers: Optional top movers payload, summarized briefly for market backdrop
+        news: Optional general economic news articles
+        versions: Optional data versions, as for format_market_context()
+        sentiment: Optional aggregated news sentiment, as for serialize_sentiment()
+    
+    Returns:
+        Formatted context string ready for inclusion in AI system prompt
+    """
+    memo = _SectionMemo(versions)
+    context_parts = [
+        f"User is asking about this basket of symbols: {', '.join(series_by_symbol)}",
+        serialize_basket(series_by_symbol, memo),
+    ]
+    sentiment_line = serialize_sentiment(sentiment)
+    if sentiment_line:
+        context_parts.append(sentiment_line)
+    if symbol_news:
+        context_parts.append(serialize_basket_news(symbol_news))
+    if top_movers:
+        context_parts.append(memo.render(
+            'movers', 'movers', top_movers, lambda: serialize_movers(top_movers, 3), 3
+        ))
+    if news:
+        context_parts.append(memo.render('news', 'news', news, lambda: serialize_news(news, 3), 3))
+    formatted = "\n\n".join(context_parts)
+    context_tokens.observe(estimate_tokens(formatted), kind='basket')
+    return formatted
+
+
 def create_ai_context_prompt(market_context: str) -> str:
     """
     Wrap market context into a formatted prompt addition for the AI system message.
@@ -214,39 +741,70 @@ You have access to the following current market data and context:
 Use this data to inform your responses. When making recommendations or analysis, refer to specific stocks, prices, and trends visible in this data. You can assume the user has this same information on their screen."""
 
 
+# Tokens taken by the fixed text create_ai_context_prompt() wraps around the context
+_PROMPT_OVERHEAD_TOKENS = estimate_tokens(create_ai_context_prompt(".")) - 1
+
+
+@metrics.timed('context')
 def get_full_context_data(
     top_movers: Dict[str, Any],
-    time_series: Optional[Dict] = None,
+    time_series: Optional[DailySeries] = None,
     symbol: Optional[str] = None,
     news: Optional[List[Dict]] = None,
     symbol_news: Optional[List[Dict]] = None,
+    token_budget: Optional[int] = None,
+    versions: Optional[Dict[str, Any]] = None,
+    include_raw: bool = False,
+    sentiment: Optional[Dict[str, Dict[str, Any]]] = None,
+    forecast_horizon: int = 5,
 ) -> Dict[str, Any]:
     """
-    Get complete context data in both formatted string and raw data forms.
+    Get complete context data in formatted string form, and raw data form on request.
     
     Useful when you need both the formatted context for the AI and the raw data
     for other purposes (e.g., passing back to the UI).
     
     Args:
         top_movers: Dictionary with market mover data
-        time_series: Optional time series data
+        time_series: Optional daily series (DailySeries)
         symbol: Optional stock symbol
         news: Optional general economic news articles
         symbol_news: Optional news articles specific to the searched symbol
+        token_budget: Optional token budget; when set, the context is packed
+                      with pack_market_context() and per-section token usage is reported
+        versions: Optional data versions used to memoize sections (see format_market_context())
+        include_raw: Also return the input data under 'raw_data'
+        sentiment: Optional aggregated news sentiment, as for serialize_sentiment()
+        forecast_horizon: Business days to forecast, as for format_market_context()
     
     Returns:
-        Dictionary with 'formatted_context' (string) and 'raw_data' (dict)
+        Dictionary with 'formatted_context' (string), 'section_tokens' (dict, or
+        None without a budget) and, if requested, 'raw_data' (dict)
     """
-    formatted = format_market_context(top_movers, time_series, symbol, news, symbol_news)
+    section_tokens = None
+    if token_budget:
+        packed = pack_market_context(
+            top_movers, time_series, symbol, news, symbol_news, token_budget, versions, sentiment, forecast_horizon
+        )
+        formatted = packed['formatted_context']
+        section_tokens = packed['section_tokens']
+    else:
+        formatted = format_market_context(
+            top_movers, time_series, symbol, news, symbol_news, versions, sentiment, forecast_horizon
+        )
+    context_tokens.observe(estimate_tokens(formatted), kind='symbol' if symbol else 'market')
     
-    return {
+    context_data = {
         "formatted_context": formatted,
         "ai_prompt_addition": create_ai_context_prompt(formatted),
-        "raw_data": {
+        "section_tokens": section_tokens,
+    }
+    if include_raw:
+        context_data["raw_data"] = {
             "top_movers": top_movers,
             "time_series": time_series,
             "symbol": symbol,
             "news": news,
             "symbol_news": symbol_news,
         }
-    }
+    return context_data
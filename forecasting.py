@@ -0,0 +1,170 @@
+"""
+Forecasting Module
+
+Short-horizon price forecasts for a daily series, computed with vectorized
+NumPy models:
+
+- Simple exponential smoothing of log prices, with the smoothing factor
+  chosen by one-step-ahead error over recent history
+- An AR(p) model of daily log returns fitted by least squares
+- An EWMA (RiskMetrics) volatility estimate, giving a driftless range
+
+Each model reports forecasts with a prediction interval for every business
+day of the horizon. Results are cached per symbol and last bar date, so a
+series is only modelled again once a new bar arrives.
+"""
+
+import time
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from cache import MISSING, TTLCache
+from timeseries import TRADING_DAYS_PER_YEAR, DailySeries, ewma
+
+# History used to fit each model (in bars)
+SES_WINDOW = 3 * TRADING_DAYS_PER_YEAR
+AR_WINDOW = 5 * TRADING_DAYS_PER_YEAR
+# Fewest bars needed for a forecast
+MIN_BARS = 60
+# Smoothing factors tried for exponential smoothing
+SES_ALPHAS = np.array([0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.8, 1.0])
+# RiskMetrics decay for daily volatility
+EWMA_LAMBDA = 0.94
+
+forecast_cache = TTLCache('forecasts', ttl=86400, maxsize=512)
+
+
+def _interval(center: np.ndarray, sigma: np.ndarray, z: float) -> Dict[str, List[float]]:
+    """Price forecast and interval from log-price means and standard deviations"""
+    return {
+        'forecast': np.round(np.exp(center), 4).tolist(),
+        'lower': np.round(np.exp(center - z * sigma), 4).tolist(),
+        'upper': np.round(np.exp(center + z * sigma), 4).tolist(),
+    }
+
+
+def exponential_smoothing(log_prices: np.ndarray, horizon: int, z: float) -> Dict[str, Any]:
+    """
+    Simple exponential smoothing of log prices.
+
+    Every candidate alpha is run over the window and the one with the lowest
+    one-step-ahead squared error is kept. The forecast is flat at the last
+    level; its variance grows by alpha**2 per step.
+    """
+    x = log_prices[-SES_WINDOW:]
+    levels = np.vstack([ewma(x, alpha) for alpha in SES_ALPHAS])
+    errors = x[1:] - levels[:, :-1]
+    sse = np.einsum('ij,ij->i', errors, errors)
+    best = int(np.argmin(sse))
+    alpha = float(SES_ALPHAS[best])
+    sigma = float(np.sqrt(sse[best] / errors.shape[1]))
+    steps = np.arange(horizon)
+    center = np.full(horizon, levels[best, -1])
+    spread = sigma * np.sqrt(1.0 + steps * alpha ** 2)
+    result = {'alpha': alpha}
+    result.update(_interval(center, spread, z))
+    return result
+
+
+def autoregressive(log_prices: np.ndarray, horizon: int, z: float, order: int = 5) -> Dict[str, Any]:
+    """
+    AR(p) model of daily log returns fitted by ordinary least squares.
+
+    Returns are forecast recursively and accumulated into log prices. The
+    interval uses the model's impulse response: the error of the cumulative
+    return after h steps weights each future shock by the summed responses.
+    """
+    returns = np.diff(log_prices[-(AR_WINDOW + 1):])
+    n = len(returns)
+    lags = np.column_stack([returns[order - i - 1:n - i - 1] for i in range(order)])
+    design = np.column_stack([np.ones(n - order), lags])
+    target = returns[order:]
+    coefficients, *_ = np.linalg.lstsq(design, target, rcond=None)
+    residuals = target - design @ coefficients
+    sigma = float(np.sqrt(residuals @ residuals / max(len(target) - order - 1, 1)))
+    intercept, phi = coefficients[0], coefficients[1:]
+
+    # Recursive mean forecast of returns
+    history = list(returns[-order:][::-1])
+    predicted = np.empty(horizon)
+    for step in range(horizon):
+        predicted[step] = intercept + phi @ np.array(history[:order])
+        history.insert(0, predicted[step])
+
+    # Impulse responses psi_j, then the variance of the cumulative return
+    psi = np.zeros(horizon)
+    psi[0] = 1.0
+    for j in range(1, horizon):
+        k = min(j, order)
+        psi[j] = phi[:k] @ psi[j - k:j][::-1]
+    cumulative = np.cumsum(psi)
+    spread = sigma * np.sqrt(np.cumsum(cumulative ** 2))
+
+    result = {'order': order, 'coefficients': np.round(coefficients, 6).tolist()}
+    result.update(_interval(log_prices[-1] + np.cumsum(predicted), spread, z))
+    return result
+
+
+def ewma_volatility(log_prices: np.ndarray, horizon: int, z: float) -> Dict[str, Any]:
+    """
+    RiskMetrics EWMA volatility of daily log returns and the driftless range it implies.
+    """
+    returns = np.diff(log_prices)
+    variance = ewma(returns ** 2, 1.0 - EWMA_LAMBDA)[-1]
+    daily = float(np.sqrt(variance))
+    steps = np.arange(1, horizon + 1)
+    result = {
+        'daily': round(daily, 6),
+        'annualized': round(daily * np.sqrt(TRADING_DAYS_PER_YEAR), 6),
+    }
+    interval = _interval(np.full(horizon, log_prices[-1]), daily * np.sqrt(steps), z)
+    result.update({'lower': interval['lower'], 'upper': interval['upper']})
+    return result
+
+
+def forecast(series: DailySeries, horizon: int = 5, confidence: float = 0.8) -> Optional[Dict[str, Any]]:
+    """
+    Forecast a daily series a number of business days ahead.
+
+    Results are cached per (symbol, last bar date, bars, horizon, confidence).
+
+    Args:
+        series: Daily series of the symbol
+        horizon: Business days to forecast
+        confidence: Coverage of the prediction intervals, e.g. 0.8 for 80%
+
+    Returns:
+        Dict with the last price, forecast dates and each model's forecasts
+        and intervals, or None when the series is too short
+    """
+    if series is None or len(series) < MIN_BARS:
+        return None
+    key = (series.symbol, series.last_date, len(series), horizon, confidence)
+    cached = forecast_cache.get(key)
+    if cached is not MISSING:
+        return cached
+
+    started = time.perf_counter()
+    prices = series.prices()
+    valid = prices[~np.isnan(prices) & (prices > 0)]
+    if len(valid) < MIN_BARS:
+        return None
+    log_prices = np.log(valid)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    dates = np.busday_offset(series.dates[-1], np.arange(1, horizon + 1), roll='forward')
+    result = {
+        'symbol': series.symbol,
+        'last_date': series.last_date,
+        'last_price': round(float(valid[-1]), 4),
+        'horizon': horizon,
+        'confidence': confidence,
+        'dates': [str(day) for day in dates],
+        'smoothing': exponential_smoothing(log_prices, horizon, z),
+        'autoregressive': autoregressive(log_prices, horizon, z),
+        'volatility': ewma_volatility(log_prices, horizon, z),
+    }
+    result['compute_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    forecast_cache.set(key, result)
+    return result
@@ -0,0 +1,20 @@
+"""
+Gunicorn configuration for serving the app with cooperative (gevent) workers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '3000')}"
+# Each worker keeps its own caches and snapshot refresher, so prefer few
+# workers with many connections over many workers
+workers = int(os.getenv("WEB_WORKERS", "1"))
+worker_class = "gevent"
+# Concurrent requests (including open answer streams) per worker
+worker_connections = int(os.getenv("WEB_WORKER_CONNECTIONS", "1000"))
+# Long enough for a slow streamed answer
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
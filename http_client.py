@@ -0,0 +1,234 @@
+"""
+Upstream HTTP Client Module
+
+This module provides the shared HTTP client used by the Alpha Vantage
+fetchers. A single pooled requests.Session keeps connections alive between
+calls, every request carries connect and read timeouts so a hung upstream
+cannot pin a worker, and transient failures are retried a bounded number of
+times with jittered exponential backoff. The client also counts connection
+reuse and time spent per call. An optional RateLimitScheduler (see
+scheduler.py) admits each attempt and inspects responses for throttling,
+and an optional concurrency limit caps how many requests are in flight.
+Latency, payload size, retries and throttles are also exported as metrics
+(see metrics.py).
+"""
+
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from metrics import REGISTRY, SIZE_BUCKETS
+from scheduler import RateLimitScheduler, UpstreamThrottled
+
+# HTTP statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+request_seconds = REGISTRY.histogram(
+    'upstream_request_duration_seconds', 'Upstream HTTP attempt latency', ['function', 'outcome'],
+)
+response_bytes = REGISTRY.histogram(
+    'upstream_response_bytes', 'Upstream response body size', ['function'], buckets=SIZE_BUCKETS,
+)
+retries_total = REGISTRY.counter('upstream_retries_total', 'Upstream attempts retried', ['function'])
+throttled_total = REGISTRY.counter(
+    'upstream_throttled_total',
+    'Upstream calls refused for quota (reason="quota") or answered with a throttle message (reason="upstream")',
+    ['function', 'reason'],
+)
+
+
+class UpstreamClient:
+    """
+    Pooled JSON-over-HTTP client with timeouts, retries and call statistics.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 15.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        pool_size: int = 16,
+        scheduler: Optional[RateLimitScheduler] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        """
+        Args:
+            base_url: Endpoint that every request is sent to
+            connect_timeout: Seconds to wait for a TCP/TLS connection
+            read_timeout: Seconds to wait between bytes of the response
+            max_retries: Retries after the first attempt for transient failures
+            backoff_base: Base delay in seconds for exponential backoff
+            backoff_max: Upper bound in seconds for a single backoff delay
+            pool_size: Maximum number of kept-alive connections per host
+            scheduler: Optional rate-limit scheduler every attempt must pass through
+            max_concurrency: Optional cap on requests in flight at once; further
+                             callers wait for a free slot
+        """
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.scheduler = scheduler
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self.in_flight = 0
+
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._by_function: Dict[str, Dict[str, float]] = {}
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff delay for a retry attempt"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record(self, label: str, seconds: float, failed: bool) -> None:
+        request_seconds.observe(seconds, function=label, outcome='error' if failed else 'ok')
+        with self._lock:
+            self.calls += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            if failed:
+                self.failures += 1
+            entry = self._by_function.setdefault(label, {'calls': 0, 'seconds': 0.0})
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+
+    def get_json(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Send a GET request with the given query parameters and decode the JSON body.
+
+        Connection errors, timeouts and retryable statuses are retried with
+        jittered backoff; the last error is raised once retries are exhausted.
+
+        Args:
+            params: Query parameters for the request
+
+        Returns:
+            Decoded JSON response body
+
+        Raises:
+            UpstreamThrottled: If the scheduler has no call slot or the upstream reports throttling
+        """
+        label = str(params.get('function', 'unknown'))
+        with metrics.span('upstream', label):
+            return self._get_json(label, params)
+
+    def _get_json(self, label: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            if self.scheduler is not None:
+                try:
+                    self.scheduler.acquire()
+                except UpstreamThrottled:
+                    throttled_total.inc(function=label, reason='quota')
+                    raise
+            start = time.perf_counter()
+            try:
+                response = self._send(params)
+                if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                    raise requests.HTTPError(f"Retryable status {response.status_code}", response=response)
+                response.raise_for_status()
+                response_bytes.observe(len(response.content), function=label)
+                data = response.json()
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                self._record(label, time.perf_counter() - start, failed=True)
+                retryable = not isinstance(e, requests.HTTPError) or (
+                    e.response is not None and e.response.status_code in RETRY_STATUSES
+                )
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                retries_total.inc(function=label)
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            except ValueError:
+                # Body was not JSON; not worth retrying
+                self._record(label, time.perf_counter() - start, failed=True)
+                raise
+            self._record(label, time.perf_counter() - start, failed=False)
+            if self.scheduler is not None:
+                try:
+                    self.scheduler.observe(data)
+                except UpstreamThrottled:
+                    throttled_total.inc(function=label, reason='upstream')
+                    raise
+            return data
+
+    def _send(self, params: Dict[str, Any]) -> requests.Response:
+        """Send one request, holding a concurrency slot while it is in flight"""
+        if self._slots is None:
+            return self.session.get(self.base_url, params=params, timeout=self.timeout)
+        with self._slots:
+            with self._lock:
+                self.in_flight += 1
+            try:
+                return self.session.get(self.base_url, params=params, timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+    def connection_stats(self) -> Dict[str, int]:
+        """
+        Connections opened versus requests served by the keep-alive pool.
+
+        Returns:
+            Dictionary with 'requests', 'connections_opened' and 'connections_reused'
+        """
+        pools = self._adapter.poolmanager.pools
+        sent = opened = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            sent += pool.num_requests
+            opened += pool.num_connections
+        return {
+            'requests': sent,
+            'connections_opened': opened,
+            'connections_reused': max(sent - opened, 0),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of call, retry, timing and connection counters.
+
+        Returns:
+            Dictionary of client statistics, including a per-function breakdown
+        """
+        with self._lock:
+            stats: Dict[str, Any] = {
+                'calls': self.calls,
+                'retries': self.retries,
+                'failures': self.failures,
+                'total_seconds': round(self.total_seconds, 4),
+                'avg_seconds': round(self.total_seconds / self.calls, 4) if self.calls else 0.0,
+                'max_seconds': round(self.max_seconds, 4),
+                'in_flight': self.in_flight,
+                'max_concurrency': self.max_concurrency,
+                'by_function': {name: dict(entry) for name, entry in self._by_function.items()},
+            }
+        stats.update(self.connection_stats())
+        if self.scheduler is not None:
+            stats['scheduler'] = self.scheduler.stats()
+        return stats
+
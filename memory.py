@@ -0,0 +1,126 @@
+"""
+Conversation Memory Module
+
+Follow-up questions need the earlier conversation, but sending the whole
+chat history would grow the prompt with every turn. This module keeps the
+most recent turns verbatim and folds older ones into a rolling summary.
+The summary is stored with the conversation (see chat_store.py) and only
+updated once a batch of turns has aged out of the verbatim window, so most
+requests reuse it without another model call.
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+import metrics
+from cache import SingleFlight
+from chat_store import ChatStore
+from context_harness import estimate_tokens
+
+
+@dataclass(frozen=True)
+class Recall:
+    """What the model is told about a conversation before the new question"""
+    summary: Optional[str] = None
+    turns: List[Dict[str, str]] = field(default_factory=list)
+
+    def tokens(self) -> int:
+        """Estimated prompt tokens used by the summary and verbatim turns"""
+        return estimate_tokens(self.summary or "") + sum(_turn_tokens(turn) for turn in self.turns)
+
+
+def _turn_tokens(turn: Dict[str, str]) -> int:
+    return estimate_tokens(turn['question']) + estimate_tokens(turn['answer'])
+
+
+class ConversationMemory:
+    """
+    Bounded recall of a conversation: a rolling summary plus the latest turns.
+    """
+
+    def __init__(
+        self,
+        store: ChatStore,
+        summarize: Callable[[Optional[str], Sequence[Dict[str, str]]], str],
+        recent_turns: int = 4,
+        summary_batch: int = 4,
+        token_budget: int = 1500,
+    ):
+        """
+        Args:
+            store: Chat store holding messages and summaries
+            summarize: Folds turns into a summary: (previous_summary, turns) -> summary
+            recent_turns: Turns always kept verbatim
+            summary_batch: Extra turns allowed to accumulate before they are summarized
+            token_budget: Estimated token cap for the verbatim turns
+        """
+        self.store = store
+        self.summarize = summarize
+        self.recent_turns = recent_turns
+        self.summary_batch = summary_batch
+        self.token_budget = token_budget
+        self._flight = SingleFlight()
+        self.summaries = 0
+        self.failures = 0
+
+    def _verbatim_start(self, turns: List[Dict[str, str]]) -> int:
+        """Index of the oldest turn that can stay verbatim under the window and token budget"""
+        start = len(turns)
+        used = 0
+        while start > 0 and len(turns) - start < self.recent_turns + self.summary_batch:
+            used += _turn_tokens(turns[start - 1])
+            if used > self.token_budget and start < len(turns):
+                break
+            start -= 1
+        return start
+
+    @metrics.timed('memory')
+    def recall(self, conversation_id: Optional[str]) -> Recall:
+        """
+        Summary and verbatim turns to send with the next question.
+
+        When more turns have accumulated than the verbatim window allows, all
+        but the most recent ones are folded into the summary first. If that
+        fails, the previous summary is kept and only the recent turns are sent.
+
+        Args:
+            conversation_id: Conversation to recall (None for a new session)
+
+        Returns:
+            Recall with the summary and turns, oldest first
+        """
+        if not conversation_id:
+            return Recall()
+        summary, through_id = self.store.summary(conversation_id)
+        # Failed answers carry nothing worth remembering
+        turns = [
+            {'id': m['id'], 'question': m['question'], 'answer': m['answer']}
+            for m in self.store.messages_after(conversation_id, through_id)
+            if m['answer']
+        ]
+        if self._verbatim_start(turns) == 0:
+            return Recall(summary, turns)
+
+        # Over the window: summarize everything except the most recent turns
+        keep = turns[-self.recent_turns:] if self.recent_turns else []
+        keep = keep[self._verbatim_start(keep):]
+        folded = turns[:len(turns) - len(keep)]
+        try:
+            summary = self._flight.do(
+                (conversation_id, folded[-1]['id']),
+                lambda: self._fold(conversation_id, summary, folded),
+            )
+        except Exception as e:
+            self.failures += 1
+            print(f"Error summarizing conversation: {str(e)}")
+        return Recall(summary, keep)
+
+    def _fold(self, conversation_id: str, summary: Optional[str], turns: List[Dict[str, str]]) -> str:
+        new_summary = self.summarize(summary, turns)
+        self.store.set_summary(conversation_id, new_summary, turns[-1]['id'])
+        self.summaries += 1
+        return new_summary
+
+    def stats(self) -> Dict[str, int]:
+        """Summary updates made and failed"""
+        return {'summaries': self.summaries, 'failures': self.failures}
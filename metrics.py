@@ -0,0 +1,260 @@
+"""
+Metrics Module
+
+A small in-process metrics registry that renders the Prometheus text
+exposition format, so the app needs no client library. Counters and
+histograms are updated on the hot paths (upstream calls, context builds,
+OpenAI requests); components that already keep their own counters (caches,
+the rate-limit scheduler) are read through collector callbacks at scrape
+time instead of being counted twice.
+
+It also records per-request timing spans: span() measures a block, feeds a
+latency histogram and, inside a traced request, adds the timing to the
+request's trace, which the app reports in a Server-Timing header.
+"""
+
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from cache-hit fast to slow model answers
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Payload size buckets in bytes
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# Token count buckets for model requests
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+# (labels, value) pairs of one metric family, as returned by collectors
+Samples = List[Tuple[Dict[str, Any], float]]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, Any], float]]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, Any], float]]:
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", dict(labels, le=_format_value(bound)), cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    """
+    Named metrics plus collector callbacks, rendered together for /metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Samples]]]] = []
+
+    def _register(self, metric):
+        with self._lock:
+            # Re-registering returns the existing metric, so modules can be reloaded
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collect: Callable[[], Iterable[Tuple[str, str, str, Samples]]]) -> None:
+        """
+        Add a callback run at every scrape.
+
+        Args:
+            collect: Returns (name, type, help, samples) tuples, where type is
+                     'gauge' or 'counter' and samples are (labels, value) pairs
+        """
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collect in collectors:
+            try:
+                families = list(collect())
+            except Exception as e:
+                print(f"Error collecting metrics: {str(e)}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is not None:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+span_seconds = REGISTRY.histogram(
+    'app_span_duration_seconds', 'Time spent in instrumented blocks', ['span'],
+)
+
+# Spans recorded by the current request: (name, description, seconds)
+_trace: "contextvars.ContextVar[Optional[List[Tuple[str, str, float]]]]" = contextvars.ContextVar(
+    'metrics_trace', default=None
+)
+
+
+def begin_trace() -> List[Tuple[str, str, float]]:
+    """Start collecting spans for the current request; worker threads that copy the context share it"""
+    trace: List[Tuple[str, str, float]] = []
+    _trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[List[Tuple[str, str, float]]]:
+    return _trace.get()
+
+
+@contextmanager
+def span(name: str, description: str = ''):
+    """
+    Time a block, observe it in app_span_duration_seconds and add it to the request trace.
+
+    Args:
+        name: Span name; also the histogram label, so keep the set of names small
+        description: Optional detail shown in the trace (e.g. the upstream function)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        span_seconds.observe(seconds, span=name)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((name, description, seconds))
+
+
+def timed(name: str):
+    """Decorator form of span() for a whole function"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timings(trace: Optional[Sequence[Tuple[str, str, float]]]) -> Dict[str, float]:
+    """Milliseconds per span name, summed over repeats"""
+    totals: Dict[str, float] = {}
+    for name, _, seconds in trace or ():
+        totals[name] = totals.get(name, 0.0) + seconds * 1000
+    return {name: round(ms, 1) for name, ms in totals.items()}
+
+
+def server_timing(trace: Optional[Sequence[Tuple[str, str, float]]], total: Optional[float] = None, limit: int = 20) -> str:
+    """
+    Server-Timing header value for a trace.
+
+    Args:
+        trace: Spans recorded by the request
+        total: Whole request time in seconds, reported as 'total'
+        limit: Maximum number of spans listed
+
+    Returns:
+        Header value, e.g. 'upstream;desc="NEWS_SENTIMENT";dur=120.4, total;dur=131.0'
+    """
+    entries = []
+    for name, description, seconds in list(trace or ())[:limit]:
+        entry = name
+        if description:
+            entry += f';desc="{_escape(description)}"'
+        entries.append(f"{entry};dur={seconds * 1000:.1f}")
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(entries)
@@ -0,0 +1,252 @@
+"""
+News Index Module
+
+Every Alpha Vantage NEWS_SENTIMENT response is parsed once here and ingested
+into an in-process index. Articles are de-duplicated by URL, and inverted
+indexes on tickers and on title/summary terms make ticker lookups and
+keyword searches set intersections instead of scans. Ticker sentiment and
+topics from the feed are kept on each article rather than discarded.
+"""
+
+import heapq
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+_TOKEN = re.compile(r"[a-z0-9$]+")
+_STOPWORDS = frozenset(
+    'a an and are as at be by for from has have in is it its of on or that the this to was were will with'.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase search terms of a text, without stopwords and single characters"""
+    return [token for token in _TOKEN.findall(text.lower()) if len(token) > 1 and token not in _STOPWORDS]
+
+
+def _float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_article(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Convert one NEWS_SENTIMENT feed item into the article dict used by the app.
+
+    Args:
+        raw: Feed item from Alpha Vantage
+
+    Returns:
+        Article with the template fields (title, description, url, image, source,
+        published_at) plus time_published, overall sentiment, per-ticker relevance
+        and sentiment, and topic relevance; None for items without a title
+    """
+    if not raw.get('title'):
+        return None
+    time_published = raw.get('time_published') or ''
+    # Format date from Alpha Vantage format (YYYYMMDDTHHMMSS) to YYYY-MM-DD
+    published_date = ''
+    if len(time_published) >= 8:
+        published_date = f"{time_published[0:4]}-{time_published[4:6]}-{time_published[6:8]}"
+
+    tickers = {}
+    for entry in raw.get('ticker_sentiment') or []:
+        ticker = (entry.get('ticker') or '').upper()
+        if ticker:
+            tickers[ticker] = {
+                'relevance': _float(entry.get('relevance_score')) or 0.0,
+                'score': _float(entry.get('ticker_sentiment_score')),
+                'label': entry.get('ticker_sentiment_label'),
+            }
+    topics = {
+        entry['topic']: _float(entry.get('relevance_score')) or 0.0
+        for entry in raw.get('topics') or []
+        if entry.get('topic')
+    }
+    return {
+        'title': raw.get('title', ''),
+        'description': raw.get('summary', '') or 'No description available',
+        'url': raw.get('url', ''),
+        'image': raw.get('banner_image', '') or raw.get('source_logo', ''),
+        'source': raw.get('source', 'Unknown'),
+        'published_at': published_date,
+        'time_published': time_published,
+        'overall_sentiment_score': _float(raw.get('overall_sentiment_score')),
+        'overall_sentiment_label': raw.get('overall_sentiment_label'),
+        'tickers': tickers,
+        'topics': topics,
+    }
+
+
+def parse_news_feed(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Parse every titled item of a NEWS_SENTIMENT response (empty if there is no feed)"""
+    articles = []
+    for raw in data.get('feed') or []:
+        article = parse_article(raw)
+        if article is not None:
+            articles.append(article)
+    return articles
+
+
+def _newest_first(articles: Iterable[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    return heapq.nlargest(limit, articles, key=lambda article: article['time_published'])
+
+
+class NewsIndex:
+    """
+    De-duplicated, bounded store of recent articles with ticker and term postings.
+    """
+
+    def __init__(self, max_articles: int = 5000, max_age: float = 72 * 3600.0):
+        """
+        Args:
+            max_articles: Articles kept before the least recently seen are dropped
+            max_age: Seconds an article is kept after it was last seen in a feed
+        """
+        self.max_articles = max_articles
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # url -> article, in order of when each was last seen
+        self._articles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._seen_at: Dict[str, float] = {}
+        self._by_ticker: Dict[str, Set[str]] = {}
+        self._by_term: Dict[str, Set[str]] = {}
+        self.ingested = 0
+        self.duplicates = 0
+        self.searches = 0
+
+    def _postings(self, article: Dict[str, Any]):
+        terms = set(tokenize(f"{article['title']} {article['description']}"))
+        return article['tickers'].keys(), terms
+
+    def _add(self, key: str, article: Dict[str, Any]) -> None:
+        tickers, terms = self._postings(article)
+        for ticker in tickers:
+            self._by_ticker.setdefault(ticker, set()).add(key)
+        for term in terms:
+            self._by_term.setdefault(term, set()).add(key)
+
+    def _remove(self, key: str) -> None:
+        article = self._articles.pop(key)
+        self._seen_at.pop(key, None)
+        tickers, terms = self._postings(article)
+        for index, names in ((self._by_ticker, tickers), (self._by_term, terms)):
+            for name in names:
+                keys = index.get(name)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del index[name]
+
+    def ingest(self, articles: Iterable[Dict[str, Any]], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Add parsed articles, replacing earlier copies of the same URL.
+
+        Args:
+            articles: Articles from parse_news_feed()
+            now: Time the feed was received (defaults to now)
+
+        Returns:
+            The articles that were not already indexed
+        """
+        now = now or time.time()
+        added = []
+        with self._lock:
+            for article in articles:
+                key = article['url'] or article['title']
+                if key in self._articles:
+                    # Seen before: refresh it, since sentiment scores can be revised
+                    self._remove(key)
+                    self.duplicates += 1
+                else:
+                    added.append(article)
+                self._articles[key] = article
+                self._seen_at[key] = now
+                self._add(key, article)
+            self.ingested += len(added)
+            self._evict(now)
+        return added
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.max_age
+        while self._articles:
+            oldest = next(iter(self._articles))
+            if len(self._articles) <= self.max_articles and self._seen_at[oldest] >= cutoff:
+                break
+            self._remove(oldest)
+
+    def for_ticker(
+        self,
+        ticker: str,
+        limit: int = 50,
+        min_relevance: float = 0.0,
+        seen_within: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Indexed articles that mention a ticker, newest first.
+
+        Args:
+            ticker: Stock ticker symbol
+            limit: Maximum number of articles to return
+            min_relevance: Minimum Alpha Vantage relevance score for the ticker
+            seen_within: Only articles seen in a feed within this many seconds
+
+        Returns:
+            List of article dicts
+        """
+        ticker = ticker.upper()
+        cutoff = time.time() - seen_within if seen_within is not None else None
+        with self._lock:
+            matches = [
+                self._articles[key]
+                for key in self._by_ticker.get(ticker, ())
+                if self._articles[key]['tickers'][ticker]['relevance'] >= min_relevance
+                and (cutoff is None or self._seen_at[key] >= cutoff)
+            ]
+        return _newest_first(matches, limit)
+
+    def search(self, query: str, ticker: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Articles whose title or summary contains every term of the query, newest first.
+
+        Args:
+            query: Free-text query (may be empty when a ticker is given)
+            ticker: Optional ticker the articles must mention
+            limit: Maximum number of articles to return
+
+        Returns:
+            List of article dicts
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            self.searches += 1
+            postings = [self._by_term.get(term, set()) for term in terms]
+            if ticker:
+                postings.append(self._by_ticker.get(ticker.upper(), set()))
+            if not postings:
+                return []
+            # Intersect starting from the rarest term
+            postings.sort(key=len)
+            keys = set(postings[0])
+            for other in postings[1:]:
+                keys &= other
+                if not keys:
+                    break
+            matches = [self._articles[key] for key in keys]
+        return _newest_first(matches, limit)
+
+    def stats(self) -> Dict[str, int]:
+        """Index size and ingest/search counters"""
+        with self._lock:
+            return {
+                'articles': len(self._articles),
+                'tickers': len(self._by_ticker),
+                'terms': len(self._by_term),
+                'ingested': self.ingested,
+                'duplicates': self.duplicates,
+                'searches': self.searches,
+            }
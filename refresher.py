@@ -0,0 +1,235 @@
+"""
+Market Snapshot Refresher Module
+
+Top movers and economic news are global: every user sees the same data.
+This module polls those feeds on a background thread and publishes them as
+immutable snapshots, so page and consult requests read the latest snapshot
+instead of fetching on the request path. Each snapshot records when it was
+fetched, which makes a stale snapshot visible rather than silent.
+Listeners can subscribe to be told about every snapshot as it is published.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from scheduler import BACKGROUND, upstream_priority
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """
+    Immutable view of the global market feeds at one point in time.
+    """
+    version: int
+    movers: Dict[str, Any]
+    news: Tuple[Dict[str, Any], ...]
+    movers_fetched_at: float
+    news_fetched_at: float
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def fetched_at(self) -> float:
+        """Fetch time of the oldest part of the snapshot (epoch seconds)"""
+        return min(self.movers_fetched_at, self.news_fetched_at)
+
+    def age(self, now: Optional[float] = None) -> float:
+        """Seconds since the oldest part of the snapshot was fetched"""
+        return max((now or time.time()) - self.fetched_at, 0.0)
+
+
+def _freeze_movers(movers: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a movers payload, turning its stock lists into tuples"""
+    return {key: tuple(value) if isinstance(value, list) else value for key, value in movers.items()}
+
+
+class SnapshotRefresher:
+    """
+    Background worker that keeps a MarketSnapshot warm.
+    """
+
+    def __init__(
+        self,
+        fetch_movers: Callable[[], Dict[str, Any]],
+        fetch_news: Callable[[], List[Dict[str, Any]]],
+        interval: float = 300.0,
+        stale_after: float = 900.0,
+    ):
+        """
+        Args:
+            fetch_movers: Returns a top movers payload (with an 'error' key on failure)
+            fetch_news: Returns a list of economic news articles (empty on failure)
+            interval: Seconds between background refreshes
+            stale_after: Age in seconds after which a snapshot is reported as stale
+        """
+        self.fetch_movers = fetch_movers
+        self.fetch_news = fetch_news
+        self.interval = interval
+        self.stale_after = stale_after
+        self._snapshot: Optional[MarketSnapshot] = None
+        self._refresh_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_attempt: Optional[float] = None
+        self._listeners: List[Callable[[MarketSnapshot, Optional[MarketSnapshot]], None]] = []
+        self.refreshes = 0
+        self.failures = 0
+
+    def subscribe(self, listener: Callable[[MarketSnapshot, Optional[MarketSnapshot]], None]) -> None:
+        """
+        Call listener(snapshot, previous) after each new snapshot is published.
+
+        Listeners run on the refreshing thread while the refresh lock is held,
+        so they must be quick and must not block (e.g. only enqueue work).
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[MarketSnapshot, Optional[MarketSnapshot]], None]) -> None:
+        """Stop calling a listener added with subscribe()"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def snapshot(self) -> Optional[MarketSnapshot]:
+        """The latest published snapshot, or None before the first refresh"""
+        return self._snapshot
+
+    def refresh(self) -> MarketSnapshot:
+        """
+        Fetch both feeds and publish a new snapshot.
+
+        A feed that fails keeps its data from the previous snapshot (if any),
+        so a transient upstream error does not blank the page.
+
+        Returns:
+            The newly published snapshot
+        """
+        with self._refresh_lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> MarketSnapshot:
+        self._last_attempt = time.monotonic()
+        previous = self._snapshot
+        now = time.time()
+        errors: Dict[str, str] = {}
+
+        with upstream_priority(BACKGROUND):
+            movers = self.fetch_movers()
+            news = self.fetch_news()
+
+        movers_fetched_at = news_fetched_at = now
+        if movers.get('error') is not None:
+            errors['movers'] = str(movers['error'])
+            if previous is not None:
+                movers = previous.movers
+                movers_fetched_at = previous.movers_fetched_at
+        if not news:
+            errors['news'] = 'No articles returned'
+            if previous is not None:
+                news = previous.news
+                news_fetched_at = previous.news_fetched_at
+
+        snapshot = MarketSnapshot(
+            version=(previous.version + 1) if previous else 1,
+            movers=_freeze_movers(movers),
+            news=tuple(news),
+            movers_fetched_at=movers_fetched_at,
+            news_fetched_at=news_fetched_at,
+            errors=errors,
+        )
+        self._snapshot = snapshot
+        self.refreshes += 1
+        if errors:
+            self.failures += 1
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot, previous)
+            except Exception as e:
+                print(f"Error notifying snapshot listener: {str(e)}")
+        return snapshot
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # Schedule from the last attempt, not the snapshot age: a failed feed
+            # keeps its old fetch time and must not trigger back-to-back retries
+            last = self._last_attempt
+            due_in = self.interval - (time.monotonic() - last) if last is not None else 0.0
+            if due_in > 0:
+                self._stop.wait(due_in)
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                self.failures += 1
+                print(f"Error refreshing market snapshot: {str(e)}")
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the background thread (no-op if it is already running)"""
+        with self._start_lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+            self._thread.start()
+
+    def ensure_fresh(self) -> MarketSnapshot:
+        """
+        Return the current snapshot, refreshing synchronously when needed.
+
+        A refresh happens on the request path only before the first snapshot
+        exists, or when the background thread is not running and the snapshot
+        is older than the refresh interval.
+
+        Returns:
+            A published snapshot
+        """
+        def needs_refresh(snapshot: Optional[MarketSnapshot]) -> bool:
+            return snapshot is None or (not self.running and snapshot.age() > self.interval)
+
+        snapshot = self._snapshot
+        if not needs_refresh(snapshot):
+            return snapshot
+        with self._refresh_lock:
+            # Another caller may have refreshed while we waited for the lock
+            snapshot = self._snapshot
+            if needs_refresh(snapshot):
+                snapshot = self._refresh_locked()
+        return snapshot
+
+    def stop(self) -> None:
+        """Signal the background thread to exit"""
+        self._stop.set()
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Describe the current snapshot for monitoring.
+
+        Returns:
+            Dictionary with version, fetch time, age, staleness and refresh counters
+        """
+        snapshot = self._snapshot
+        status: Dict[str, Any] = {
+            'running': self.running,
+            'interval_seconds': self.interval,
+            'stale_after_seconds': self.stale_after,
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+        }
+        if snapshot is None:
+            status.update({'version': None, 'fetched_at': None, 'age_seconds': None, 'stale': True})
+            return status
+        age = snapshot.age()
+        status.update({
+            'version': snapshot.version,
+            'fetched_at': datetime.fromtimestamp(snapshot.fetched_at, timezone.utc).isoformat(),
+            'age_seconds': round(age, 1),
+            'stale': age > self.stale_after,
+            'errors': snapshot.errors,
+        })
+        return status
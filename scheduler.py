@@ -0,0 +1,388 @@
+"""
+Upstream Request Scheduler Module
+
+This module keeps Alpha Vantage calls inside the per-minute and per-day
+quota. Every upstream call first acquires a token from two token buckets.
+Waiting callers are served in priority order, so interactive symbol lookups
+go ahead of background refreshes, and part of the daily quota is reserved
+for interactive and normal calls: background calls stop short of it, so
+refreshes cannot leave users without symbol lookups for the rest of the day.
+When Alpha Vantage answers with a
+rate-limit "Note"/"Information" body, the scheduler pauses all calls with an
+exponential backoff instead of spending more quota on throttled requests.
+
+The buckets normally live in the process. With several worker processes,
+SharedQuota keeps them (and the throttle pause) in a SQLite file instead, so
+all workers on the host draw from one quota rather than one each.
+"""
+
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Request priorities; lower values are served first
+INTERACTIVE = 0
+NORMAL = 1
+BACKGROUND = 2
+
+# Priority applied to upstream calls made in the current context
+current_priority: contextvars.ContextVar[int] = contextvars.ContextVar('upstream_priority', default=NORMAL)
+
+# Phrases Alpha Vantage uses in its quota messages
+_THROTTLE_PHRASES = ('call frequency', 'rate limit', 'requests per day', 'calls per minute', 'calls per day')
+
+
+class UpstreamThrottled(Exception):
+    """Raised when a call cannot be made within quota, or the upstream reports throttling"""
+
+
+@contextmanager
+def upstream_priority(priority: int):
+    """Run upstream calls made inside the block at the given priority"""
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+def is_throttle_response(data: Any) -> Optional[str]:
+    """
+    Detect an Alpha Vantage quota message.
+
+    Alpha Vantage returns HTTP 200 with a "Note" or "Information" body when a
+    key exceeds its quota. "Information" is also used for unrelated notices
+    (e.g. premium-only endpoints), so the message text is checked as well.
+
+    Args:
+        data: Decoded JSON response body
+
+    Returns:
+        The throttle message, or None if the response is not a throttle
+    """
+    if not isinstance(data, dict):
+        return None
+    for field in ('Note', 'Information'):
+        message = data.get(field)
+        if isinstance(message, str) and any(phrase in message.lower() for phrase in _THROTTLE_PHRASES):
+            return message
+    return None
+
+
+class TokenBucket:
+    """
+    Token bucket holding up to `capacity` tokens, refilled evenly over `period` seconds.
+
+    Not thread-safe on its own; the scheduler guards it with its lock.
+    """
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = float(capacity)
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float, needed: float = 1.0) -> float:
+        """Seconds until `needed` tokens are available (infinite if more than the capacity)"""
+        self._refill(now)
+        if self.tokens >= needed:
+            return 0.0
+        if needed > self.capacity:
+            return math.inf
+        return (needed - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the upstream reports it is throttling us"""
+        self.tokens = 0.0
+
+
+_QUOTA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quota_buckets (
+    quota TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (quota, bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS quota_blocks (
+    quota TEXT PRIMARY KEY,
+    blocked_until REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class SharedQuota:
+    """
+    Token bucket state stored in SQLite, so every process on the host shares one quota.
+
+    Bucket times are wall-clock, since they are compared across processes. Each
+    read-modify-write runs in a BEGIN IMMEDIATE transaction, which serializes
+    admissions between processes. The busy timeout is kept short because the
+    wait blocks the whole process under gevent; a caller that finds the file
+    locked gets sqlite3.OperationalError and retries after busy_timeout.
+    """
+
+    def __init__(self, path: str, name: str = 'alpha_vantage', busy_timeout: float = 0.05):
+        """
+        Args:
+            path: SQLite database file; its directory is created if missing
+            name: Quota name, so several upstreams can share one file
+            busy_timeout: Seconds SQLite waits for another process's write lock before giving up
+        """
+        self.path = path
+        self.name = name
+        self.busy_timeout = busy_timeout
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connect().executescript(_QUOTA_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread, in autocommit mode so transactions are explicit"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _read(self, conn: sqlite3.Connection, buckets: List[TokenBucket]) -> Dict[str, float]:
+        rows = dict(
+            (bucket, (tokens, updated)) for bucket, tokens, updated in conn.execute(
+                "SELECT bucket, tokens, updated FROM quota_buckets WHERE quota = ?", (self.name,)
+            )
+        )
+        now = time.time()
+        for index, bucket in enumerate(buckets):
+            # Unknown buckets start full; a lowered capacity caps stored tokens
+            tokens, updated = rows.get(index, (bucket.capacity, now))
+            bucket.tokens, bucket.updated = min(tokens, bucket.capacity), updated
+        row = conn.execute("SELECT blocked_until FROM quota_blocks WHERE quota = ?", (self.name,)).fetchone()
+        return {'blocked_until': row[0] if row else 0.0}
+
+    def load(self, buckets: List[TokenBucket]) -> Dict[str, float]:
+        """
+        Read the shared state into `buckets` without taking the write lock (for reporting).
+
+        Returns:
+            Dict with 'blocked_until' (epoch seconds)
+        """
+        return self._read(self._connect(), buckets)
+
+    @contextmanager
+    def transaction(self, buckets: List[TokenBucket]) -> Iterator[Dict[str, float]]:
+        """
+        Load the shared state into `buckets`, run the block, then save it back.
+
+        Yields:
+            Dict with 'blocked_until' (epoch seconds), which the block may raise
+
+        Raises:
+            sqlite3.OperationalError: If another process holds the write lock past busy_timeout
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = self._read(conn, buckets)
+            yield state
+            conn.executemany(
+                "INSERT OR REPLACE INTO quota_buckets (quota, bucket, tokens, updated) VALUES (?, ?, ?, ?)",
+                [(self.name, index, bucket.tokens, bucket.updated) for index, bucket in enumerate(buckets)],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO quota_blocks (quota, blocked_until) VALUES (?, ?)",
+                (self.name, state['blocked_until']),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class RateLimitScheduler:
+    """
+    Priority-ordered admission of upstream calls under per-minute and per-day quotas.
+    """
+
+    def __init__(
+        self,
+        per_minute: int,
+        per_day: int,
+        max_wait: float = 20.0,
+        reserve: int = 0,
+        throttle_backoff: float = 15.0,
+        throttle_backoff_max: float = 300.0,
+        shared: Optional[SharedQuota] = None,
+    ):
+        """
+        Args:
+            per_minute: Calls allowed per minute
+            per_day: Calls allowed per day
+            max_wait: Longest a caller waits for a slot before UpstreamThrottled is raised
+            reserve: Daily calls only non-background callers may use; BACKGROUND
+                     calls are refused once the day bucket is down to this many
+            throttle_backoff: Initial pause in seconds after a throttle response
+            throttle_backoff_max: Upper bound for the pause after repeated throttles
+            shared: Optional SharedQuota holding the buckets, so worker processes share
+                    the quota; priority ordering still applies within each process
+        """
+        self.max_wait = max_wait
+        self.reserve = reserve
+        self.throttle_backoff = throttle_backoff
+        self.throttle_backoff_max = throttle_backoff_max
+        self._buckets = [TokenBucket(per_minute, 60.0), TokenBucket(per_day, 86400.0)]
+        self._shared = shared
+        # Bucket and pause times: wall-clock when shared across processes
+        self._clock = time.time if shared is not None else time.monotonic
+        self._cond = threading.Condition()
+        self._waiting: list = []
+        self._seq = itertools.count()
+        self._blocked_until = 0.0
+        self._consecutive_throttles = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    def _wait_time(self, now: float, priority: int = NORMAL) -> float:
+        minute, day = self._buckets
+        # Background calls need one token above the reserve, so they never spend it
+        needed = 1.0 + self.reserve if priority >= BACKGROUND else 1.0
+        return max(self._blocked_until - now, minute.wait_time(now), day.wait_time(now, needed))
+
+    def _admit(self, priority: int) -> float:
+        """Take a token from each bucket if a call may go now; otherwise return the seconds to wait"""
+        if self._shared is None:
+            return self._take(self._clock(), priority)
+        try:
+            with self._shared.transaction(self._buckets) as state:
+                self._blocked_until = state['blocked_until']
+                return self._take(self._clock(), priority)
+        except sqlite3.OperationalError:
+            # Another process is admitting a call; wait (without holding the lock) and retry
+            return self._shared.busy_timeout
+
+    def _take(self, now: float, priority: int) -> float:
+        wait = self._wait_time(now, priority)
+        if wait <= 0:
+            for bucket in self._buckets:
+                bucket.take()
+        return wait
+
+    def acquire(self, priority: Optional[int] = None) -> None:
+        """
+        Block until a call may be sent, serving higher-priority callers first.
+
+        Args:
+            priority: Call priority; defaults to the priority of the current context
+
+        Raises:
+            UpstreamThrottled: If no slot becomes available within max_wait
+        """
+        if priority is None:
+            priority = current_priority.get()
+        ticket = (priority, next(self._seq))
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    remaining = deadline - now
+                    if self._waiting[0] == ticket:
+                        wait = self._admit(priority)
+                        if wait <= 0:
+                            self.admitted += 1
+                            return
+                        if wait > remaining:
+                            self.rejected += 1
+                            raise UpstreamThrottled(
+                                f"Alpha Vantage quota exhausted; next call slot in {wait:.0f}s"
+                            )
+                        self._cond.wait(timeout=wait)
+                    else:
+                        if remaining <= 0:
+                            self.rejected += 1
+                            raise UpstreamThrottled("Timed out waiting for an Alpha Vantage call slot")
+                        self._cond.wait(timeout=remaining)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def observe(self, data: Any) -> None:
+        """
+        Inspect a response body, backing off if it is a throttle message.
+
+        Args:
+            data: Decoded JSON response body
+
+        Raises:
+            UpstreamThrottled: If the response is an Alpha Vantage quota message
+        """
+        message = is_throttle_response(data)
+        with self._cond:
+            if message is None:
+                self._consecutive_throttles = 0
+                return
+            backoff = min(
+                self.throttle_backoff_max,
+                self.throttle_backoff * (2 ** self._consecutive_throttles),
+            )
+            self._consecutive_throttles += 1
+            self.throttled += 1
+            if self._shared is None:
+                self._pause(backoff)
+            else:
+                try:
+                    with self._shared.transaction(self._buckets) as state:
+                        self._blocked_until = state['blocked_until']
+                        self._pause(backoff)
+                        state['blocked_until'] = self._blocked_until
+                except sqlite3.OperationalError as e:
+                    # Still pause this process; other workers will see their own throttle responses
+                    print(f"Error sharing throttle pause: {str(e)}")
+                    self._pause(backoff)
+        raise UpstreamThrottled(message)
+
+    def _pause(self, backoff: float) -> None:
+        self._blocked_until = max(self._blocked_until, self._clock() + backoff)
+        self._buckets[0].drain()
+
+    def stats(self) -> Dict[str, Any]:
+        """Admission, rejection and throttle counters plus current quota state"""
+        with self._cond:
+            if self._shared is not None:
+                # Read-only: reporting never takes the write lock admissions contend for
+                self._blocked_until = self._shared.load(self._buckets)['blocked_until']
+            now = self._clock()
+            minute, day = self._buckets
+            minute.wait_time(now)
+            day.wait_time(now)
+            return {
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'throttled': self.throttled,
+                'waiting': len(self._waiting),
+                'blocked_for_seconds': round(max(self._blocked_until - now, 0.0), 1),
+                'minute_tokens': round(minute.tokens, 2),
+                'day_tokens': round(day.tokens, 2),
+                'day_reserve': self.reserve,
+                'shared': self._shared is not None,
+            }
@@ -0,0 +1,180 @@
+"""
+News Sentiment Aggregation Module
+
+Alpha Vantage scores every article's overall sentiment and its sentiment
+towards each ticker it mentions. This module folds those scores into a
+rolling, time-decayed average per ticker and per topic. Each aggregate is
+two decayed sums (score x weight, and weight) plus the time they were last
+decayed to, so adding an article is O(1) and never rescans history.
+"""
+
+import math
+import threading
+import time
+from calendar import timegm
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+# Alpha Vantage's own sentiment label boundaries
+_LABELS = (
+    (-0.35, 'Bearish'),
+    (-0.15, 'Somewhat-Bearish'),
+    (0.15, 'Neutral'),
+    (0.35, 'Somewhat-Bullish'),
+)
+
+
+def sentiment_label(score: float) -> str:
+    """Alpha Vantage label for a sentiment score in [-1, 1]"""
+    for upper, label in _LABELS:
+        if score < upper:
+            return label
+    return 'Bullish'
+
+
+def published_timestamp(article: Dict[str, Any]) -> Optional[float]:
+    """Epoch seconds of an article's time_published (YYYYMMDDTHHMMSS), or None"""
+    value = article.get('time_published') or ''
+    try:
+        return float(timegm(time.strptime(value[:15], '%Y%m%dT%H%M%S')))
+    except ValueError:
+        return None
+
+
+class _Aggregate:
+    """Exponentially decayed weighted mean of sentiment scores"""
+
+    __slots__ = ('weighted_score', 'weight', 'updated', 'articles')
+
+    def __init__(self, at: float):
+        self.weighted_score = 0.0
+        self.weight = 0.0
+        self.updated = at
+        self.articles = 0
+
+    def add(self, score: float, weight: float, at: float, decay_rate: float) -> None:
+        if at >= self.updated:
+            # Decay the running sums forward to the new article
+            factor = math.exp(-decay_rate * (at - self.updated))
+            self.weighted_score *= factor
+            self.weight *= factor
+            self.updated = at
+        else:
+            # An older article arriving late counts for what it would have decayed to
+            weight *= math.exp(-decay_rate * (self.updated - at))
+        self.weighted_score += score * weight
+        self.weight += weight
+        self.articles += 1
+
+    def view(self, now: float, decay_rate: float) -> Dict[str, Any]:
+        score = self.weighted_score / self.weight if self.weight else 0.0
+        return {
+            'score': round(score, 4),
+            'label': sentiment_label(score),
+            # Effective number of (relevance-weighted) articles behind the score today
+            'weight': round(self.weight * math.exp(-decay_rate * max(now - self.updated, 0.0)), 3),
+            'articles': self.articles,
+            'updated_at': datetime.fromtimestamp(self.updated, timezone.utc).isoformat(),
+        }
+
+
+class SentimentAggregator:
+    """
+    Rolling time-decayed sentiment per ticker and per topic.
+    """
+
+    def __init__(self, half_life: float = 86400.0, max_keys: int = 5000):
+        """
+        Args:
+            half_life: Seconds after which an article counts half as much
+            max_keys: Tickers (and, separately, topics) tracked before the least
+                      recently updated are dropped
+        """
+        self.half_life = half_life
+        self.decay_rate = math.log(2) / half_life
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._tickers: "OrderedDict[str, _Aggregate]" = OrderedDict()
+        self._topics: "OrderedDict[str, _Aggregate]" = OrderedDict()
+        self.updates = 0
+
+    def _update(self, table: "OrderedDict[str, _Aggregate]", key: str, score: float, weight: float, at: float) -> None:
+        aggregate = table.get(key)
+        if aggregate is None:
+            aggregate = table[key] = _Aggregate(at)
+            if len(table) > self.max_keys:
+                table.popitem(last=False)
+        table.move_to_end(key)
+        aggregate.add(score, weight, at, self.decay_rate)
+
+    def add(self, articles: Iterable[Dict[str, Any]], now: Optional[float] = None) -> int:
+        """
+        Fold newly seen articles into the aggregates.
+
+        Ticker scores are weighted by the article's relevance to the ticker;
+        topic scores use the overall article sentiment weighted by topic relevance.
+        Pass each article only once (e.g. only those new to the news index).
+
+        Args:
+            articles: Parsed articles (see news_index.parse_article)
+            now: Fallback time for articles without a publish time
+
+        Returns:
+            Number of aggregate updates made
+        """
+        now = now or time.time()
+        updates = 0
+        with self._lock:
+            for article in articles:
+                at = min(published_timestamp(article) or now, now)
+                for ticker, entry in article.get('tickers', {}).items():
+                    if entry.get('score') is not None and entry.get('relevance'):
+                        self._update(self._tickers, ticker, entry['score'], entry['relevance'], at)
+                        updates += 1
+                overall = article.get('overall_sentiment_score')
+                if overall is not None:
+                    for topic, relevance in article.get('topics', {}).items():
+                        if relevance:
+                            self._update(self._topics, topic, overall, relevance, at)
+                            updates += 1
+            self.updates += updates
+        return updates
+
+    def ticker(self, symbol: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Current sentiment for a ticker, or None if no article has scored it"""
+        with self._lock:
+            aggregate = self._tickers.get(symbol.upper())
+            return aggregate.view(now or time.time(), self.decay_rate) if aggregate else None
+
+    def tickers(self, symbols: Optional[Iterable[str]] = None, limit: int = 20) -> Dict[str, Dict[str, Any]]:
+        """
+        Sentiment for the given tickers, or the most-covered ones when none are given.
+
+        Returns:
+            Dict of ticker to sentiment view (tickers without data are omitted)
+        """
+        now = time.time()
+        with self._lock:
+            if symbols is not None:
+                keys = [symbol.upper() for symbol in symbols if symbol.upper() in self._tickers]
+                return {key: self._tickers[key].view(now, self.decay_rate) for key in keys}
+            views = {key: aggregate.view(now, self.decay_rate) for key, aggregate in self._tickers.items()}
+        ranked = sorted(views, key=lambda key: views[key]['weight'], reverse=True)[:limit]
+        return {key: views[key] for key in ranked}
+
+    def topics(self) -> Dict[str, Dict[str, Any]]:
+        """Current sentiment for every tracked topic"""
+        now = time.time()
+        with self._lock:
+            return {key: aggregate.view(now, self.decay_rate) for key, aggregate in self._topics.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        """Number of tracked tickers and topics and updates applied"""
+        with self._lock:
+            return {
+                'tickers': len(self._tickers),
+                'topics': len(self._topics),
+                'updates': self.updates,
+                'half_life_seconds': self.half_life,
+            }
@@ -0,0 +1,208 @@
+"""
+Daily Series Store Module
+
+This module keeps a local SQLite copy of each symbol's daily OHLCV history,
+so a search for a known symbol is served from disk. The first fetch for a
+symbol loads the full history; later fetches request only Alpha Vantage's
+compact window and append the new rows. Once a symbol has been checked for
+the latest completed trading session, no upstream call is needed at all.
+"""
+
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from timeseries import DailySeries
+
+MARKET_TZ = ZoneInfo("America/New_York")
+# Daily bars are published a little after the 16:00 close
+SESSION_PUBLISHED_AT = dt_time(16, 30)
+
+# Alpha Vantage field names, in column order
+FIELDS = (
+    ('open', '1. open'),
+    ('high', '2. high'),
+    ('low', '3. low'),
+    ('close', '4. close'),
+    ('adjusted_close', '5. adjusted close'),
+    ('volume', '6. volume'),
+    ('dividend_amount', '7. dividend amount'),
+    ('split_coefficient', '8. split coefficient'),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_bars (
+    symbol TEXT NOT NULL,
+    date TEXT NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    adjusted_close REAL,
+    volume INTEGER,
+    dividend_amount REAL,
+    split_coefficient REAL,
+    PRIMARY KEY (symbol, date)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS series_sync (
+    symbol TEXT PRIMARY KEY,
+    checked_session TEXT NOT NULL,
+    full_history INTEGER NOT NULL
+);
+"""
+
+
+def latest_session(now: Optional[datetime] = None) -> date:
+    """
+    Most recent trading session whose daily bar should already be published.
+
+    Weekends roll back to Friday, and before the publish time the previous
+    weekday is used. Exchange holidays are not modelled; a check on a holiday
+    simply finds no new bar and is not repeated that day.
+
+    Args:
+        now: Current time (defaults to now in the market timezone)
+
+    Returns:
+        Date of the latest completed session
+    """
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    day = now.date()
+    if now.time() < SESSION_PUBLISHED_AT:
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+@dataclass(frozen=True)
+class SyncState:
+    """When a symbol was last checked upstream and whether full history is stored"""
+    checked_session: date
+    full_history: bool
+
+
+def _parse_number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SeriesStore:
+    """
+    SQLite-backed store of daily bars keyed by symbol and date.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite database file; its directory is created if missing
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run alongside a writer"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def sync_state(self, symbol: str) -> Optional[SyncState]:
+        """Upstream sync state for a symbol, or None if it has never been fetched"""
+        row = self._connect().execute(
+            "SELECT checked_session, full_history FROM series_sync WHERE symbol = ?",
+            (symbol,),
+        ).fetchone()
+        if row is None:
+            return None
+        return SyncState(date.fromisoformat(row[0]), bool(row[1]))
+
+    def latest_date(self, symbol: str) -> Optional[str]:
+        """Date string of the newest stored bar for a symbol"""
+        row = self._connect().execute(
+            "SELECT MAX(date) FROM daily_bars WHERE symbol = ?", (symbol,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def upsert(
+        self,
+        symbol: str,
+        series: Dict[str, Dict[str, str]],
+        checked_session: date,
+        full_history: bool,
+    ) -> int:
+        """
+        Insert or replace bars from an Alpha Vantage "Time Series (Daily)" payload.
+
+        Args:
+            symbol: Stock ticker symbol
+            series: Dict of date string to Alpha Vantage OHLCV fields
+            checked_session: Session the symbol is now known to be current for
+            full_history: Whether the payload was a full-history download
+
+        Returns:
+            Number of rows written
+        """
+        rows: List[Tuple[Any, ...]] = []
+        for day, bar in series.items():
+            values = [_parse_number(bar.get(av_name)) for _, av_name in FIELDS]
+            volume = values[5]
+            values[5] = int(volume) if volume is not None else None
+            rows.append((symbol, day, *values))
+
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO daily_bars "
+                "(symbol, date, open, high, low, close, adjusted_close, volume, dividend_amount, split_coefficient) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute(
+                "INSERT INTO series_sync (symbol, checked_session, full_history) VALUES (?, ?, ?) "
+                "ON CONFLICT(symbol) DO UPDATE SET checked_session = excluded.checked_session, "
+                "full_history = MAX(series_sync.full_history, excluded.full_history)",
+                (symbol, checked_session.isoformat(), int(full_history)),
+            )
+        return len(rows)
+
+    def rows(self, symbol: str) -> List[Tuple[Any, ...]]:
+        """
+        Stored bars for a symbol in ascending date order.
+
+        Returns:
+            Tuples of (date, open, high, low, close, adjusted_close, volume,
+            dividend_amount, split_coefficient)
+        """
+        return self._connect().execute(
+            "SELECT date, open, high, low, close, adjusted_close, volume, dividend_amount, split_coefficient "
+            "FROM daily_bars WHERE symbol = ? ORDER BY date",
+            (symbol,),
+        ).fetchall()
+
+    def load(self, symbol: str) -> Optional[DailySeries]:
+        """
+        Stored history as a columnar DailySeries.
+
+        Returns:
+            DailySeries sorted by date, or None if nothing is stored
+        """
+        rows = self.rows(symbol)
+        if not rows:
+            return None
+        return DailySeries.from_rows(symbol, rows)
@@ -0,0 +1,353 @@
+"""
+Shared Cache Module
+
+This module provides a cache that every worker process on a host can read
+and write, backed by a local SQLite database in WAL mode, so no external
+service is needed. With several gunicorn workers, an upstream payload
+fetched by one worker is reused by the others instead of each spending its
+own Alpha Vantage quota on it.
+
+Values are stored as zlib-compressed compact JSON. A lease table acts as a
+cross-process lock: when a key is missing, one worker takes the key's lease
+and refreshes it while the others wait for the result. Leases expire, so a
+worker that dies mid-refresh only delays the others, and waiting is capped
+by a deadline well below the request timeout: a worker that has waited too
+long fetches for itself rather than hold its request.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+from cache import MISSING
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    cache TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (cache, key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS cache_leases (
+    cache TEXT NOT NULL,
+    key TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (cache, key)
+) WITHOUT ROWID;
+"""
+
+
+def encode(value: Any, level: int = 6) -> bytes:
+    """Compact JSON, zlib-compressed"""
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'), level)
+
+
+def decode(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob))
+
+
+def _key(key: Hashable) -> str:
+    # Tuples and strings used as cache keys map to stable JSON text
+    return json.dumps(key, separators=(',', ':'))
+
+
+class SharedCache:
+    """
+    Cross-process TTL cache stored in SQLite, with per-key refresh leases.
+
+    Several caches can share one database file; entries are namespaced by
+    cache name. Times are wall-clock, since they are compared across processes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        ttl: float,
+        maxsize: int = 1024,
+        lease_timeout: float = 60.0,
+        wait_timeout: float = 10.0,
+        poll_interval: float = 0.1,
+        compress_level: int = 6,
+    ):
+        """
+        Args:
+            name: Cache name, used to namespace entries and when reporting stats
+            path: SQLite database file; its directory is created if missing
+            ttl: Time-to-live for each entry, in seconds
+            maxsize: Entries kept before the ones closest to expiry are dropped
+            lease_timeout: Seconds a refresh lease is held before other workers may take it over;
+                           longer than the slowest upstream fetch including retries
+            wait_timeout: Seconds to wait for another worker's lease before loading without it
+            poll_interval: Seconds between checks while another worker holds a lease
+            compress_level: zlib level for stored values (1 fastest, 9 smallest)
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.name = name
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.lease_timeout = lease_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.compress_level = compress_level
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.lease_waits = 0
+        self.lease_timeouts = 0
+        self.evictions = 0
+        self.bytes_written = 0
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run alongside a writer"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, field: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def lookup(self, key: Hashable) -> Tuple[Any, float]:
+        """
+        Look up a key.
+
+        Args:
+            key: Cache key (a string or JSON-serializable tuple)
+
+        Returns:
+            (value, seconds until it expires), or (MISSING, 0.0) when absent or expired
+        """
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE cache = ? AND key = ?",
+            (self.name, _key(key)),
+        ).fetchone()
+        remaining = row[1] - time.time() if row else 0.0
+        if row is None or remaining <= 0:
+            self._count('misses')
+            return MISSING, 0.0
+        try:
+            value = decode(row[0])
+        except (zlib.error, ValueError) as e:
+            print(f"Discarding unreadable shared cache entry {self.name}/{key}: {str(e)}")
+            self.invalidate(key)
+            self._count('misses')
+            return MISSING, 0.0
+        self._count('hits')
+        return value, remaining
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """The cached value, or default when the key is absent or expired"""
+        value, _ = self.lookup(key)
+        return default if value is MISSING else value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a value for every worker, then drop expired entries and trim to maxsize.
+
+        Args:
+            key: Cache key (a string or JSON-serializable tuple)
+            value: JSON-serializable value
+            ttl: Optional TTL override for this entry, in seconds
+        """
+        blob = encode(value, self.compress_level)
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (cache, key, value, stored_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (self.name, _key(key), blob, now, now + (self.ttl if ttl is None else ttl)),
+            )
+            removed = conn.execute(
+                "DELETE FROM cache_entries WHERE cache = ? AND (expires_at <= ? OR key IN ("
+                "SELECT key FROM cache_entries WHERE cache = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?))",
+                (self.name, now, self.name, self.maxsize),
+            ).rowcount
+        self._count('bytes_written', len(blob))
+        if removed:
+            self._count('evictions', removed)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove a single key for every worker"""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache_entries WHERE cache = ? AND key = ?", (self.name, _key(key)))
+
+    def clear(self) -> None:
+        """Remove every entry of this cache (counters are kept)"""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache_entries WHERE cache = ?", (self.name,))
+
+    def __len__(self) -> int:
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE cache = ? AND expires_at > ?", (self.name, time.time())
+        ).fetchone()
+        return row[0]
+
+    def _acquire(self, key: str, owner: str) -> bool:
+        """Take a key's lease if it is free or its holder's lease has expired"""
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO cache_leases (cache, key, owner, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(cache, key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE cache_leases.expires_at <= ?",
+                (self.name, key, owner, now + self.lease_timeout, now),
+            )
+        return cursor.rowcount == 1
+
+    def _release(self, key: str, owner: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "DELETE FROM cache_leases WHERE cache = ? AND key = ? AND owner = ?", (self.name, key, owner)
+            )
+
+    def _timed_out(self, key: Hashable, deadline: float) -> bool:
+        """Whether a lease wait has passed its deadline (counted and logged once when it has)"""
+        if time.monotonic() < deadline:
+            return False
+        self._count('lease_timeouts')
+        print(f"Gave up waiting {self.wait_timeout:g}s for shared cache lease {self.name}/{key}; loading without it")
+        return True
+
+    @contextmanager
+    def lease(self, key: Hashable) -> Iterator[bool]:
+        """
+        Hold a key's cross-process lease for the duration of the block, waiting for it if needed.
+
+        Only one worker on the host is inside the block for a given key at a time
+        (until lease_timeout passes, after which a waiting worker takes over).
+        A worker still waiting after wait_timeout enters the block without the lease.
+
+        Yields:
+            True if the lease is held, False if the wait timed out
+        """
+        encoded, owner = _key(key), uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+        held = self._acquire(encoded, owner)
+        waited = not held
+        while not held and not self._timed_out(key, deadline):
+            time.sleep(self.poll_interval)
+            held = self._acquire(encoded, owner)
+        if waited:
+            self._count('lease_waits')
+        try:
+            yield held
+        finally:
+            if held:
+                self._release(encoded, owner)
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        load: Callable[[], Any],
+        should_cache: Optional[Callable[[Any], bool]] = None,
+        ttl: Optional[float] = None,
+    ) -> Tuple[Any, Optional[float]]:
+        """
+        Return the cached value, or load and store it with only one worker loading at a time.
+
+        A worker that misses takes the key's lease and runs load(); workers that
+        miss meanwhile wait and then read its result. If the result is not
+        cached (should_cache said no), the next waiter takes the lease and loads.
+        A waiter still without a value after wait_timeout loads it itself.
+
+        Args:
+            key: Cache key (a string or JSON-serializable tuple)
+            load: Zero-argument function returning a JSON-serializable value
+            should_cache: Optional predicate deciding whether a loaded value is stored
+            ttl: Optional TTL override for a loaded value, in seconds
+
+        Returns:
+            (value, seconds it stays cached), where seconds is None if it was not cached
+        """
+        value, remaining = self.lookup(key)
+        if value is not MISSING:
+            return value, remaining
+        encoded, owner = _key(key), uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+        held = self._acquire(encoded, owner)
+        waited = not held
+        while not held and not self._timed_out(key, deadline):
+            time.sleep(self.poll_interval)
+            value, remaining = self.lookup(key)
+            if value is not MISSING:
+                self._count('lease_waits')
+                return value, remaining
+            held = self._acquire(encoded, owner)
+        if waited:
+            self._count('lease_waits')
+        try:
+            if held:
+                # Another worker may have stored the value between our miss and the lease
+                value, remaining = self.lookup(key)
+                if value is not MISSING:
+                    return value, remaining
+            value = load()
+            self._count('loads')
+            if should_cache is not None and not should_cache(value):
+                return value, None
+            ttl = self.ttl if ttl is None else ttl
+            try:
+                self.set(key, value, ttl)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                # Serving the fresh value matters more than sharing it
+                print(f"Error writing shared cache {self.name}/{key}: {str(e)}")
+                return value, None
+            return value, ttl
+        finally:
+            if held:
+                self._release(encoded, owner)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of this process's counters plus the shared entry count.
+
+        Returns:
+            Dictionary with size, bounds and hit/miss/load/lease-wait/lease-timeout counters
+        """
+        size = len(self)
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'shared': True,
+                'path': self.path,
+                'ttl': self.ttl,
+                'maxsize': self.maxsize,
+                'size': size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'lease_waits': self.lease_waits,
+                'lease_timeouts': self.lease_timeouts,
+                'evictions': self.evictions,
+                'bytes_written': self.bytes_written,
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+            }
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# The app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """The app module, imported once with throwaway databases and no background refresh"""
+    data = tmp_path_factory.mktemp('data')
+    os.environ.update(
+        OPENAI_API_KEY='test',
+        ALPHAVANTAGE_API_KEY='test',
+        SERIES_DB_PATH=str(data / 'series.sqlite3'),
+        CHAT_DB_PATH=str(data / 'chat.sqlite3'),
+        SHARED_CACHE_PATH=str(data / 'shared_cache.sqlite3'),
+        SNAPSHOT_BACKGROUND_REFRESH='false',
+    )
+    import app
+    return app
@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import pytest
+
+
+def _chunk(content=None, finish_reason=None):
+    choice = SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=finish_reason)
+    return SimpleNamespace(choices=[choice], usage=None)
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions, returning queued results and counting calls"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def create(self, stream=False, **kwargs):
+        self.calls += 1
+        result = self.results.pop(0)
+        if stream:
+            return iter(result) if isinstance(result, list) else result
+        message = SimpleNamespace(content=result)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def ai(app_module):
+    # Imported through the app, which sets up the environment the OpenAI client needs
+    return app_module.ai
+
+
+@pytest.fixture
+def completions(ai, monkeypatch):
+    ai.response_cache.clear()
+
+    def install(*results):
+        fake = FakeCompletions(*results)
+        monkeypatch.setattr(ai, 'client', SimpleNamespace(chat=SimpleNamespace(completions=fake)))
+        return fake
+
+    yield install
+    ai.response_cache.clear()
+
+
+def _broken_stream():
+    yield _chunk('The market')
+    raise ConnectionError('reset')
+
+
+def test_respond_caches_answers_but_not_blank_ones(ai, completions):
+    fake = completions('', None, 'Stocks rose.')
+    assert ai.respond('Why?', context='c') == ''
+    assert ai.respond('Why?', context='c') is None
+    assert ai.respond('Why?', context='c') == 'Stocks rose.'
+    assert ai.respond('why', context='c') == 'Stocks rose.'
+    assert fake.calls == 3
+
+
+def test_respond_stream_caches_only_completed_answers(ai, completions):
+    fake = completions(
+        _broken_stream(),
+        [_chunk('Cut'), _chunk(' off')],
+        [_chunk(finish_reason='stop')],
+        [_chunk('Stocks'), _chunk(' rose.'), _chunk(finish_reason='stop')],
+    )
+    with pytest.raises(ConnectionError):
+        list(ai.respond_stream('Why?'))
+    assert list(ai.respond_stream('Why?')) == ['Cut', ' off']
+    assert list(ai.respond_stream('Why?')) == []
+    assert list(ai.respond_stream('Why?')) == ['Stocks', ' rose.']
+    # Served from the cache as one delta
+    assert list(ai.respond_stream('Why?')) == ['Stocks rose.']
+    assert fake.calls == 4
+
+
+def test_app_sets_response_ttl_from_refresh_interval(ai, app_module):
+    assert ai.response_cache.ttl == app_module.AI_RESPONSE_CACHE_TTL == app_module.SNAPSHOT_REFRESH_SECONDS
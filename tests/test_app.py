@@ -0,0 +1,102 @@
+import gzip
+
+import pytest
+
+from refresher import MarketSnapshot
+from scheduler import INTERACTIVE, current_priority
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize('path', ['/api/consult', '/api/consult/stream'])
+def test_consult_rejects_invalid_symbols_without_recording_them(app_module, client, path):
+    response = client.post(path, json={'question': 'How is my basket doing?', 'symbols': '$$$'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid symbol: $$$'}
+    with client.session_transaction() as session:
+        chat_id = session.get('chat_id')
+    assert chat_id is None or not app_module.chat_store.page(chat_id).messages
+
+
+def test_consult_rejects_oversized_basket(client):
+    symbols = [f"S{i}" for i in range(100)]
+    response = client.post('/api/consult', json={'question': 'Compare these', 'symbols': symbols})
+    assert response.status_code == 400
+    assert 'At most' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('path', ['/api/consult', '/api/consult/stream'])
+def test_consult_lookups_run_at_interactive_priority(app_module, client, monkeypatch, path):
+    seen = []
+
+    def build(symbol, symbols=None):
+        seen.append(current_priority.get())
+        return 'context'
+
+    monkeypatch.setattr(app_module, 'build_consult_context', build)
+    monkeypatch.setattr(app_module.ai, 'respond', lambda *args, **kwargs: 'answer')
+    monkeypatch.setattr(app_module.ai, 'respond_stream', lambda *args, **kwargs: iter(['answer']))
+    response = client.post(path, json={'question': 'How is AAPL doing?', 'symbol': 'AAPL'})
+    assert response.status_code == 200
+    response.get_data()
+    assert seen == [INTERACTIVE]
+
+
+def _snapshot(version, ticker):
+    stock = {'ticker': ticker, 'price': '10', 'change_amount': '1', 'change_percentage': '10%', 'volume': '100'}
+    movers = {'top_gainers': (stock,), 'top_losers': (), 'most_actively_traded': ()}
+    return MarketSnapshot(version, movers, (), 1700000000.0 + version, 1700000000.0 + version)
+
+
+@pytest.fixture
+def snapshot(app_module, monkeypatch):
+    """Serve pages from a fixed snapshot; set current['snapshot'] to publish a new one"""
+    current = {'snapshot': _snapshot(1, 'AAA')}
+    monkeypatch.setattr(app_module, 'get_market_snapshot', lambda: current['snapshot'])
+    app_module.fragment_cache.clear()
+    return current
+
+
+def test_matching_etag_gets_304(client, snapshot):
+    first = client.get('/')
+    assert first.status_code == 200 and first.headers['ETag'].startswith('W/')
+    assert 'no-cache' in first.headers['Cache-Control']
+    again = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and again.data == b''
+    stale = client.get('/', headers={'If-None-Match': 'W/"something-else"'})
+    assert stale.status_code == 200 and stale.data == first.data
+
+
+def test_gzip_only_when_accepted(app_module, client, snapshot, monkeypatch):
+    monkeypatch.setattr(app_module, 'GZIP_MIN_SIZE', 0)
+    plain = client.get('/api/stream/stats')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+    compressed = client.get('/api/stream/stats', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.data) == plain.data
+    # Both encodings share one weak validator
+    assert compressed.headers['ETag'] == plain.headers['ETag']
+
+
+def test_small_responses_are_not_compressed(client, snapshot):
+    response = client.get('/api/stream/stats', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_fragments_rerender_when_snapshot_version_changes(app_module, client, snapshot):
+    first = client.get('/')
+    assert b'AAA' in first.data
+    # Same version, different data: the cached fragment is reused
+    snapshot['snapshot'] = _snapshot(1, 'BBB')
+    assert b'BBB' not in client.get('/').data
+    # A new version renders fresh fragments and a new validator
+    snapshot['snapshot'] = _snapshot(2, 'BBB')
+    second = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert b'BBB' in second.data and b'AAA' not in second.data
+    assert second.headers['ETag'] != first.headers['ETag']
@@ -0,0 +1,107 @@
+from broadcaster import MarketBroadcaster, snapshot_diff
+from refresher import MarketSnapshot
+
+
+def _snapshot(version, news=()):
+    return MarketSnapshot(version, {'top_gainers': ()}, tuple(news), 1000.0, 1000.0)
+
+
+def test_retry_is_separate_from_heartbeat():
+    broadcaster = MarketBroadcaster(heartbeat=25, retry=2.5)
+    stream = broadcaster.stream(broadcaster.subscribe(), _snapshot(1), since=broadcaster.event_id(1))
+    assert next(stream) == "retry: 2500\n\n"
+    stream.close()
+    assert broadcaster.stats()['clients'] == 0
+
+
+def _article(url):
+    return {'title': url, 'description': '', 'url': url, 'image': None, 'source': 'wire', 'published_at': None}
+
+
+def _movers(*tickers):
+    return {'top_gainers': tuple({'ticker': t, 'price': '1'} for t in tickers), 'top_losers': ()}
+
+
+def test_snapshot_diff_without_previous_sends_full_state():
+    snapshot = MarketSnapshot(1, _movers('AAA'), (_article('a'),), 1000.0, 900.0)
+    diff = snapshot_diff(snapshot)
+    assert diff['version'] == 1
+    assert diff['fetched_at'] == '1970-01-01T00:15:00+00:00'
+    assert set(diff['movers']) == {'top_gainers', 'top_losers', 'most_actively_traded'}
+    assert diff['movers']['top_gainers'][0]['ticker'] == 'AAA'
+    assert diff['news'] == {'reset': True, 'added': [_article('a')], 'removed': []}
+
+
+def test_snapshot_diff_sends_only_changes():
+    previous = MarketSnapshot(1, _movers('AAA'), (_article('a'), _article('b')), 1000.0, 1000.0)
+    snapshot = MarketSnapshot(2, dict(_movers('BBB'), top_losers=()), (_article('c'), _article('a')), 1060.0, 1060.0)
+    diff = snapshot_diff(snapshot, previous)
+    assert list(diff['movers']) == ['top_gainers']
+    assert diff['news'] == {'reset': False, 'added': [_article('c')], 'removed': ['b']}
+
+
+def _frames(stream, count):
+    return [next(stream) for _ in range(count)]
+
+
+def test_stream_resumes_from_client_version():
+    broadcaster = MarketBroadcaster(heartbeat=0.05)
+    first, second = _snapshot(1, [_article('a')]), _snapshot(2, [_article('b')])
+    # A client reconnecting with the current version gets no full state, only later diffs
+    stream = broadcaster.stream(broadcaster.subscribe(), first, since=broadcaster.event_id(1))
+    assert _frames(stream, 2)[1] == ": keep-alive\n\n"
+    broadcaster.publish(second, first)
+    frame = next(stream)
+    assert frame.startswith(f"id: {broadcaster.event_id(2)}\nevent: market\n") and '"reset":false' in frame
+    stream.close()
+    # One that is behind is sent the full state again
+    stream = broadcaster.stream(broadcaster.subscribe(), second, since=broadcaster.event_id(1))
+    frame = _frames(stream, 2)[1]
+    assert frame.startswith(f"id: {broadcaster.event_id(2)}\n") and '"reset":true' in frame
+    stream.close()
+
+
+def test_stream_sends_full_state_to_new_clients_and_skips_stale_frames():
+    broadcaster = MarketBroadcaster(heartbeat=0.05)
+    first, second = _snapshot(1), _snapshot(2, [_article('b')])
+    subscription = broadcaster.subscribe()
+    broadcaster.publish(second, first)
+    stream = broadcaster.stream(subscription, second)
+    frames = _frames(stream, 3)
+    assert frames[1].startswith(f"id: {broadcaster.event_id(2)}\n") and '"reset":true' in frames[1]
+    # The queued diff to version 2 is already covered by the full state
+    assert frames[2] == ": keep-alive\n\n"
+    broadcaster.publish(_snapshot(3), second)
+    assert next(stream).startswith(f"id: {broadcaster.event_id(3)}\n")
+    stream.close()
+
+
+def test_overflowed_client_is_resynchronized():
+    broadcaster = MarketBroadcaster(queue_size=1, heartbeat=0.05)
+    snapshots = [_snapshot(version, [_article(str(version))]) for version in range(1, 4)]
+    stream = broadcaster.stream(broadcaster.subscribe(), snapshots[0], since=broadcaster.event_id(1))
+    next(stream)
+    broadcaster.publish(snapshots[1], snapshots[0])
+    broadcaster.publish(snapshots[2], snapshots[1])
+    frame = next(stream)
+    assert frame.startswith(f"id: {broadcaster.event_id(3)}\n") and '"reset":true' in frame
+    assert broadcaster.stats()['resyncs'] == 1
+    stream.close()
+
+
+def test_event_ids_from_another_process_get_full_state():
+    # Each worker counts versions on its own; the same number from another worker means nothing here
+    here, elsewhere = MarketBroadcaster(heartbeat=0.05), MarketBroadcaster(heartbeat=0.05)
+    first, second = _snapshot(1), _snapshot(2, [_article('b')])
+    assert here.event_id(2) != elsewhere.event_id(2)
+    for since in (elsewhere.event_id(2), elsewhere.event_id(5), '2', 'garbage'):
+        stream = here.stream(here.subscribe(), second, since=since)
+        frame = _frames(stream, 2)[1]
+        assert frame.startswith(f"id: {here.event_id(2)}\n") and '"reset":true' in frame
+        stream.close()
+    # A client that reported a higher foreign version still receives later diffs
+    stream = here.stream(here.subscribe(), second, since=elsewhere.event_id(9))
+    _frames(stream, 2)
+    here.publish(_snapshot(3), second)
+    assert next(stream).startswith(f"id: {here.event_id(3)}\n")
+    stream.close()
@@ -0,0 +1,37 @@
+import context_harness
+
+MOVERS = {
+    'top_gainers': [{'ticker': f"G{i}", 'price': '10', 'change_amount': '1', 'change_percentage': '10%', 'volume': '100'}
+                    for i in range(5)],
+    'top_losers': [],
+    'most_actively_traded': [],
+}
+NEWS = [{'title': f"Headline {i}", 'source': 'Wire', 'published_at': '2024-03-08'} for i in range(5)]
+
+
+def _pack(budget=1500):
+    return context_harness.pack_market_context(MOVERS, news=NEWS, token_budget=budget)
+
+
+def test_sections_are_packed_in_priority_order(monkeypatch):
+    packed = _pack()
+    assert list(packed['section_tokens']) == ['movers', 'news']
+    assert packed['formatted_context'].index('Top Gainers') < packed['formatted_context'].index('Economic News')
+    monkeypatch.setattr(context_harness, 'SECTION_PRIORITY', ('news', 'movers'))
+    packed = _pack()
+    assert list(packed['section_tokens']) == ['news', 'movers']
+    assert packed['formatted_context'].index('Economic News') < packed['formatted_context'].index('Top Gainers')
+
+
+def test_lowest_priority_section_is_dropped_first(monkeypatch):
+    smallest = {
+        name: context_harness.estimate_tokens(text)
+        for name, text in (
+            ('movers', context_harness.serialize_movers(MOVERS, 1)),
+            ('news', context_harness.serialize_news(NEWS, 1)),
+        )
+    }
+    budget = context_harness._PROMPT_OVERHEAD_TOKENS + max(smallest.values())
+    assert _pack(budget)['dropped'] == ['news']
+    monkeypatch.setattr(context_harness, 'SECTION_PRIORITY', ('news', 'movers'))
+    assert _pack(budget)['dropped'] == ['movers']
@@ -0,0 +1,85 @@
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+
+import forecasting
+from timeseries import DailySeries
+
+Z80 = NormalDist().inv_cdf(0.9)
+
+
+def _series(prices, symbol='TEST', start='2024-01-01'):
+    dates = np.busday_offset(np.datetime64(start, 'D'), np.arange(len(prices)), roll='forward')
+    rows = [(str(day), p, p, p, p, p, 1000) for day, p in zip(dates, prices)]
+    return DailySeries.from_rows(symbol, rows)
+
+
+def _ar1_log_prices(n=1500, intercept=0.001, phi=0.5, sigma=0.01, seed=3):
+    rng = np.random.default_rng(seed)
+    returns = np.zeros(n)
+    for t in range(1, n):
+        returns[t] = intercept + phi * returns[t - 1] + rng.normal(0, sigma)
+    return np.log(100) + np.cumsum(returns)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    forecasting.forecast_cache.clear()
+
+
+def test_autoregressive_recovers_known_coefficients():
+    result = forecasting.autoregressive(_ar1_log_prices(), horizon=5, z=Z80, order=1)
+    intercept, phi = result['coefficients']
+    assert phi == pytest.approx(0.5, abs=0.06)
+    assert intercept == pytest.approx(0.001, abs=0.001)
+
+
+def test_autoregressive_forecast_and_interval_match_naive():
+    log_prices = _ar1_log_prices()
+    horizon = 6
+    result = forecasting.autoregressive(log_prices, horizon=horizon, z=Z80, order=1)
+    intercept, phi = result['coefficients']
+    # Naive recursion of the mean path
+    last_return, level, expected = log_prices[-1] - log_prices[-2], log_prices[-1], []
+    for _ in range(horizon):
+        last_return = intercept + phi * last_return
+        level += last_return
+        expected.append(np.exp(level))
+    np.testing.assert_allclose(result['forecast'], expected, rtol=1e-4)
+    # Variance of an AR(1) cumulative return after h steps: sigma^2 * sum_i (sum_{j<=i} phi^j)^2
+    ratios = np.log(np.array(result['upper']) / np.array(result['forecast'])) / Z80
+    naive = [np.sqrt(sum(sum(phi ** j for j in range(i + 1)) ** 2 for i in range(h))) for h in range(1, horizon + 1)]
+    np.testing.assert_allclose(ratios / ratios[0], naive, rtol=1e-3)
+    assert ratios[0] == pytest.approx(0.01, rel=0.1)
+
+
+def test_smoothing_picks_alpha_one_for_random_walk():
+    log_prices = np.log(100) + np.cumsum(np.random.default_rng(5).normal(0, 0.01, 800))
+    result = forecasting.exponential_smoothing(log_prices, horizon=3, z=Z80)
+    assert result['alpha'] == 1.0
+    assert result['forecast'] == [round(float(np.exp(log_prices[-1])), 4)] * 3
+    widths = np.array(result['upper']) - np.array(result['lower'])
+    assert np.all(np.diff(widths) > 0)
+
+
+def test_volatility_of_constant_growth():
+    log_prices = np.log(100) + 0.01 * np.arange(200)
+    result = forecasting.ewma_volatility(log_prices, horizon=4, z=Z80)
+    assert result['daily'] == pytest.approx(0.01)
+    last = np.exp(log_prices[-1])
+    expected = [round(float(last * np.exp(-Z80 * 0.01 * np.sqrt(h))), 4) for h in range(1, 5)]
+    assert result['lower'] == expected
+
+
+def test_forecast_dates_cache_and_minimum_length():
+    assert forecasting.forecast(_series([100.0] * (forecasting.MIN_BARS - 1))) is None
+    # 2024-01-01 is a Monday; 100 business days later ends on a Friday
+    series = _series(list(np.exp(_ar1_log_prices(100))))
+    result = forecasting.forecast(series, horizon=3, confidence=0.8)
+    assert result['last_date'] == '2024-05-17'
+    assert result['dates'] == ['2024-05-20', '2024-05-21', '2024-05-22']
+    assert set(result) >= {'smoothing', 'autoregressive', 'volatility'}
+    assert forecasting.forecast(series, horizon=3, confidence=0.8) is result
+    lower, upper = result['volatility']['lower'][0], result['volatility']['upper'][0]
+    assert lower < result['last_price'] < upper
@@ -0,0 +1,31 @@
+import pytest
+
+from scheduler import BACKGROUND, INTERACTIVE, NORMAL, RateLimitScheduler, TokenBucket, UpstreamThrottled
+
+
+def test_token_bucket_needed_above_capacity_never_fills():
+    bucket = TokenBucket(5, 60.0)
+    assert bucket.wait_time(bucket.updated) == 0.0
+    assert bucket.wait_time(bucket.updated, needed=6) == float('inf')
+
+
+def test_background_calls_stop_short_of_reserve():
+    scheduler = RateLimitScheduler(per_minute=100, per_day=10, max_wait=0.01, reserve=4)
+    for _ in range(6):
+        scheduler.acquire(BACKGROUND)
+    with pytest.raises(UpstreamThrottled):
+        scheduler.acquire(BACKGROUND)
+    # The reserve is still there for users
+    for _ in range(4):
+        scheduler.acquire(INTERACTIVE)
+    with pytest.raises(UpstreamThrottled):
+        scheduler.acquire(INTERACTIVE)
+    assert scheduler.stats()['admitted'] == 10
+
+
+def test_normal_calls_may_use_reserve():
+    scheduler = RateLimitScheduler(per_minute=100, per_day=3, max_wait=0.01, reserve=3)
+    with pytest.raises(UpstreamThrottled):
+        scheduler.acquire(BACKGROUND)
+    for _ in range(3):
+        scheduler.acquire(NORMAL)
@@ -0,0 +1,136 @@
+from datetime import date, datetime
+
+import pytest
+
+from series_store import MARKET_TZ, SeriesStore, SyncState, latest_session
+
+
+def _bar(close, adjusted=None, dividend=0.0, split=1.0):
+    return {
+        '1. open': str(close), '2. high': str(close), '3. low': str(close), '4. close': str(close),
+        '5. adjusted close': str(close if adjusted is None else adjusted), '6. volume': '1000',
+        '7. dividend amount': str(dividend), '8. split coefficient': str(split),
+    }
+
+
+HISTORY = {f"2024-03-{day:02d}": _bar(100 + day) for day in (4, 5, 6, 7, 8)}
+
+
+@pytest.fixture
+def sync(app_module, tmp_path, monkeypatch):
+    """_sync_time_series against a fresh store, with Alpha Vantage replaced by queued payloads"""
+    store = SeriesStore(str(tmp_path / 'series.sqlite3'))
+    monkeypatch.setattr(app_module, 'series_store', store)
+    calls, responses = [], []
+
+    def fetch(symbol, outputsize):
+        calls.append(outputsize)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(app_module, '_fetch_daily_adjusted', fetch)
+
+    def run(*payloads, trading_day=date(2024, 3, 11)):
+        calls.clear()
+        responses[:] = payloads
+        series, error = app_module._sync_time_series('TEST', trading_day, store.sync_state('TEST'))
+        assert not responses, "not every queued response was fetched"
+        return series, error
+
+    run.store, run.calls = store, calls
+    return run
+
+
+def test_latest_session():
+    # Saturday rolls back to Friday; before 16:30 on Monday the last session is Friday
+    assert latest_session(datetime(2024, 3, 9, 12, tzinfo=MARKET_TZ)) == date(2024, 3, 8)
+    assert latest_session(datetime(2024, 3, 11, 16, tzinfo=MARKET_TZ)) == date(2024, 3, 8)
+    assert latest_session(datetime(2024, 3, 11, 17, tzinfo=MARKET_TZ)) == date(2024, 3, 11)
+
+
+def test_full_history_flag_is_never_downgraded(tmp_path):
+    store = SeriesStore(str(tmp_path / 'series.sqlite3'))
+    assert store.upsert('TEST', HISTORY, date(2024, 3, 8), full_history=True) == 5
+    store.upsert('TEST', {'2024-03-11': _bar(111)}, date(2024, 3, 11), full_history=False)
+    assert store.sync_state('TEST') == SyncState(date(2024, 3, 11), True)
+    assert store.latest_date('TEST') == '2024-03-11'
+    assert len(store.load('TEST')) == 6
+
+
+def test_first_sync_fetches_full_history(sync):
+    series, error = sync({'Time Series (Daily)': HISTORY}, trading_day=date(2024, 3, 8))
+    assert error is None and sync.calls == ['full']
+    assert len(series) == 5
+    assert sync.store.sync_state('TEST') == SyncState(date(2024, 3, 8), True)
+
+
+def test_known_symbol_fetches_compact_window(sync):
+    sync({'Time Series (Daily)': HISTORY}, trading_day=date(2024, 3, 8))
+    compact = {'2024-03-08': HISTORY['2024-03-08'], '2024-03-11': _bar(111)}
+    series, _ = sync({'Time Series (Daily)': compact})
+    assert sync.calls == ['compact']
+    assert series.last_date == '2024-03-11' and len(series) == 6
+    assert sync.store.sync_state('TEST').checked_session == date(2024, 3, 11)
+
+
+def test_new_dividend_reloads_adjusted_history(sync):
+    sync({'Time Series (Daily)': HISTORY}, trading_day=date(2024, 3, 8))
+    compact = {'2024-03-11': _bar(111, dividend=1.0)}
+    # Alpha Vantage re-adjusts every earlier close once the dividend is paid
+    readjusted = {day: _bar(100 + int(day[-2:]), adjusted=99 + int(day[-2:])) for day in HISTORY}
+    readjusted['2024-03-11'] = _bar(111, dividend=1.0)
+    series, _ = sync({'Time Series (Daily)': compact}, {'Time Series (Daily)': readjusted})
+    assert sync.calls == ['compact', 'full']
+    assert series.adjusted_close[0] == 103.0 and len(series) == 6
+
+
+def test_dividend_already_stored_does_not_reload(sync):
+    history = dict(HISTORY, **{'2024-03-08': _bar(108, dividend=0.5)})
+    sync({'Time Series (Daily)': history}, trading_day=date(2024, 3, 8))
+    compact = {'2024-03-08': history['2024-03-08'], '2024-03-11': _bar(111)}
+    sync({'Time Series (Daily)': compact})
+    assert sync.calls == ['compact']
+
+
+def test_failed_reload_keeps_stored_copy_and_retries_later(sync):
+    sync({'Time Series (Daily)': HISTORY}, trading_day=date(2024, 3, 8))
+    compact = {'2024-03-11': _bar(111, split=2.0)}
+    series, error = sync({'Time Series (Daily)': compact}, RuntimeError('quota'))
+    assert sync.calls == ['compact', 'full'] and error is None
+    assert series.last_date == '2024-03-08'
+    assert sync.store.sync_state('TEST').checked_session == date(2024, 3, 8)
+
+
+def test_fetch_error_serves_stored_series(sync):
+    sync({'Time Series (Daily)': HISTORY}, trading_day=date(2024, 3, 8))
+    series, error = sync({'Note': 'Thank you for using Alpha Vantage!'})
+    assert error is None and len(series) == 5
+    series, error = sync(RuntimeError('down'))
+    assert error is None and len(series) == 5
+
+
+def test_first_fetch_error_propagates(sync):
+    with pytest.raises(RuntimeError):
+        sync(RuntimeError('down'))
+    series, error = sync({'Error Message': 'Invalid API call.'})
+    assert series is None and error == {'Error Message': 'Invalid API call.'}
+
+
+def test_stale_store_reloads_full_history_instead_of_leaving_a_gap(sync):
+    sync({'Time Series (Daily)': HISTORY}, trading_day=date(2024, 3, 8))
+    # Synced long ago: the compact window no longer reaches back to the stored bars
+    compact = {'2024-08-01': _bar(150), '2024-08-02': _bar(151)}
+    full = dict(HISTORY, **{'2024-07-31': _bar(149)}, **compact)
+    series, _ = sync({'Time Series (Daily)': compact}, {'Time Series (Daily)': full}, trading_day=date(2024, 8, 2))
+    assert sync.calls == ['compact', 'full']
+    assert [str(day) for day in series.dates[-4:]] == ['2024-03-08', '2024-07-31', '2024-08-01', '2024-08-02']
+    assert sync.store.sync_state('TEST') == SyncState(date(2024, 8, 2), True)
+
+
+def test_stale_store_keeps_stored_copy_when_reload_fails(sync):
+    sync({'Time Series (Daily)': HISTORY}, trading_day=date(2024, 3, 8))
+    series, _ = sync({'Time Series (Daily)': {'2024-08-01': _bar(150)}}, RuntimeError('quota'))
+    assert series.last_date == '2024-03-08'
+    assert sync.store.sync_state('TEST').checked_session == date(2024, 3, 8)
@@ -0,0 +1,96 @@
+import multiprocessing
+import threading
+import time
+
+from shared_cache import SharedCache, _key
+
+
+def _cache(path, **kwargs):
+    return SharedCache('test', path, ttl=60, poll_interval=0.01, **kwargs)
+
+
+def _slow_load(path, start, results):
+    cache = _cache(path)
+    start.wait()
+
+    def load():
+        time.sleep(0.3)
+        return {'pid': multiprocessing.current_process().name}
+
+    value, _ = cache.get_or_load('k', load)
+    results.put((value, cache.stats()['loads']))
+
+
+def _hold_lease(path, entered, release):
+    with _cache(path).lease('k'):
+        entered.set()
+        release.wait(10)
+
+
+def test_get_or_load_caches_for_other_instances(tmp_path):
+    path = str(tmp_path / 'shared.sqlite3')
+    first, second = _cache(path), _cache(path)
+    assert first.get_or_load('k', lambda: {'v': 1}) == ({'v': 1}, 60)
+    value, remaining = second.get_or_load('k', lambda: {'v': 2})
+    assert value == {'v': 1} and 0 < remaining <= 60
+    assert second.stats()['loads'] == 0
+
+
+def test_waiter_loads_itself_after_wait_timeout(tmp_path):
+    path = str(tmp_path / 'shared.sqlite3')
+    holder, waiter = _cache(path), _cache(path, wait_timeout=0.2)
+    # Another worker holds the lease and never stores a value
+    assert holder._acquire(_key('k'), 'holder')
+    start = time.monotonic()
+    value, ttl = waiter.get_or_load('k', lambda: 'local')
+    assert value == 'local' and ttl == 60
+    assert 0.2 <= time.monotonic() - start < 2
+    stats = waiter.stats()
+    assert stats['lease_timeouts'] == 1 and stats['loads'] == 1
+    # The stuck holder's lease is left alone
+    assert not waiter._acquire(_key('k'), 'other')
+
+
+def test_lease_block_runs_without_lease_after_wait_timeout(tmp_path):
+    path = str(tmp_path / 'shared.sqlite3')
+    holder, waiter = _cache(path), _cache(path, wait_timeout=0.1)
+    with holder.lease('k') as held:
+        assert held
+        with waiter.lease('k') as waited_out:
+            assert not waited_out
+    assert waiter.stats()['lease_timeouts'] == 1
+    with waiter.lease('k') as held:
+        assert held
+
+
+def test_processes_load_a_key_once(tmp_path):
+    path = str(tmp_path / 'shared.sqlite3')
+    _cache(path)
+    start, results = multiprocessing.Event(), multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_slow_load, args=(path, start, results)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    start.set()
+    outcomes = [results.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=10)
+    values, loads = zip(*outcomes)
+    assert values[0] == values[1]
+    assert sorted(loads) == [0, 1]
+
+
+def test_lease_held_by_another_process_blocks_until_released(tmp_path):
+    path = str(tmp_path / 'shared.sqlite3')
+    cache = _cache(path, wait_timeout=10)
+    entered, release = multiprocessing.Event(), multiprocessing.Event()
+    holder = multiprocessing.Process(target=_hold_lease, args=(path, entered, release))
+    holder.start()
+    assert entered.wait(10)
+    assert not cache._acquire(_key('k'), 'other')
+    threading.Timer(0.2, release.set).start()
+    started = time.monotonic()
+    with cache.lease('k') as held:
+        assert held
+        assert time.monotonic() - started >= 0.2
+    holder.join(timeout=10)
+    assert cache.stats()['lease_waits'] == 1 and cache.stats()['lease_timeouts'] == 0
@@ -0,0 +1,94 @@
+import multiprocessing
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from scheduler import INTERACTIVE, RateLimitScheduler, SharedQuota, UpstreamThrottled
+
+
+def _scheduler(path, per_day=10):
+    return RateLimitScheduler(per_minute=100, per_day=per_day, max_wait=0.01, shared=SharedQuota(path))
+
+
+def _admit_all(path, results):
+    scheduler = _scheduler(path)
+    admitted = 0
+    while True:
+        try:
+            scheduler.acquire(INTERACTIVE)
+        except UpstreamThrottled:
+            break
+        admitted += 1
+    results.put(admitted)
+
+
+def test_schedulers_share_one_day_bucket(tmp_path):
+    path = str(tmp_path / 'shared.sqlite3')
+    first, second = _scheduler(path), _scheduler(path)
+    for _ in range(6):
+        first.acquire()
+    for _ in range(4):
+        second.acquire()
+    with pytest.raises(UpstreamThrottled):
+        first.acquire()
+    assert second.stats()['day_tokens'] < 1
+
+
+def test_processes_together_stay_within_quota(tmp_path):
+    path = str(tmp_path / 'shared.sqlite3')
+    SharedQuota(path)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_admit_all, args=(path, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+    assert sum(results.get(timeout=5) for _ in workers) == 10
+
+
+def test_throttle_pause_is_shared(tmp_path):
+    path = str(tmp_path / 'shared.sqlite3')
+    first, second = _scheduler(path, per_day=100), _scheduler(path, per_day=100)
+    with pytest.raises(UpstreamThrottled):
+        first.observe({'Note': 'Our standard API call frequency is 5 calls per minute.'})
+    assert second.stats()['blocked_for_seconds'] > 0
+    with pytest.raises(UpstreamThrottled):
+        second.acquire()
+
+
+def _lock(path):
+    """Hold the database write lock the way another process admitting a call would"""
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    conn.execute("BEGIN IMMEDIATE")
+    return conn
+
+
+def test_stats_does_not_take_the_write_lock(tmp_path):
+    path = str(tmp_path / 'shared.sqlite3')
+    scheduler = _scheduler(path)
+    scheduler.acquire()
+    conn = _lock(path)
+    try:
+        started = time.monotonic()
+        stats = scheduler.stats()
+        assert time.monotonic() - started < 0.05
+        assert stats['day_tokens'] == pytest.approx(9, abs=0.01)
+    finally:
+        conn.execute("ROLLBACK")
+
+
+def test_locked_quota_is_retried_until_max_wait(tmp_path):
+    path = str(tmp_path / 'shared.sqlite3')
+    scheduler = RateLimitScheduler(per_minute=100, per_day=10, max_wait=0.3, shared=SharedQuota(path))
+    conn = _lock(path)
+    started = time.monotonic()
+    with pytest.raises(UpstreamThrottled):
+        scheduler.acquire()
+    assert time.monotonic() - started < 1
+    # Released while the caller is waiting: the retry admits it
+    threading.Timer(0.1, conn.execute, args=("ROLLBACK",)).start()
+    scheduler.max_wait = 2
+    scheduler.acquire()
+    assert scheduler.stats()['admitted'] == 1
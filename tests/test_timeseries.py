@@ -0,0 +1,132 @@
+import datetime
+import statistics
+
+import numpy as np
+import pytest
+
+from timeseries import DailySeries, average_correlation, ewma
+
+
+def _payload(days=300, start=datetime.date(2023, 1, 2), seed=7):
+    """Alpha Vantage style daily payload over consecutive weekdays, in shuffled order"""
+    rng = np.random.default_rng(seed)
+    dates = []
+    day = start
+    while len(dates) < days:
+        if day.weekday() < 5:
+            dates.append(day.isoformat())
+        day += datetime.timedelta(days=1)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, days))
+    payload = {}
+    for i in rng.permutation(days):
+        payload[dates[i]] = {
+            '1. open': f"{close[i] * 0.99:.4f}",
+            '2. high': f"{close[i] * 1.01:.4f}",
+            '3. low': f"{close[i] * 0.98:.4f}",
+            '4. close': f"{close[i]:.4f}",
+            '5. adjusted close': f"{close[i] * 0.5:.4f}",
+            '6. volume': str(1000 + i),
+        }
+    return payload
+
+
+def _naive_ewma(values, alpha):
+    out, prev = [], values[0]
+    for value in values:
+        prev = (1 - alpha) * prev + alpha * value
+        out.append(prev)
+    return out
+
+
+@pytest.fixture
+def series():
+    return DailySeries.from_alpha_vantage('TEST', _payload())
+
+
+def test_from_alpha_vantage_sorts_and_parses(series):
+    payload = _payload()
+    days = sorted(payload)
+    assert len(series) == 300
+    assert [str(d) for d in series.dates] == days
+    assert series.close[0] == float(payload[days[0]]['4. close'])
+    assert series.adjusted_close[-1] == float(payload[days[-1]]['5. adjusted close'])
+    assert series.volume[5] == float(payload[days[5]]['6. volume'])
+
+
+def test_from_alpha_vantage_falls_back_to_close_without_adjustment():
+    payload = {'2024-01-02': {'4. close': '10'}, '2024-01-03': {'4. close': 'n/a'}}
+    series = DailySeries.from_alpha_vantage('TEST', payload)
+    assert series.adjusted_close[0] == 10.0
+    assert np.isnan(series.close[1]) and np.isnan(series.open[0])
+
+
+@pytest.mark.parametrize('alpha', [0.5, 0.1, 0.001])
+def test_ewma_matches_recurrence(alpha):
+    # Long enough to cross several chunks for small alphas
+    values = np.random.default_rng(1).normal(100, 5, 5000)
+    np.testing.assert_allclose(ewma(values, alpha), _naive_ewma(values, alpha), rtol=1e-9)
+
+
+def test_ewma_edge_cases():
+    assert len(ewma(np.array([]), 0.5)) == 0
+    np.testing.assert_array_equal(ewma(np.array([1.0, 2.0, 3.0]), 1.0), [1.0, 2.0, 3.0])
+
+
+@pytest.mark.parametrize('interval,period', [
+    ('weekly', lambda d: d.isocalendar()[:2]),
+    ('monthly', lambda d: (d.year, d.month)),
+])
+def test_resample_matches_grouping(series, interval, period):
+    groups = {}
+    for i, date in enumerate(series.dates.astype(object)):
+        groups.setdefault(period(date), []).append(i)
+    bars = series.resample(interval)
+    assert len(bars) == len(groups)
+    for bar, indices in zip(bars.rows(descending=False), groups.values()):
+        assert bar['date'] == str(series.dates[indices[-1]])
+        assert bar['open'] == series.open[indices[0]]
+        assert bar['high'] == max(series.high[i] for i in indices)
+        assert bar['low'] == min(series.low[i] for i in indices)
+        assert bar['close'] == series.close[indices[-1]]
+        assert bar['volume'] == sum(series.volume[i] for i in indices)
+
+
+def test_resample_daily_and_unknown(series):
+    assert series.resample('daily') is series
+    with pytest.raises(ValueError):
+        series.resample('hourly')
+
+
+def test_indicators_match_naive(series):
+    prices = list(series.prices())
+    assert series.sma(20)[-1] == pytest.approx(sum(prices[-20:]) / 20)
+    assert np.isnan(series.sma(20)[18]) and not np.isnan(series.sma(20)[19])
+    assert series.ema(12)[-1] == pytest.approx(_naive_ewma(prices, 2 / 13)[-1])
+    log_returns = [np.log(b / a) for a, b in zip(prices, prices[1:])]
+    expected_vol = statistics.stdev(log_returns[-21:]) * np.sqrt(252)
+    assert series.rolling_volatility(21)[-1] == pytest.approx(expected_vol)
+    peak = max(prices)
+    assert series.drawdown()[-1] == pytest.approx(prices[-1] / peak - 1)
+    year = series[-252:]
+    assert series.range_52w()['high'] == max(year.high)
+    assert series.range_52w()['low'] == min(year.low)
+
+
+def test_summary_period_returns(series):
+    prices = series.prices()
+    summary = series.summary()
+    assert summary['bars'] == 300
+    assert summary['return_5d'] == pytest.approx(prices[-1] / prices[-6] - 1)
+    assert summary['return_252d'] == pytest.approx(prices[-1] / prices[-253] - 1)
+    assert series[-100:].summary()['sma_200'] is None
+
+
+def test_between_is_inclusive(series):
+    first, last = str(series.dates[10]), str(series.dates[20])
+    window = series.between(first, last)
+    assert len(window) == 11 and window.last_date == last
+
+
+def test_average_correlation_of_identical_series(series):
+    assert average_correlation([series, series]) == pytest.approx(1.0)
+    assert average_correlation([series]) is None
@@ -0,0 +1,365 @@
+"""
+Daily Time Series Module
+
+This module parses a symbol's daily history once into a compact columnar
+object: a sorted array of dates plus float arrays for OHLCV. Indicators
+(returns, SMA/EMA, rolling volatility, drawdown and the 52-week range) are
+computed with vectorized NumPy operations, so a statistical summary of even
+a 20-year series costs microseconds rather than a Python loop over strings.
+Several series can be aligned on their common dates to compare a basket.
+"""
+
+from functools import reduce
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+TRADING_DAYS_PER_YEAR = 252
+
+# Resampling intervals accepted by DailySeries.resample()
+INTERVALS = ('daily', 'weekly', 'monthly')
+
+# Alpha Vantage field names for each column
+_AV_FIELDS = {
+    'open': '1. open',
+    'high': '2. high',
+    'low': '3. low',
+    'close': '4. close',
+    'adjusted_close': '5. adjusted close',
+    'volume': '6. volume',
+}
+COLUMNS = ('open', 'high', 'low', 'close', 'adjusted_close', 'volume')
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def ewma(values: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Exponentially weighted moving average seeded with the first value.
+
+    The recurrence y[t] = d * y[t-1] + a * x[t] is evaluated in closed form
+    with a scaled cumulative sum. The series is processed in chunks so the
+    scale factor d**-k never overflows.
+
+    Args:
+        values: Input array
+        alpha: Smoothing factor in (0, 1]; weight of the newest value
+    """
+    decay = 1.0 - alpha
+    out = np.empty_like(values, dtype=np.float64)
+    if len(values) == 0:
+        return out
+    if decay <= 0:
+        out[:] = values
+        return out
+    chunk = max(1, int(600 / -np.log(decay)))
+    prev = values[0]
+    for start in range(0, len(values), chunk):
+        x = values[start:start + chunk]
+        k = np.arange(1, len(x) + 1)
+        out[start:start + len(x)] = decay ** k * (prev + alpha * np.cumsum(x * decay ** -k))
+        prev = out[start + len(x) - 1]
+    return out
+
+
+def _ema(values: np.ndarray, span: int) -> np.ndarray:
+    """Exponential moving average with the conventional alpha = 2 / (span + 1)"""
+    return ewma(values, 2.0 / (span + 1))
+
+
+class DailySeries:
+    """
+    Columnar daily OHLCV history for one symbol, sorted by ascending date.
+    """
+
+    __slots__ = ('symbol', 'dates') + COLUMNS
+
+    def __init__(self, symbol: str, dates: np.ndarray, **columns: np.ndarray):
+        """
+        Args:
+            symbol: Stock ticker symbol
+            dates: Ascending datetime64[D] array
+            **columns: Float arrays for each name in COLUMNS, aligned with dates
+        """
+        self.symbol = symbol
+        self.dates = dates
+        for name in COLUMNS:
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def from_alpha_vantage(cls, symbol: str, series: Dict[str, Dict[str, str]]) -> "DailySeries":
+        """
+        Parse Alpha Vantage's "Time Series (Daily)" dict of dicts.
+
+        Args:
+            symbol: Stock ticker symbol
+            series: Dict of date string to Alpha Vantage OHLCV fields
+
+        Returns:
+            DailySeries sorted by date
+        """
+        days = sorted(series)
+        columns = {
+            name: np.array([_to_float(series[day].get(field)) for day in days], dtype=np.float64)
+            for name, field in _AV_FIELDS.items()
+        }
+        if np.isnan(columns['adjusted_close']).all():
+            columns['adjusted_close'] = columns['close'].copy()
+        return cls(symbol, np.array(days, dtype='datetime64[D]'), **columns)
+
+    @classmethod
+    def from_rows(cls, symbol: str, rows: Sequence[Sequence[Any]]) -> "DailySeries":
+        """
+        Build from ascending (date, open, high, low, close, adjusted_close, volume, ...) rows.
+
+        Args:
+            symbol: Stock ticker symbol
+            rows: Row tuples as returned by SeriesStore.rows()
+
+        Returns:
+            DailySeries in the order given
+        """
+        if not rows:
+            empty = np.array([], dtype=np.float64)
+            return cls(symbol, np.array([], dtype='datetime64[D]'), **{name: empty for name in COLUMNS})
+        table = np.array([row[1:len(COLUMNS) + 1] for row in rows], dtype=np.float64)
+        columns = {name: table[:, i] for i, name in enumerate(COLUMNS)}
+        return cls(symbol, np.array([row[0] for row in rows], dtype='datetime64[D]'), **columns)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __bool__(self) -> bool:
+        return len(self.dates) > 0
+
+    def __getitem__(self, index: slice) -> "DailySeries":
+        """Slice by position, e.g. series[-252:] for the last year"""
+        return DailySeries(
+            self.symbol,
+            self.dates[index],
+            **{name: getattr(self, name)[index] for name in COLUMNS},
+        )
+
+    def between(self, start: Optional[str] = None, end: Optional[str] = None) -> "DailySeries":
+        """
+        Bars dated from start to end, both inclusive (ISO dates; None leaves that side open).
+        """
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, 'D'), side='left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, 'D'), side='right'))
+        return self[lo:hi]
+
+    def resample(self, interval: str) -> "DailySeries":
+        """
+        Aggregate daily bars into weekly (Monday-Friday) or monthly bars.
+
+        Each bar takes the first open, highest high, lowest low, last close and
+        summed volume of its period, and is dated by its last trading day.
+
+        Args:
+            interval: 'daily', 'weekly' or 'monthly'
+
+        Returns:
+            Aggregated series ('daily' returns the series itself)
+        """
+        if interval == 'daily' or not len(self.dates):
+            return self
+        if interval == 'weekly':
+            # Day 0 (1970-01-01) was a Thursday; shift so weeks start on Monday
+            keys = (self.dates.astype(np.int64) + 3) // 7
+        elif interval == 'monthly':
+            keys = self.dates.astype('datetime64[M]').astype(np.int64)
+        else:
+            raise ValueError(f"Unknown interval: {interval}")
+        breaks = np.flatnonzero(np.diff(keys)) + 1
+        starts = np.concatenate(([0], breaks))
+        ends = np.concatenate((breaks - 1, [len(keys) - 1]))
+        return DailySeries(
+            self.symbol,
+            self.dates[ends],
+            open=self.open[starts],
+            high=np.fmax.reduceat(self.high, starts),
+            low=np.fmin.reduceat(self.low, starts),
+            close=self.close[ends],
+            adjusted_close=self.adjusted_close[ends],
+            volume=np.add.reduceat(np.nan_to_num(self.volume), starts),
+        )
+
+    @property
+    def last_date(self) -> Optional[str]:
+        """ISO date of the newest bar"""
+        return str(self.dates[-1]) if len(self.dates) else None
+
+    def rows(self, limit: Optional[int] = None, descending: bool = True) -> List[Dict[str, Any]]:
+        """
+        Bars as dictionaries, newest first by default.
+
+        Args:
+            limit: Maximum number of bars to return
+            descending: Newest bar first when True
+
+        Returns:
+            List of dicts with date and OHLCV fields
+        """
+        n = len(self.dates)
+        if descending:
+            start = 0 if limit is None else max(n - limit, 0)
+            indices: Iterable[int] = range(n - 1, start - 1, -1)
+        else:
+            indices = range(0, n if limit is None else min(limit, n))
+        return [
+            {
+                'date': str(self.dates[i]),
+                'open': float(self.open[i]),
+                'high': float(self.high[i]),
+                'low': float(self.low[i]),
+                'close': float(self.close[i]),
+                'adjusted_close': float(self.adjusted_close[i]),
+                'volume': int(self.volume[i]) if not np.isnan(self.volume[i]) else None,
+            }
+            for i in indices
+        ]
+
+    # -- Indicators -----------------------------------------------------------
+
+    def prices(self) -> np.ndarray:
+        """Adjusted closes, falling back to raw closes where adjustment is missing"""
+        return np.where(np.isnan(self.adjusted_close), self.close, self.adjusted_close)
+
+    def returns(self, log: bool = False) -> np.ndarray:
+        """Daily simple (or log) returns of adjusted closes; length len(self) - 1"""
+        prices = self.prices()
+        if log:
+            return np.diff(np.log(prices))
+        return prices[1:] / prices[:-1] - 1.0
+
+    def sma(self, window: int) -> np.ndarray:
+        """Simple moving average; NaN until a full window is available"""
+        prices = self.prices()
+        out = np.full(len(prices), np.nan)
+        if len(prices) >= window:
+            sums = np.cumsum(np.insert(prices, 0, 0.0))
+            out[window - 1:] = (sums[window:] - sums[:-window]) / window
+        return out
+
+    def ema(self, span: int) -> np.ndarray:
+        """Exponential moving average with the given span"""
+        return _ema(self.prices(), span)
+
+    def rolling_volatility(self, window: int = 21, annualize: bool = True) -> np.ndarray:
+        """Rolling standard deviation of log returns; length len(self) - 1, NaN-padded"""
+        log_returns = self.returns(log=True)
+        out = np.full(len(log_returns), np.nan)
+        if len(log_returns) >= window:
+            windows = np.lib.stride_tricks.sliding_window_view(log_returns, window)
+            out[window - 1:] = windows.std(axis=1, ddof=1)
+        if annualize:
+            out *= np.sqrt(TRADING_DAYS_PER_YEAR)
+        return out
+
+    def drawdown(self) -> np.ndarray:
+        """Fractional decline of each close from its running peak (0 at a new high)"""
+        prices = self.prices()
+        if len(prices) == 0:
+            return prices
+        return prices / np.maximum.accumulate(prices) - 1.0
+
+    def range_52w(self) -> Dict[str, Optional[float]]:
+        """
+        High, low and current position within the last 52 weeks.
+
+        Returns:
+            Dict with 'high', 'low' and 'position' (0 at the low, 1 at the high)
+        """
+        if not len(self.dates):
+            return {'high': None, 'low': None, 'position': None}
+        window = self[-TRADING_DAYS_PER_YEAR:]
+        high = float(np.nanmax(window.high))
+        low = float(np.nanmin(window.low))
+        last = float(window.close[-1])
+        position = (last - low) / (high - low) if high > low else None
+        return {'high': high, 'low': low, 'position': position}
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Statistical summary of the series for display and AI context.
+
+        Returns:
+            Dict of the latest close, period returns, moving averages,
+            volatility, drawdown and 52-week range (None where history is too short)
+        """
+        n = len(self.dates)
+        if n == 0:
+            return {}
+        prices = self.prices()
+
+        def last_valid(values: np.ndarray) -> Optional[float]:
+            value = values[-1] if len(values) else np.nan
+            return None if np.isnan(value) else float(value)
+
+        def period_return(days: int) -> Optional[float]:
+            if n <= days:
+                return None
+            return float(prices[-1] / prices[-1 - days] - 1.0)
+
+        year = self[-TRADING_DAYS_PER_YEAR:]
+        return {
+            'symbol': self.symbol,
+            'last_date': self.last_date,
+            'last_close': float(self.close[-1]),
+            'bars': n,
+            'return_1d': period_return(1),
+            'return_5d': period_return(5),
+            'return_21d': period_return(21),
+            'return_252d': period_return(TRADING_DAYS_PER_YEAR),
+            'sma_20': last_valid(self.sma(20)),
+            'sma_50': last_valid(self.sma(50)),
+            'sma_200': last_valid(self.sma(200)),
+            'ema_12': last_valid(self.ema(12)),
+            'ema_26': last_valid(self.ema(26)),
+            'volatility_21d': last_valid(self.rolling_volatility(21)),
+            'drawdown': last_valid(self.drawdown()),
+            'max_drawdown_1y': float(np.nanmin(year.drawdown())),
+            'range_52w': self.range_52w(),
+        }
+
+
+def aligned_returns(series: Sequence[DailySeries], window: int = 63) -> np.ndarray:
+    """
+    Daily returns of several series over their last `window` common trading days.
+
+    Args:
+        series: Series to align (each sorted by date)
+        window: Number of daily returns to keep
+
+    Returns:
+        Array of shape (days, len(series)); days may be below window for short histories
+    """
+    if not series:
+        return np.empty((0, 0))
+    common = reduce(np.intersect1d, [s.dates for s in series])[-(window + 1):]
+    prices = np.column_stack([s.prices()[np.searchsorted(s.dates, common)] for s in series])
+    return prices[1:] / prices[:-1] - 1.0
+
+
+def average_correlation(series: Sequence[DailySeries], window: int = 63) -> Optional[float]:
+    """
+    Mean pairwise correlation of daily returns, a rough measure of basket diversification.
+
+    Returns:
+        Average of the off-diagonal correlations, or None with fewer than two
+        series or too little shared history
+    """
+    returns = aligned_returns(series, window)
+    if returns.shape[1] < 2 or returns.shape[0] < 3:
+        return None
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = np.corrcoef(returns, rowvar=False)
+    off_diagonal = corr[~np.eye(len(corr), dtype=bool)]
+    if np.isnan(off_diagonal).all():
+        return None
+    return float(np.nanmean(off_diagonal))
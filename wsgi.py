@@ -0,0 +1,17 @@
+"""
+WSGI Entry Point
+
+Production servers import the Flask app from here, e.g.:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With gunicorn's gevent worker (the default in gunicorn.conf.py) the standard
+library is monkey-patched before this module is imported, so blocking calls
+to Alpha Vantage and OpenAI yield to other requests instead of holding an
+OS thread. One process can then keep hundreds of consults in flight, bounded
+by ALPHAVANTAGE_MAX_CONCURRENCY and OPENAI_MAX_CONCURRENCY.
+"""
+
+from app import app
+
+__all__ = ['app']